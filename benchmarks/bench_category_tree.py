@@ -0,0 +1,63 @@
+"""
+Импорт дерева из COUNT категорий в SqliteRepository: Category.create_from_tree
+(фиксация на каждую категорию) и import_category_tree (одна транзакция),
+для synchronous = NORMAL и FULL.
+
+Запуск из корня проекта (число категорий можно передать аргументом):
+python -m benchmarks.bench_category_tree [COUNT]
+"""
+
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+from bookkeeper.importer import import_category_tree
+from bookkeeper.models.category import Category
+from bookkeeper.repository.connection import ConnectionManager
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+from bookkeeper.utils import read_tree
+
+
+def tree_text(count: int) -> list[str]:
+    """ Дерево с отступами: у каждой категории до трех подкатегорий """
+    depth = {0: 0}
+    for i in range(1, count):
+        depth[i] = depth[(i - 1) // 3] + 1
+    # обход в глубину дает порядок строк текста с отступами
+    stack = [0]
+    lines = []
+    while stack:
+        node = stack.pop()
+        lines.append('    ' * depth[node] + f'c{node}')
+        stack.extend(child for child in range(3 * node + 3, 3 * node, -1)
+                     if child < count)
+    return lines
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    lines = tree_text(count)
+    for synchronous in ('NORMAL', 'FULL'):
+        with tempfile.TemporaryDirectory() as tmp:
+            timings = []
+            for name in ('create_from_tree', 'import_category_tree'):
+                db_file = os.path.join(tmp, f'{name}.db')
+                connections = ConnectionManager(db_file, synchronous=synchronous)
+                repo = SqliteRepository(db_file=db_file, cls=Category,
+                                        connections=connections)
+                start = perf_counter()
+                if name == 'create_from_tree':
+                    Category.create_from_tree(read_tree(lines), repo)
+                else:
+                    import_category_tree(lines, repo)
+                timings.append(perf_counter() - start)
+                assert len(repo.get_all()) == count
+                connections.close()
+        print(f'synchronous={synchronous}: create_from_tree {timings[0]:6.2f} s, '
+              f'import_category_tree {timings[1]:6.2f} s, '
+              f'speedup {timings[0] / timings[1]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
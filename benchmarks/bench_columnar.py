@@ -0,0 +1,89 @@
+"""
+Сравнение памяти и скорости сумм для ROWS трат в MemoryRepository
+(объекты Expense) и в ColumnarExpenseRepository (массивы по полям).
+
+Запуск из корня проекта (число трат можно передать аргументом):
+python -m benchmarks.bench_columnar [ROWS]
+"""
+
+import random
+import sys
+import tracemalloc
+from datetime import date, timedelta
+from time import perf_counter
+from typing import Any, Callable
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.columnar_repository import ColumnarExpenseRepository
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import date_range
+
+
+def expenses(rows: int) -> list[Expense]:
+    """ Случайные траты за три года """
+    rnd = random.Random(0)
+    start = date(2020, 1, 1)
+    comments = ['', 'обед', 'такси', 'подарок']
+    return [Expense(amount=rnd.randrange(1000), category=rnd.randrange(50),
+                    expense_date=f'{start + timedelta(days=rnd.randrange(1095))} '
+                                 f'{rnd.randrange(24):02d}:00:00',
+                    comment=rnd.choice(comments))
+            for _ in range(rows)]
+
+
+def measure(fill: Callable[[], Any]) -> tuple[Any, float]:
+    """ Заполнить репозиторий и вернуть его и занятую память в МиБ """
+    tracemalloc.start()
+    repo = fill()
+    size = tracemalloc.get_traced_memory()[0] / 2 ** 20
+    tracemalloc.stop()
+    return repo, size
+
+
+def timed(fn: Callable[[], Any]) -> float:
+    """ Время вызова в секундах """
+    start = perf_counter()
+    fn()
+    return perf_counter() - start
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    def fill_memory() -> MemoryRepository[Expense]:
+        repo = MemoryRepository[Expense]()
+        repo.add_many(expenses(rows))
+        return repo
+
+    def fill_columnar() -> ColumnarExpenseRepository:
+        repo = ColumnarExpenseRepository()
+        repo.add_many(expenses(rows))
+        return repo
+
+    memory, memory_size = measure(fill_memory)
+    columnar, columnar_size = measure(fill_columnar)
+    print(f'memory: objects {memory_size:7.1f} MiB, columns {columnar_size:7.1f} MiB')
+
+    month = {'expense_date': date_range(date(2021, 5, 1), date(2021, 6, 1))}
+
+    def objects_by_category() -> dict[int, int]:
+        totals: dict[int, int] = {}
+        for exp in memory.get_all():
+            totals[exp.category] = totals.get(exp.category, 0) + exp.amount
+        return totals
+
+    checks = {
+        'sum for a month': (
+            lambda: sum(exp.amount for exp in memory.iter_all(month)),
+            lambda: columnar.total('amount', month)),
+        'sums by category': (objects_by_category, columnar.totals_by),
+    }
+    for name, (objects, columns) in checks.items():
+        assert objects() == columns()
+        old, new = timed(objects), timed(columns)
+        print(f'{name}: objects {old * 1e3:8.1f} ms, columns {new * 1e3:8.1f} ms, '
+              f'speedup {old / new:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Сравнение задержки одиночных операций SqliteRepository с открытием
+соединения на каждую операцию (прежнее поведение) и с общими соединениями
+ConnectionManager.
+
+Запуск из корня проекта:
+python -m benchmarks.bench_connections
+"""
+
+import os
+import sqlite3
+import tempfile
+from timeit import timeit
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.repository.connection import ConnectionManager
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+
+N = 2000
+
+
+def connect_per_operation(db_file: str, pk: int) -> None:
+    """ Прежнее поведение: новое соединение и pragma на каждый вызов get """
+    with sqlite3.connect(db_file) as con:
+        con.row_factory = sqlite3.Row
+        cur = con.cursor()
+        cur.execute('PRAGMA foreign_keys = ON')
+        cur.execute('SELECT * FROM budget WHERE pk=(?)', [pk])
+        cur.fetchall()
+    con.close()
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'bench.db')
+        manager = ConnectionManager(db_file)
+        repo = SqliteRepository(db_file, Budget, connections=manager)
+        pk = repo.add(Budget(budget=100))
+
+        old = timeit(lambda: connect_per_operation(db_file, pk), number=N)
+        new = timeit(lambda: repo.get(pk), number=N)
+        print(f'get, connect per operation: {old / N * 1e6:8.1f} us/op')
+        print(f'get, pooled connection:     {new / N * 1e6:8.1f} us/op')
+        print(f'speedup: {old / new:.1f}x')
+        manager.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Замеры DurableMemoryRepository: скорость записи при разных политиках fsync
+и время запуска (восстановления состояния) для ROWS трат из снимка и из
+журнала.
+
+Запуск из корня проекта (число трат можно передать аргументом):
+python -m benchmarks.bench_durable [ROWS]
+"""
+
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.durable_repository import (
+    FSYNC_POLICIES, DurableMemoryRepository
+)
+
+WRITES = 2000
+
+
+def expense(i: int) -> Expense:
+    """ Трата для замеров """
+    return Expense(amount=i % 1000, category=i % 50,
+                   expense_date='2023-03-01 12:00:00', added_date='2023-03-01 12:00:00')
+
+
+def writes_per_second(tmp: str, fsync: str) -> float:
+    """ Число добавлений в секунду при политике fsync """
+    repo = DurableMemoryRepository(os.path.join(tmp, fsync), Expense, fsync=fsync)
+    start = perf_counter()
+    for i in range(WRITES):
+        repo.add(expense(i))
+    repo.sync()
+    elapsed = perf_counter() - start
+    repo.close()
+    return WRITES / elapsed
+
+
+def startup(path: str) -> float:
+    """ Время создания репозитория по существующим файлам """
+    start = perf_counter()
+    DurableMemoryRepository(path, Expense, snapshot_every=None)
+    return perf_counter() - start
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        for fsync in FSYNC_POLICIES:
+            print(f'fsync={fsync:6}: {writes_per_second(tmp, fsync):10.0f} writes/s')
+
+        path = os.path.join(tmp, 'startup')
+        repo = DurableMemoryRepository(path, Expense, fsync='close', snapshot_every=None)
+        repo.add_many(expense(i) for i in range(rows))
+        repo.sync()
+        print(f'startup from log, {rows} expenses:      {startup(path):6.2f} s')
+        repo.close()
+        print(f'startup from snapshot, {rows} expenses: {startup(path):6.2f} s')
+        size = os.path.getsize(path + '.snapshot') / rows
+        print(f'snapshot size: {size:.0f} bytes/expense')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Время и память экспорта трат из SqliteRepository в CSV (с gzip и без)
+для 1/10 от ROWS и для ROWS трат: потоковый экспорт (expense_rows) и
+экспорт через get_all, загружающий таблицу в память целиком.
+
+Запуск из корня проекта (число трат можно передать аргументом):
+python -m benchmarks.bench_export [ROWS]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+from time import perf_counter
+from typing import Any, Callable
+
+from bookkeeper.exporter import EXPENSE_COLUMNS, expense_rows, open_output, write_rows
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+
+
+def expenses(rows: int) -> list[Expense]:
+    """ Случайные траты за три года """
+    rnd = random.Random(0)
+    start = date(2020, 1, 1)
+    return [Expense(amount=rnd.randrange(1000), category=1 + rnd.randrange(4),
+                    expense_date=f'{start + timedelta(days=rnd.randrange(1095))} '
+                                 f'{rnd.randrange(24):02d}:00:00',
+                    comment=rnd.choice(['', 'обед', 'такси']))
+            for _ in range(rows)]
+
+
+def measure(fn: Callable[[], Any]) -> tuple[float, float]:
+    """ Время в секундах и наибольшая занятая память в МиБ """
+    tracemalloc.start()
+    start = perf_counter()
+    fn()
+    elapsed = perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    for rows in (total // 10, total):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_file = os.path.join(tmp, 'export.db')
+            cat_repo = SqliteRepository(db_file=db_file, cls=Category)
+            Category.create_from_tree([('продукты', None), ('мясо', 'продукты'),
+                                       ('книги', None), ('одежда', None)], cat_repo)
+            exp_repo = SqliteRepository(db_file=db_file, cls=Expense)
+            exp_repo.add_many(expenses(rows))
+
+            def streaming(name: str) -> None:
+                with open_output(os.path.join(tmp, name)) as file:
+                    write_rows(file, expense_rows(exp_repo, cat_repo), EXPENSE_COLUMNS)
+
+            def loaded() -> None:
+                names = {cat.pk: cat.name for cat in cat_repo.get_all()}
+                with open(os.path.join(tmp, 'loaded.csv'), 'w', encoding='utf-8',
+                          newline='') as file:
+                    writer = csv.writer(file)
+                    for exp in exp_repo.get_all(order_by='expense_date'):
+                        writer.writerow([exp.pk, exp.expense_date, exp.amount,
+                                         names[exp.category], exp.comment])
+
+            for name, fn in [('get_all', loaded),
+                             ('stream csv', lambda: streaming('out.csv')),
+                             ('stream csv.gz', lambda: streaming('out.csv.gz'))]:
+                elapsed, peak = measure(fn)
+                print(f'{rows:>9} rows, {name:13}: {elapsed:6.1f} s, '
+                      f'peak memory {peak:8.1f} MiB')
+            exp_repo.connections.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Скорость и память импорта ROWS трат из CSV в SqliteRepository.
+
+Запуск из корня проекта (число трат можно передать аргументом):
+python -m benchmarks.bench_import [ROWS]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+from time import perf_counter
+
+from bookkeeper.importer import ColumnMapping, CsvImporter
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+
+
+def write_statement(path: str, rows: int) -> None:
+    """ Выписка с отрицательными суммами, датами ДД.ММ.ГГГГ и путями категорий """
+    rnd = random.Random(0)
+    categories = ['продукты / мясо', 'продукты / сладости', 'книги', 'мясо', 'одежда']
+    start = date(2020, 1, 1)
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file, delimiter=';')
+        writer.writerow(['Дата', 'Сумма', 'Категория', 'Описание'])
+        for _ in range(rows):
+            day = start + timedelta(days=rnd.randrange(1095))
+            moment = f'{day:%d.%m.%Y} {rnd.randrange(24):02d}:{rnd.randrange(60):02d}'
+            writer.writerow([moment, f'-{rnd.randrange(100000)},{rnd.randrange(100):02d}',
+                             rnd.choice(categories),
+                             rnd.choice(['', 'магазин', 'такси'])])
+
+
+def import_file(csv_path: str, db_file: str) -> int:
+    """ Импортировать выписку в новую базу, вернуть число трат """
+    cat_repo = SqliteRepository(db_file=db_file, cls=Category)
+    Category.create_from_tree([('продукты', None), ('мясо', 'продукты'),
+                               ('сладости', 'продукты'), ('книги', None)], cat_repo)
+    exp_repo = SqliteRepository(db_file=db_file, cls=Expense)
+    importer = CsvImporter(exp_repo, cat_repo,
+                           ColumnMapping('Сумма', 'Дата', 'Категория', 'Описание',
+                                         negate=True),
+                           create_categories=True)
+    with open(csv_path, encoding='utf-8', newline='') as file:
+        result = importer.run(file, delimiter=';')
+    exp_repo.connections.close()
+    return result.imported
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'statement.csv')
+        write_statement(csv_path, rows)
+        start = perf_counter()
+        imported = import_file(csv_path, os.path.join(tmp, 'timed.db'))
+        elapsed = perf_counter() - start
+        # tracemalloc замедляет импорт, поэтому память измеряется отдельно
+        tracemalloc.start()
+        import_file(csv_path, os.path.join(tmp, 'traced.db'))
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    print(f'imported {imported} rows in {elapsed:.1f} s: '
+          f'{imported / elapsed * 60:,.0f} rows/min, peak memory {peak:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
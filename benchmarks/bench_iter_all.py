@@ -0,0 +1,48 @@
+"""
+Сравнение пикового потребления памяти при переборе таблицы расходов
+через get_all и через iter_all.
+
+Запуск из корня проекта:
+python -m benchmarks.bench_iter_all
+"""
+
+import os
+import tempfile
+import tracemalloc
+from typing import Callable, Iterable
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.connection import ConnectionManager
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+
+SIZES = [10_000, 100_000]
+
+
+def peak_memory(read: Callable[[], Iterable[Expense]]) -> tuple[int, int]:
+    """ Вернуть сумму трат и пиковое потребление памяти при переборе """
+    tracemalloc.start()
+    total = sum(exp.amount for exp in read())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return total, peak
+
+
+def main() -> None:
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_file = os.path.join(tmp, 'bench.db')
+            manager = ConnectionManager(db_file)
+            SqliteRepository(db_file, Category, connections=manager).add(Category('cat'))
+            repo = SqliteRepository(db_file, Expense, connections=manager)
+            repo.add_many(Expense(i % 1000, 1, comment='comment') for i in range(size))
+
+            _, old = peak_memory(repo.get_all)
+            _, new = peak_memory(repo.iter_all)
+            print(f'{size:>8} rows: get_all peak {old / 2**20:7.1f} MiB, '
+                  f'iter_all peak {new / 2**20:7.1f} MiB')
+            manager.close()
+
+
+if __name__ == '__main__':
+    main()
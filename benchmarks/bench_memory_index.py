@@ -0,0 +1,49 @@
+"""
+Сравнение get_all MemoryRepository с условием на равенство и на диапазон
+дат без индексов (просмотр всех объектов) и с индексами.
+
+Запуск из корня проекта:
+python -m benchmarks.bench_memory_index
+"""
+
+import random
+from datetime import date, timedelta
+from timeit import timeit
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import date_range
+
+ROWS = 100_000
+N = 100
+
+
+def fill(repo: MemoryRepository[Expense]) -> None:
+    """ Заполнить репозиторий одинаковыми случайными тратами """
+    rnd = random.Random(0)
+    start = date(2020, 1, 1)
+    for _ in range(ROWS):
+        day = start + timedelta(days=rnd.randrange(3 * 365))
+        repo.add(Expense(amount=rnd.randrange(1000), category=rnd.randrange(200),
+                         expense_date=f'{day.isoformat()} 12:00:00'))
+
+
+def main() -> None:
+    plain = MemoryRepository[Expense]()
+    indexed = MemoryRepository[Expense](indexes=['category'],
+                                        sorted_indexes=['expense_date'])
+    fill(plain)
+    fill(indexed)
+    queries = {
+        'category = 17': {'category': 17},
+        'one week': {'expense_date': date_range(date(2021, 5, 3), date(2021, 5, 10))},
+    }
+    for name, where in queries.items():
+        old = timeit(lambda: plain.get_all(where), number=N)
+        new = timeit(lambda: indexed.get_all(where), number=N)
+        print(f'{name}: scan {old / N * 1e3:8.2f} ms, '
+              f'index {new / N * 1e3:8.3f} ms, speedup {old / new:.0f}x')
+
+
+if __name__ == '__main__':
+    main()
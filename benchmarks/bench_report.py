@@ -0,0 +1,100 @@
+"""
+Сравнение отчета о тратах (SpendingReport) с наивным подсчетом для ROWS
+трат и дерева из 50 категорий: наивный подсчет для каждой категории
+получает подкатегории (get_subcategories) и суммирует траты поддерева
+(get_all), отчет строится одним проходом по тратам.
+
+Запуск из корня проекта (число трат можно передать аргументом):
+python -m benchmarks.bench_report [ROWS]
+"""
+
+import os
+import random
+import sys
+import tempfile
+from datetime import date, timedelta
+from time import perf_counter
+from typing import Any, Callable
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.models.report import SpendingReport
+from bookkeeper.repository.columnar_repository import ColumnarExpenseRepository
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import In
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+
+CATEGORIES = 50
+
+
+def tree() -> list[tuple[str, str | None]]:
+    """ Дерево категорий: 5 верхнего уровня, остальные вложены в предыдущие """
+    rnd = random.Random(0)
+    names = [f'c{i}' for i in range(CATEGORIES)]
+    return [(name, None if i < 5 else names[rnd.randrange(i // 2, i)])
+            for i, name in enumerate(names)]
+
+
+def expenses(rows: int) -> list[Expense]:
+    """ Случайные траты за год """
+    rnd = random.Random(0)
+    start = date(2023, 1, 1)
+    return [Expense(amount=rnd.randrange(1000), category=1 + rnd.randrange(CATEGORIES),
+                    expense_date=f'{start + timedelta(days=rnd.randrange(365))} '
+                                 f'{rnd.randrange(24):02d}:00:00')
+            for _ in range(rows)]
+
+
+def timed(fn: Callable[[], Any]) -> tuple[Any, float]:
+    """ Результат и время вызова в секундах """
+    start = perf_counter()
+    result = fn()
+    return result, perf_counter() - start
+
+
+def naive_rollup(exp_repo: MemoryRepository[Expense],
+                 cat_repo: MemoryRepository[Category]) -> dict[int, int]:
+    """ Суммы с подкатегориями через get_subcategories и get_all """
+    totals = {}
+    for cat in cat_repo.get_all():
+        subtree = [cat.pk] + [sub.pk for sub in cat.get_subcategories(cat_repo)]
+        totals[cat.pk] = sum(exp.amount for exp in
+                             exp_repo.get_all({'category': In(subtree)}))
+    return totals
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    data = expenses(rows)
+    cat_repo = MemoryRepository[Category]()
+    Category.create_from_tree(tree(), cat_repo)
+
+    memory = MemoryRepository[Expense]()
+    memory.add_many(Expense(e.amount, e.category, e.expense_date) for e in data)
+    columnar = ColumnarExpenseRepository()
+    columnar.add_many(Expense(e.amount, e.category, e.expense_date) for e in data)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'report.db')
+        sqlite_cats = SqliteRepository(db_file=db_file, cls=Category)
+        Category.create_from_tree(tree(), sqlite_cats)
+        sqlite = SqliteRepository(db_file=db_file, cls=Expense)
+        sqlite.add_many(Expense(e.amount, e.category, e.expense_date) for e in data)
+
+        expected, naive = timed(lambda: naive_rollup(memory, cat_repo))
+        print(f'naive rollup (memory):          {naive * 1e3:9.1f} ms')
+        for name, exp_repo, cats in [('memory', memory, cat_repo),
+                                     ('columnar', columnar, cat_repo),
+                                     ('sqlite', sqlite, sqlite_cats)]:
+            report, load = timed(lambda: SpendingReport.load(exp_repo, cats))
+            rollup, roll = timed(report.rollup)
+            _, months = timed(lambda: report.by_period('month'))
+            _, weeks = timed(lambda: report.by_period('week'))
+            assert rollup == expected
+            print(f'report ({name + "):":10} load {load * 1e3:9.1f} ms, '
+                  f'rollup {roll * 1e3:6.2f} ms, months {months * 1e3:6.2f} ms, '
+                  f'weeks {weeks * 1e3:6.2f} ms, speedup {naive / (load + roll):.1f}x')
+        sqlite.connections.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Сравнение пропускной способности добавления трат по одной (фиксация
+на каждую операцию) и через WriteBehindRepository (групповая фиксация).
+Замер выполняется для synchronous NORMAL (по умолчанию) и FULL, когда
+каждая фиксация сопровождается fsync.
+
+Запуск из корня проекта:
+python -m benchmarks.bench_write_behind
+"""
+
+import os
+import tempfile
+from time import perf_counter
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.connection import ConnectionManager
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+from bookkeeper.repository.write_behind import WriteBehindRepository
+
+N = 5000
+
+
+def writes_per_second(synchronous: str, write_behind: bool) -> float:
+    """ Число добавленных в секунду трат """
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'bench.db')
+        manager = ConnectionManager(db_file, synchronous=synchronous)
+        SqliteRepository(db_file, Category, connections=manager).add(Category('food'))
+        repo = SqliteRepository(db_file, Expense, connections=manager)
+        start = perf_counter()
+        if write_behind:
+            queue = WriteBehindRepository(repo)
+            futures = [queue.add(Expense(amount=i, category=1)) for i in range(N)]
+            queue.close()
+            assert futures[-1].result() == N
+        else:
+            for i in range(N):
+                repo.add(Expense(amount=i, category=1))
+        elapsed = perf_counter() - start
+        manager.close()
+    return N / elapsed
+
+
+def main() -> None:
+    for synchronous in ('NORMAL', 'FULL'):
+        direct = writes_per_second(synchronous, write_behind=False)
+        grouped = writes_per_second(synchronous, write_behind=True)
+        print(f'synchronous={synchronous}')
+        print(f'  add per commit: {direct:10.0f} writes/s')
+        print(f'  write-behind:   {grouped:10.0f} writes/s')
+        print(f'  speedup: {grouped / direct:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
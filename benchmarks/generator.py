@@ -0,0 +1,53 @@
+"""
+Генератор синтетических данных для бенчмарков
+
+Все функции детерминированы: одинаковые аргументы (включая seed) дают
+одинаковые данные в любом запуске, поэтому результаты разных запусков
+можно сравнивать между собой.
+"""
+
+import random
+from datetime import date, timedelta
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.expense import Expense
+
+START = date(2020, 1, 1)
+DAYS = 3 * 365
+COMMENTS = ['', '', '', 'обед', 'такси', 'подарок', 'по акции']
+
+
+def category_tree(count: int, roots: int = 5,
+                  seed: int = 0) -> list[tuple[str, str | None]]:
+    """
+    Дерево из count категорий в виде пар "потомок-родитель" в порядке
+    топологической сортировки (см. Category.create_from_tree).
+    Родитель i-й категории выбирается среди категорий с номерами от i/2
+    до i, поэтому глубина дерева растет с его размером (около 25 уровней
+    для тысячи категорий).
+    """
+    rnd = random.Random(seed)
+    return [(f'c{i}', None if i < roots else f'c{rnd.randrange(i // 2, i)}')
+            for i in range(count)]
+
+
+def expenses(count: int, categories: int, seed: int = 0) -> list[Expense]:
+    """
+    count трат за три года с категориями 1..categories (pk в порядке
+    category_tree), суммами до 5000 и случайными комментариями
+    """
+    rnd = random.Random(seed)
+    return [Expense(amount=rnd.randrange(1, 5000),
+                    category=1 + rnd.randrange(categories),
+                    expense_date=f'{START + timedelta(days=rnd.randrange(DAYS))} '
+                                 f'{rnd.randrange(24):02d}:{rnd.randrange(60):02d}:00',
+                    added_date=f'{START + timedelta(days=DAYS)} 00:00:00',
+                    comment=rnd.choice(COMMENTS))
+            for _ in range(count)]
+
+
+def budgets(count: int, seed: int = 0) -> list[Budget]:
+    """ count бюджетов со случайными лимитами и текущими суммами """
+    rnd = random.Random(seed)
+    return [Budget(budget=rnd.randrange(1000, 100_000), cur_sum=rnd.randrange(1000))
+            for _ in range(count)]
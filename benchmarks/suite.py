@@ -0,0 +1,257 @@
+"""
+Набор бенчмарков репозиториев с результатами в JSON
+
+Для каждого размера (число трат) и каждого вида репозитория данные
+генерируются заново (benchmarks.generator, с одним seed) и измеряются:
+- fill - заполнение таблицы через add_many;
+- add, get, update, delete - одиночные операции (ops раз);
+- get_all_category, get_all_month - get_all с условием на категорию
+  и на месяц дат;
+- scan - полный перебор через iter_all;
+- table_fill - чтение первых страниц таблицы трат с категориями
+  (ExpenseRows, как в ExpensesModel);
+- category_fill, category_parents, category_subcategories - создание
+  дерева категорий и обходы иерархии вверх и вниз;
+- budget_fill, budget_get, budget_update - операции с бюджетами.
+Категорий в 100 раз, бюджетов - в 1000 раз меньше, чем трат.
+
+Результаты записываются в JSON (--output) и могут быть сравнены
+с результатами предыдущего запуска (--compare). Время одного запуска
+заметно колеблется, поэтому набор можно выполнить несколько раз
+(--repeat) и взять для каждой операции наименьшее время.
+
+Запуск из корня проекта:
+python -m benchmarks.suite --sizes 10000 100000 1000000 --output results.json
+python -m benchmarks.suite --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import date, datetime
+from functools import partial
+from time import perf_counter
+from typing import Any, Callable, Sequence
+
+from benchmarks.generator import budgets, category_tree, expenses
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.columnar_repository import ColumnarExpenseRepository
+from bookkeeper.repository.expense_rows import ExpenseRows
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import Range, date_range
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+
+REPOS = ('memory', 'sqlite', 'columnar')
+PAGE_SIZE = 200
+
+
+class Suite:
+    """
+    Измерения для одного размера и одного вида репозитория.
+    kind - вид репозитория (REPOS), size - число трат,
+    ops - число одиночных операций, seed - seed генератора данных
+    """
+
+    def __init__(self, kind: str, size: int, ops: int, seed: int, tmp: str) -> None:
+        self.kind = kind
+        self.size = size
+        self.ops = ops
+        self.seed = seed
+        self.tmp = tmp
+        self.results: list[dict[str, Any]] = []
+        self.rnd = random.Random(seed)
+
+    def repo(self, cls: type) -> AbstractRepository[Any]:
+        """ Новый пустой репозиторий для модели cls """
+        if self.kind == 'sqlite':
+            return SqliteRepository(db_file=os.path.join(self.tmp, 'bench.db'), cls=cls)
+        if self.kind == 'columnar' and cls is Expense:
+            return ColumnarExpenseRepository()
+        return MemoryRepository()
+
+    def measure(self, op: str, fn: Callable[[], Any], ops: int = 1) -> None:
+        """ Выполнить fn и записать время операции op """
+        start = perf_counter()
+        fn()
+        seconds = perf_counter() - start
+        self.results.append({'repo': self.kind, 'size': self.size, 'op': op,
+                             'ops': ops, 'seconds': round(seconds, 6),
+                             'us_per_op': round(seconds / max(ops, 1) * 1e6, 3)})
+        print(f'{self.kind:9} {self.size:>9} {op:24} {ops:>7} ops '
+              f'{seconds:9.3f} s {seconds / max(ops, 1) * 1e6:12.1f} us/op',
+              file=sys.stderr)
+
+    def run(self) -> list[dict[str, Any]]:
+        """ Выполнить все измерения """
+        cat_repo = self.repo(Category)
+        tree = category_tree(max(self.size // 100, 10), seed=self.seed)
+        self.category_benchmarks(cat_repo, tree)
+        exp_repo = self.repo(Expense)
+        self.expense_benchmarks(exp_repo, cat_repo, len(tree))
+        self.budget_benchmarks(self.repo(Budget))
+        if self.kind == 'sqlite':
+            exp_repo.connections.close()  # type: ignore[attr-defined]
+        return self.results
+
+    def category_benchmarks(self, cat_repo: AbstractRepository[Category],
+                            tree: list[tuple[str, str | None]]) -> None:
+        """ Заполнение дерева категорий и обходы иерархии """
+        self.measure('category_fill', lambda: Category.create_from_tree(tree, cat_repo),
+                     len(tree))
+        pks = [self.rnd.randrange(1, len(tree) + 1) for _ in range(self.ops)]
+        cats = [cat_repo.get(pk) for pk in pks]
+        self.measure('category_parents',
+                     lambda: [list(cat.get_all_parents(cat_repo)) for cat in cats],
+                     len(cats))
+        # верхние уровни, чтобы поддеревья были заметного размера
+        top = [cat_repo.get(self.rnd.randrange(1, min(len(tree), 50) + 1))
+               for _ in range(max(self.ops // 10, 1))]
+        self.measure('category_subcategories',
+                     lambda: [list(cat.get_subcategories(cat_repo)) for cat in top],
+                     len(top))
+
+    def expense_benchmarks(self, exp_repo: AbstractRepository[Expense],
+                           cat_repo: AbstractRepository[Category],
+                           categories: int) -> None:
+        """ Операции с тратами """
+        data = expenses(self.size, categories, self.seed)
+        self.measure('fill', partial(exp_repo.add_many, data), len(data))
+        del data
+        extra = expenses(self.ops, categories, self.seed + 1)
+        self.measure('add', lambda: [exp_repo.add(exp) for exp in extra], self.ops)
+        pks = [self.rnd.randrange(1, self.size + 1) for _ in range(self.ops)]
+        self.measure('get', lambda: [exp_repo.get(pk) for pk in pks], self.ops)
+        queries = max(self.ops // 10, 1)
+        wheres = [{'category': self.rnd.randrange(1, categories + 1)}
+                  for _ in range(queries)]
+        self.measure('get_all_category',
+                     lambda: [exp_repo.get_all(where) for where in wheres], queries)
+        months = [date(2020 + self.rnd.randrange(3), 1 + self.rnd.randrange(12), 1)
+                  for _ in range(queries)]
+        wheres = [{'expense_date': date_range(month, date(month.year + month.month // 12,
+                                                          month.month % 12 + 1, 1))}
+                  for month in months]
+        self.measure('get_all_month',
+                     lambda: [exp_repo.get_all(where) for where in wheres], queries)
+        self.measure('scan', lambda: sum(exp.amount for exp in exp_repo.iter_all()),
+                     self.size)
+        self.measure('table_fill', lambda: self.table_fill(exp_repo, cat_repo),
+                     10 * PAGE_SIZE)
+        objs = [exp for exp in map(exp_repo.get, pks) if exp is not None]
+        for exp in objs:
+            exp.amount += 1
+        self.measure('update', lambda: [exp_repo.update(exp) for exp in objs], len(objs))
+        doomed = sorted({exp.pk for exp in objs})
+        self.measure('delete', lambda: [exp_repo.delete(pk) for pk in doomed],
+                     len(doomed))
+
+    @staticmethod
+    def table_fill(exp_repo: AbstractRepository[Expense],
+                   cat_repo: AbstractRepository[Category]) -> None:
+        """ Первые 10 страниц таблицы трат, как при прокрутке ExpensesModel """
+        rows = ExpenseRows(exp_repo, cat_repo)
+        last_pk = 0
+        for _ in range(10):
+            page = rows.get_all({'pk': Range(last_pk + 1)}, 'pk', PAGE_SIZE)
+            if not page:
+                break
+            last_pk = page[-1].expense.pk
+
+    def budget_benchmarks(self, budget_repo: AbstractRepository[Budget]) -> None:
+        """ Операции с бюджетами """
+        data = budgets(max(self.size // 1000, 3), self.seed)
+        self.measure('budget_fill', lambda: budget_repo.add_many(data), len(data))
+        pks = [self.rnd.randrange(1, len(data) + 1) for _ in range(self.ops)]
+        self.measure('budget_get', lambda: [budget_repo.get(pk) for pk in pks], self.ops)
+        objs = [budget_repo.get(pk) for pk in pks[:len(data)]]
+        self.measure('budget_update', lambda: [budget_repo.update(b) for b in objs],
+                     len(objs))
+
+
+def metadata(seed: int, ops: int) -> dict[str, Any]:
+    """ Условия запуска: версии, платформа, ревизия git """
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                  capture_output=True, text=True, check=True,
+                                  timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        revision = None
+    return {'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(), 'revision': revision,
+            'seed': seed, 'ops': ops}
+
+
+def compare(results: list[dict[str, Any]], baseline: dict[str, Any],
+            threshold: float) -> int:
+    """
+    Вывести отношение времени операций к baseline; вернуть число операций,
+    ставших медленнее более чем в threshold раз
+    """
+    old = {(r['repo'], r['size'], r['op']): r['us_per_op'] for r in baseline['results']}
+    regressions = 0
+    print(f'{"repo":9} {"size":>9} {"op":24} {"old us/op":>12} {"new us/op":>12} ratio')
+    for result in results:
+        key = (result['repo'], result['size'], result['op'])
+        if key not in old:
+            continue
+        ratio = result['us_per_op'] / old[key] if old[key] else float('inf')
+        mark = ' slower' if ratio > threshold else ''
+        regressions += ratio > threshold
+        print(f'{key[0]:9} {key[1]:>9} {key[2]:24} {old[key]:12.1f} '
+              f'{result["us_per_op"]:12.1f} {ratio:5.2f}{mark}')
+    return regressions
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """ Запуск из командной строки, см. описание модуля """
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repos', nargs='+', choices=REPOS, default=list(REPOS))
+    parser.add_argument('--ops', type=int, default=1000,
+                        help='number of single operations per benchmark')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='run the suite several times and keep the best time')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of a previous run')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='ratio to the previous run reported as a regression')
+    args = parser.parse_args(argv)
+
+    best: dict[tuple[str, int, str], dict[str, Any]] = {}
+    for _ in range(args.repeat):
+        for size in args.sizes:
+            for kind in args.repos:
+                with tempfile.TemporaryDirectory() as tmp:
+                    for result in Suite(kind, size, args.ops, args.seed, tmp).run():
+                        key = (kind, size, result['op'])
+                        if key not in best or result['seconds'] < best[key]['seconds']:
+                            best[key] = result
+    results = list(best.values())
+    report = {'meta': {**metadata(args.seed, args.ops), 'repeat': args.repeat},
+              'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=1)
+    elif not args.compare:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+        return 1 if compare(results, baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Экспорт трат и категорий в CSV и JSON Lines, дамп базы sqlite
+
+Траты читаются из репозитория через iter_all (для sqlite - курсором,
+порциями по batch_size строк) и сразу записываются в файл, поэтому
+занятая память не зависит от числа трат. Названия и пути категорий
+берутся из словаря, построенного одним запросом (ExpenseRows.categories).
+Файл может быть сжат gzip или lzma (xz); сжатие и формат определяются по
+расширению имени файла, например expenses.jsonl.gz.
+
+Запуск из командной строки:
+python -m bookkeeper.exporter expenses.csv.gz --db project_db.db \\
+    --start 2023-01-01 --end 2024-01-01 --category продукты
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import lzma
+import sqlite3
+import sys
+from collections import defaultdict
+from contextlib import nullcontext
+from datetime import date, datetime
+from typing import Any, Iterable, Iterator, Sequence, TextIO
+
+from bookkeeper.importer import CategoryMap
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.connection import ConnectionManager
+from bookkeeper.repository.expense_rows import ExpenseRows
+from bookkeeper.repository.migrations import migrate
+from bookkeeper.repository.query import In, date_range
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+
+FORMATS = ('csv', 'jsonl', 'sql')
+
+COMPRESSIONS = {'.gz': 'gzip', '.xz': 'xz', '.lzma': 'xz'}
+
+EXPENSE_COLUMNS = ['pk', 'expense_date', 'amount', 'category', 'category_name',
+                   'category_path', 'comment', 'added_date']
+
+CATEGORY_COLUMNS = ['pk', 'name', 'parent', 'path']
+
+
+def open_output(path: str, compression: str | None = None) -> TextIO:
+    """
+    Открыть файл для записи текста, сжимая его gzip или xz (lzma).
+    Если compression не задано, сжатие определяется по расширению.
+    """
+    if compression is None:
+        compression = next((name for suffix, name in COMPRESSIONS.items()
+                            if path.endswith(suffix)), 'none')
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    if compression == 'xz':
+        return lzma.open(path, 'wt', encoding='utf-8', newline='')
+    if compression == 'none':
+        return open(  # pylint: disable=consider-using-with
+            path, 'w', encoding='utf-8', newline='')
+    raise ValueError(f'unknown compression {compression!r}')
+
+
+def format_from_path(path: str) -> str:
+    """ Формат по расширению имени файла без расширения сжатия """
+    for suffix in COMPRESSIONS:
+        if path.endswith(suffix):
+            path = path[:-len(suffix)]
+    suffix = path.rsplit('.', 1)[-1]
+    return suffix if suffix in FORMATS else 'csv'
+
+
+def write_rows(file: TextIO, rows: Iterable[dict[str, Any]], columns: list[str],
+               fmt: str = 'csv') -> int:
+    """
+    Записать строки (словари с ключами columns) в формате fmt ('csv' -
+    с заголовком, 'jsonl' - объект JSON в строке). Вернуть число строк.
+    """
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([row[column] for column in columns])
+            count += 1
+    elif fmt == 'jsonl':
+        for row in rows:
+            file.write(json.dumps(row, ensure_ascii=False))
+            file.write('\n')
+            count += 1
+    else:
+        raise ValueError(f'unknown format {fmt!r}')
+    return count
+
+
+def expense_rows(exp_repo: AbstractRepository[Expense],
+                 cat_repo: AbstractRepository[Category],
+                 start: date | datetime | str | None = None,
+                 end: date | datetime | str | None = None,
+                 categories: Sequence[int] | None = None,
+                 subcategories: bool = True,
+                 batch_size: int = 1000) -> Iterator[dict[str, Any]]:
+    """
+    Траты с названиями и путями категорий в порядке дат.
+    start, end - полуинтервал дат трат [start, end)
+    categories - pk категорий, траты которых выгружаются
+    subcategories - выгружать также траты подкатегорий categories
+    """
+    names = ExpenseRows(exp_repo, cat_repo).categories()
+    where: dict[str, Any] = {}
+    if start is not None or end is not None:
+        where['expense_date'] = date_range(start, end)
+    if categories is not None:
+        pks = _with_subcategories(cat_repo, categories) if subcategories \
+            else set(categories)
+        where['category'] = In(sorted(pks))
+    for exp in exp_repo.iter_all(where or None, 'expense_date', batch_size):
+        name, path = names.get(exp.category, ('', ''))
+        yield {'pk': exp.pk, 'expense_date': exp.expense_date, 'amount': exp.amount,
+               'category': exp.category, 'category_name': name, 'category_path': path,
+               'comment': exp.comment, 'added_date': exp.added_date}
+
+
+def _with_subcategories(cat_repo: AbstractRepository[Category],
+                        categories: Sequence[int]) -> set[int]:
+    """ pk категорий categories и всех их подкатегорий (одним запросом) """
+    children: dict[int | None, list[int]] = defaultdict(list)
+    for cat in cat_repo.get_all():
+        children[cat.parent].append(cat.pk)
+    pks: set[int] = set()
+    stack = list(categories)
+    while stack:
+        pk = stack.pop()
+        if pk not in pks:
+            pks.add(pk)
+            stack.extend(children[pk])
+    return pks
+
+
+def category_rows(exp_repo: AbstractRepository[Expense],
+                  cat_repo: AbstractRepository[Category]) -> Iterator[dict[str, Any]]:
+    """ Категории с путями от верхнего уровня """
+    names = ExpenseRows(exp_repo, cat_repo).categories()
+    for cat in cat_repo.get_all(order_by='pk'):
+        yield {'pk': cat.pk, 'name': cat.name, 'parent': cat.parent,
+               'path': names[cat.pk][1]}
+
+
+def dump_sqlite(connections: ConnectionManager, file: TextIO) -> int:
+    """
+    Записать дамп базы данных (SQL, как .dump в sqlite3) по одной
+    инструкции. Вернуть число инструкций.
+    """
+    count = 0
+    for statement in connections.connection().iterdump():
+        file.write(statement)
+        file.write('\n')
+        count += 1
+    return count
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """ Экспорт из командной строки, см. описание модуля """
+    parser = argparse.ArgumentParser(prog='python -m bookkeeper.exporter',
+                                     description='Export expenses or categories')
+    parser.add_argument('file', help='output file ("-" for standard output)')
+    parser.add_argument('--db', default='bookkeeper/repository/project_db.db')
+    parser.add_argument('--table', choices=['expense', 'category'], default='expense')
+    parser.add_argument('--format', choices=FORMATS,
+                        help='output format, by default from the file name')
+    parser.add_argument('--compression', choices=['gzip', 'xz', 'none'],
+                        help='by default from the file name')
+    parser.add_argument('--start', help='first date, e.g. 2023-01-01')
+    parser.add_argument('--end', help='date after the last one')
+    parser.add_argument('--category', action='append',
+                        help='category name or path, may be repeated')
+    parser.add_argument('--no-subcategories', action='store_true')
+    args = parser.parse_args(argv)
+
+    connections = ConnectionManager.for_file(args.db)
+    migrate(connections.connection())
+    exp_repo: SqliteRepository[Expense] = SqliteRepository(
+        db_file=args.db, cls=Expense, connections=connections)
+    cat_repo: SqliteRepository[Category] = SqliteRepository(
+        db_file=args.db, cls=Category, connections=connections)
+    fmt = args.format or format_from_path(args.file)
+    try:
+        categories = None if args.category is None else \
+            [CategoryMap(cat_repo).resolve(name) for name in args.category]
+        output = nullcontext(sys.stdout) if args.file == '-' \
+            else open_output(args.file, args.compression)
+        with output as file:
+            if fmt == 'sql':
+                count = dump_sqlite(connections, file)
+            elif args.table == 'category':
+                count = write_rows(file, category_rows(exp_repo, cat_repo),
+                                   CATEGORY_COLUMNS, fmt)
+            else:
+                count = write_rows(file, expense_rows(exp_repo, cat_repo, args.start,
+                                                      args.end, categories,
+                                                      not args.no_subcategories),
+                                   EXPENSE_COLUMNS, fmt)
+    except (ValueError, sqlite3.Error) as error:
+        print(f'export failed: {error}', file=sys.stderr)
+        return 1
+    finally:
+        connections.close()
+    print(f'exported {count} records', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
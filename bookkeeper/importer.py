@@ -0,0 +1,407 @@
+"""
+Импорт трат из файлов CSV (в том числе банковских выписок)
+
+Файл читается потоково: строки разбираются по одной, переводятся в Expense
+и добавляются в репозиторий порциями по chunk_size через add_many, так что
+каждая порция - одна транзакция, а в памяти одновременно находится не больше
+одной порции. Для каждой строки:
+- значения берутся из столбцов, заданных ColumnMapping (по имени
+  в заголовке или по номеру);
+- дата приводится к формату хранения (ISO 8601, см. Expense);
+- сумма переводится в целое число;
+- категория находится по названию или по пути ('продукты / мясо')
+  в словаре категорий, построенном одним запросом (CategoryMap).
+
+Дерево категорий импортируется из текста с отступами (см. read_tree)
+функцией import_category_tree: все категории добавляются одной транзакцией,
+уже существующие (с тем же путем) не дублируются.
+
+Запуск из командной строки:
+python -m bookkeeper.importer statement.csv --db project_db.db \\
+    --date 'Дата операции' --amount 'Сумма' --category 'Категория' \\
+    --delimiter ';' --encoding cp1251 --negate
+python -m bookkeeper.importer --db project_db.db --category-tree categories.txt
+"""
+
+import argparse
+import csv
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Iterable, Iterator, Sequence, TextIO
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense, now
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.connection import ConnectionManager
+from bookkeeper.repository.migrations import migrate
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+from bookkeeper.repository.unit_of_work import unit_of_work
+from bookkeeper.utils import chunked, read_tree
+
+DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M',
+                '%Y-%m-%d', '%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M', '%d.%m.%Y',
+                '%d/%m/%Y, %H:%M', '%H:%M, %d/%m/%Y', '%d/%m/%Y')
+
+PATH_SEPARATOR = ' / '
+
+
+class RowError(ValueError):
+    """ Ошибка разбора строки файла """
+
+
+class DateParser:
+    """
+    Приведение дат к формату хранения (ISO 8601 с точностью до секунд).
+    formats - форматы strptime, которые пробуются по порядку. Формат,
+    подошедший последним, пробуется первым: в одном файле даты обычно
+    записаны одинаково, и для большинства строк хватает одной попытки.
+    """
+
+    def __init__(self, formats: Sequence[str] = DATE_FORMATS) -> None:
+        self.formats = list(formats)
+
+    def __call__(self, value: str) -> str:
+        value = value.strip()
+        for i, fmt in enumerate(self.formats):
+            try:
+                moment = datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            if i:
+                self.formats.insert(0, self.formats.pop(i))
+            return moment.isoformat(sep=' ', timespec='seconds')
+        raise RowError(f'unknown date format: {value!r}')
+
+
+def parse_amount(value: str) -> Decimal:
+    """
+    Разобрать сумму, записанную с пробелами между разрядами и запятой
+    или точкой перед дробной частью, например '-1 234,50'
+    """
+    text = value.strip().replace('\xa0', '').replace(' ', '').replace(',', '.')
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        raise RowError(f'invalid amount: {value!r}') from None
+
+
+class CategoryMap:
+    """
+    Поиск категорий по названию или по пути от верхнего уровня.
+    Все категории читаются из репозитория одним запросом при создании.
+    cat_repo - репозиторий с категориями
+    create - создавать отсутствующие категории (путь создается целиком)
+    separator - разделитель названий в пути
+    """
+
+    def __init__(self, cat_repo: AbstractRepository[Category], create: bool = False,
+                 separator: str = PATH_SEPARATOR) -> None:
+        self.cat_repo = cat_repo
+        self.create = create
+        self.separator = separator
+        self._paths: dict[str, int] = {}
+        # названия, встречающиеся у нескольких категорий, отображаются в None
+        self._names: dict[str, int | None] = {}
+        cats = {cat.pk: cat for cat in cat_repo.get_all()}
+        for pk in cats:
+            parts: list[str] = []
+            node: int | None = pk
+            while node is not None and node in cats and len(parts) <= len(cats):
+                parts.append(cats[node].name)
+                node = cats[node].parent
+            self._remember(separator.join(reversed(parts)), cats[pk].name, pk)
+
+    def _remember(self, path: str, name: str, pk: int) -> None:
+        self._paths[path] = pk
+        self._names[name] = pk if name not in self._names else None
+
+    def find(self, path: str) -> int | None:
+        """ pk категории с путем path или None """
+        return self._paths.get(path)
+
+    def resolve(self, value: str) -> int:
+        """ pk категории с названием или путем value """
+        value = value.strip()
+        pk = self._paths.get(value)
+        if pk is not None:
+            return pk
+        if value in self._names:
+            pk = self._names[value]
+            if pk is None:
+                raise RowError(f'ambiguous category name {value!r}, use a path')
+            return pk
+        if not self.create or not value:
+            raise RowError(f'unknown category {value!r}')
+        return self._create(value)
+
+    def _create(self, path: str) -> int:
+        parent: int | None = None
+        prefix = ''
+        for name in path.split(self.separator):
+            prefix = name if parent is None else prefix + self.separator + name
+            pk = self._paths.get(prefix)
+            if pk is None:
+                pk = self.cat_repo.add(Category(name, parent))
+                self._remember(prefix, name, pk)
+            parent = pk
+        assert parent is not None
+        return parent
+
+
+def import_category_tree(lines: Iterable[str], cat_repo: AbstractRepository[Category],
+                         merge: bool = True,
+                         separator: str = PATH_SEPARATOR) -> list[Category]:
+    """
+    Добавить дерево категорий из текста с отступами (см. read_tree) одной
+    транзакцией (см. unit_of_work). pk родителей берутся из словаря путей
+    за один проход по дереву, существующие категории читаются одним запросом.
+    Категория, путь которой уже есть в репозитории, не создается заново:
+    при merge к ней добавляются только новые подкатегории, иначе
+    импорт прерывается с ValueError. ValueError возникает также, если
+    в тексте одна категория встречается дважды.
+    Parameters
+    ----------
+    lines - строки текста (файл или список строк)
+    cat_repo - репозиторий категорий
+    merge - объединять дерево с существующими категориями
+    separator - разделитель названий в пути
+    Returns
+    -------
+    Список созданных категорий в порядке текста
+    """
+    categories = CategoryMap(cat_repo, separator=separator)
+    # путь последней категории с данным названием: родитель в read_tree
+    # задан названием и всегда встречается в тексте последним с этим названием
+    last: dict[str, str] = {}
+    seen: set[str] = set()
+    pks: dict[str, int] = {}
+    created: list[Category] = []
+    with unit_of_work(cat_repo):
+        for name, parent in read_tree(lines):
+            parent_path = None if parent is None else last[parent]
+            path = name if parent_path is None else parent_path + separator + name
+            if path in seen:
+                raise ValueError(f'category {path!r} occurs twice')
+            seen.add(path)
+            last[name] = path
+            pk = categories.find(path)
+            if pk is not None and not merge:
+                raise ValueError(f'category {path!r} already exists')
+            if pk is None:
+                cat = Category(name, None if parent_path is None else pks[parent_path])
+                pk = cat_repo.add(cat)
+                created.append(cat)
+            pks[path] = pk
+    return created
+
+
+@dataclass
+class ColumnMapping:
+    """
+    Соответствие столбцов файла полям траты: имя столбца в заголовке
+    или номер столбца (с нуля). Столбцы comment и category необязательны.
+    default_category - категория строк без столбца или значения категории
+    negate - суммы трат в файле отрицательные (как в банковских выписках),
+    строки с положительными суммами (поступления) пропускаются
+    """
+    amount: str | int
+    date: str | int
+    category: str | int | None = None
+    comment: str | int | None = None
+    default_category: str | None = None
+    negate: bool = False
+
+
+@dataclass
+class ImportResult:
+    """
+    Итог импорта: число добавленных трат, пропущенных строк
+    (поступлений и строк с ошибками) и первые ошибки
+    в виде (номер строки файла, сообщение)
+    """
+    imported: int = 0
+    skipped: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+
+class CsvImporter:  # pylint: disable=too-many-instance-attributes
+    """
+    Потоковый импорт трат из CSV.
+    exp_repo, cat_repo - репозитории трат и категорий
+    mapping - соответствие столбцов полям траты
+    date_formats - форматы дат (см. DateParser)
+    create_categories - создавать отсутствующие категории
+    skip_errors - пропускать строки с ошибками, иначе прервать импорт;
+    уже добавленные порции при этом остаются в репозитории
+    chunk_size - число трат, добавляемых одной транзакцией
+    max_errors - сколько ошибок сохранять в ImportResult
+    """
+
+    def __init__(self, exp_repo: AbstractRepository[Expense],
+                 cat_repo: AbstractRepository[Category], mapping: ColumnMapping,
+                 date_formats: Sequence[str] = DATE_FORMATS,
+                 create_categories: bool = False, skip_errors: bool = False,
+                 chunk_size: int = 5000, max_errors: int = 100) -> None:
+        self.exp_repo = exp_repo
+        self.mapping = mapping
+        self.categories = CategoryMap(cat_repo, create_categories)
+        self.parse_date = DateParser(date_formats)
+        self.skip_errors = skip_errors
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.result = ImportResult()
+
+    def _columns(self, header: list[str] | None) -> list[int | None]:
+        mapping = self.mapping
+        names = None if header is None else [name.strip() for name in header]
+        columns = []
+        for column in (mapping.amount, mapping.date, mapping.category, mapping.comment):
+            if column is None or isinstance(column, int):
+                columns.append(column)
+            elif names is None:
+                raise ValueError(f'column {column!r} is given by name, '
+                                 f'but the file has no header')
+            elif column not in names:
+                raise ValueError(f'column {column!r} not found in header')
+            else:
+                columns.append(names.index(column))
+        return columns
+
+    def _expense(self, row: list[str], columns: list[int | None],
+                 added: str) -> Expense | None:
+        amount_col, date_col, category_col, comment_col = columns
+        width = max(column for column in columns if column is not None) + 1
+        if len(row) < width:
+            raise RowError(f'expected {width} columns, got {len(row)}')
+        amount = parse_amount(row[amount_col])  # type: ignore[index]
+        if self.mapping.negate:
+            amount = -amount
+        if amount <= 0:
+            return None
+        category = row[category_col].strip() if category_col is not None else ''
+        category = category or self.mapping.default_category or ''
+        return Expense(int(amount.to_integral_value(ROUND_HALF_UP)),
+                       self.categories.resolve(category),
+                       self.parse_date(row[date_col]),  # type: ignore[index]
+                       added,
+                       row[comment_col].strip() if comment_col is not None else '')
+
+    def expenses(self, rows: Iterable[list[str]],
+                 header: bool = True) -> Iterator[Expense]:
+        """
+        Перевести строки CSV в траты, пропуская поступления и, если задано
+        skip_errors, строки с ошибками
+        """
+        rows = iter(rows)
+        columns = self._columns(next(rows, None) if header else None)
+        added = now()
+        for line, row in enumerate(rows, start=2 if header else 1):
+            if not row or not any(row):
+                continue
+            try:
+                expense = self._expense(row, columns, added)
+            except RowError as error:
+                if not self.skip_errors:
+                    raise RowError(f'line {line}: {error}') from None
+                if len(self.result.errors) < self.max_errors:
+                    self.result.errors.append((line, str(error)))
+                expense = None
+            if expense is None:
+                self.result.skipped += 1
+                continue
+            yield expense
+
+    def run(self, file: TextIO, header: bool = True, **fmtparams: Any) -> ImportResult:
+        """
+        Импортировать траты из открытого текстового файла.
+        fmtparams - параметры csv.reader, например delimiter=';'
+        """
+        for chunk in chunked(self.expenses(csv.reader(file, **fmtparams), header),
+                             self.chunk_size):
+            self.exp_repo.add_many(chunk)
+            self.result.imported += len(chunk)
+        return self.result
+
+
+def _column(value: str | None) -> str | int | None:
+    return int(value) if value is not None and value.isdecimal() else value
+
+
+def _import_expenses(args: argparse.Namespace,
+                     cat_repo: SqliteRepository) -> ImportResult:
+    importer = CsvImporter(
+        SqliteRepository(db_file=args.db, cls=Expense, connections=cat_repo.connections),
+        cat_repo,
+        ColumnMapping(_column(args.amount), _column(args.date),  # type: ignore[arg-type]
+                      _column(args.category), _column(args.comment),
+                      args.default_category, args.negate),
+        date_formats=args.date_format or DATE_FORMATS,
+        create_categories=args.create_categories, skip_errors=args.skip_errors,
+        chunk_size=args.chunk_size)
+    try:
+        if args.file == '-':
+            return importer.run(sys.stdin, not args.no_header, delimiter=args.delimiter)
+        with open(args.file, encoding=args.encoding, newline='') as file:
+            return importer.run(file, not args.no_header, delimiter=args.delimiter)
+    except ValueError as error:
+        raise ValueError(f'{error}; imported {importer.result.imported}') from error
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """ Импорт из командной строки, см. описание модуля """
+    parser = argparse.ArgumentParser(prog='python -m bookkeeper.importer',
+                                     description='Import expenses from a CSV file')
+    parser.add_argument('file', nargs='?', help='CSV file ("-" for standard input)')
+    parser.add_argument('--db', default='bookkeeper/repository/project_db.db')
+    parser.add_argument('--category-tree', help='indented category tree file, '
+                                                'imported before expenses')
+    parser.add_argument('--no-merge', action='store_true',
+                        help='fail if a category of the tree already exists')
+    parser.add_argument('--amount', help='column name or number')
+    parser.add_argument('--date', help='column name or number')
+    parser.add_argument('--category', help='column name or number')
+    parser.add_argument('--comment', help='column name or number')
+    parser.add_argument('--default-category')
+    parser.add_argument('--negate', action='store_true',
+                        help='expenses are negative, positive amounts are skipped')
+    parser.add_argument('--date-format', action='append',
+                        help='strptime format, may be repeated')
+    parser.add_argument('--no-header', action='store_true')
+    parser.add_argument('--delimiter', default=',')
+    parser.add_argument('--encoding', default='utf-8-sig')
+    parser.add_argument('--create-categories', action='store_true')
+    parser.add_argument('--skip-errors', action='store_true')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args(argv)
+    if args.file is None and args.category_tree is None:
+        parser.error('nothing to import: give a CSV file or --category-tree')
+    if args.file is not None and (args.amount is None or args.date is None):
+        parser.error('--amount and --date are required to import expenses')
+
+    connections = ConnectionManager.for_file(args.db)
+    migrate(connections.connection())
+    cat_repo: SqliteRepository[Category] = SqliteRepository(
+        db_file=args.db, cls=Category, connections=connections)
+    try:
+        if args.category_tree is not None:
+            with open(args.category_tree, encoding=args.encoding) as file:
+                created = import_category_tree(file, cat_repo, not args.no_merge)
+            print(f'created {len(created)} categories')
+        if args.file is not None:
+            result = _import_expenses(args, cat_repo)
+    except (ValueError, IndentationError) as error:
+        print(f'import failed: {error}', file=sys.stderr)
+        return 1
+    finally:
+        connections.close()
+    if args.file is not None:
+        print(f'imported {result.imported}, skipped {result.skipped}')
+        for line, message in result.errors:
+            print(f'line {line}: {message}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
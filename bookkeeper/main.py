@@ -7,27 +7,37 @@ import sys
 from PySide6 import QtWidgets
 
 from bookkeeper.models.budget import Budget
+from bookkeeper.models.budget_engine import BudgetEngine
 from bookkeeper.models.category import Category
 from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.cached_repository import CachedRepository
+from bookkeeper.repository.connection import ConnectionManager
+from bookkeeper.repository.instrumentation import Instrumentation
+from bookkeeper.repository.migrations import migrate
 from bookkeeper.repository.sqlite_repository import SqliteRepository
 from bookkeeper.view.add_botton import AddPurchase
 from bookkeeper.view.budget import BudgetTable
 from bookkeeper.view.category_botton import AddCategory
 from bookkeeper.view.expense_table import ExpensesTable
+from bookkeeper.view.worker import RepositoryWorker
 
 
 class MainWindow(QtWidgets.QWidget):
     """
     Виджет с главным окном программы
     """
-    def __init__(self, cat_repo: SqliteRepository, exp_repo: SqliteRepository,
-                 budget_repo: SqliteRepository, *args, **kwargs) -> None:
+    def __init__(self, cat_repo: AbstractRepository[Category],
+                 exp_repo: AbstractRepository[Expense],
+                 budget_repo: AbstractRepository[Budget], worker: RepositoryWorker,
+                 *args, **kwargs) -> None:
         """
         Parameters
         ----------
         cat_repo - репозиторий с категориями трат
         exp_repo - репозторий с тратами
         budget_repo - репозиторий с бюджетом
+        worker - выполняет запросы к репозиториям вне потока интерфейса
         args
         kwargs
         """
@@ -36,17 +46,22 @@ class MainWindow(QtWidgets.QWidget):
         self.cat_repo = cat_repo
         self.exp_repo = exp_repo
         self.budget_repo = budget_repo
-
-        self.AddPurchase = AddPurchase(self.cat_repo, self.exp_repo, self.budget_repo)
-        self.ExpensesTable = ExpensesTable(self.cat_repo, self.exp_repo)
-        self.BudgetTable = BudgetTable(self.budget_repo)
-        self.AddCategory = AddCategory(self.cat_repo)
-
-        self.ExpensesTable.fill_table()
-        self.BudgetTable.fill_table()
-
-        self.AddPurchase.data_updated.connect(self.ExpensesTable.fill_table)
-        self.AddPurchase.data_updated.connect(self.BudgetTable.fill_table)
+        self.worker = worker
+        self.budget_engine = BudgetEngine(self.exp_repo)
+        # выполняется до запросов виджетов, так как worker соблюдает порядок
+        self.worker.call(self.budget_engine.sync_budgets, self.budget_repo)
+
+        self.AddPurchase = AddPurchase(self.cat_repo, self.exp_repo, self.budget_repo,
+                                       self.budget_engine, self.worker)
+        self.ExpensesTable = ExpensesTable(self.cat_repo, self.exp_repo,
+                                           self.budget_repo, self.budget_engine,
+                                           self.worker)
+        self.BudgetTable = BudgetTable(self.budget_repo, self.worker)
+        self.AddCategory = AddCategory(self.cat_repo, self.worker)
+
+        self.AddPurchase.data_updated.connect(self.ExpensesTable.apply_change)
+        self.AddPurchase.data_updated.connect(self.BudgetTable.apply_change)
+        self.ExpensesTable.data_updated.connect(self.BudgetTable.apply_change)
 
         self.AddPurchase.BudgetTable = self.BudgetTable
         self.BudgetTable.budget_updated.connect(self.AddPurchase.budget_update_response)
@@ -74,12 +89,36 @@ if __name__ == '__main__':
 
     db_file = os.path.join(cwd, 'bookkeeper', 'repository', 'project_db.db')
 
-    cat_repo = SqliteRepository(db_file=db_file, cls=Category)
-    exp_repo = SqliteRepository(db_file=db_file, cls=Expense)
-    budget_repo = SqliteRepository(db_file=db_file, cls=Budget)
+    connections = ConnectionManager.for_file(db_file)
+
+    # категории и бюджеты читаются по pk в обработчиках изменений ячеек,
+    # их немного, поэтому они кэшируются целиком
+    cat_repo: AbstractRepository[Category] = CachedRepository(
+        SqliteRepository(db_file=db_file, cls=Category, connections=connections),
+        query_maxsize=64)
+    exp_repo: AbstractRepository[Expense] = SqliteRepository(
+        db_file=db_file, cls=Expense, connections=connections)
+    budget_repo: AbstractRepository[Budget] = CachedRepository(
+        SqliteRepository(db_file=db_file, cls=Budget, connections=connections),
+        query_maxsize=16)
+    migrate(connections.connection())
+
+    # BOOKKEEPER_STATS=1 - собрать статистику запросов и вывести ее при выходе
+    instrumentation = Instrumentation() if os.environ.get('BOOKKEEPER_STATS') else None
+    if instrumentation is not None:
+        connections.instrument(instrumentation)
+        cat_repo = instrumentation.wrap(cat_repo)
+        exp_repo = instrumentation.wrap(exp_repo)
+        budget_repo = instrumentation.wrap(budget_repo)
 
     app = QtWidgets.QApplication(sys.argv)
 
-    window = MainWindow(cat_repo, exp_repo, budget_repo)
+    worker = RepositoryWorker(instrumentation=instrumentation)
+    window = MainWindow(cat_repo, exp_repo, budget_repo, worker)
     window.show()
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    worker.shutdown()
+    connections.close()
+    if instrumentation is not None:
+        print(instrumentation.report(), file=sys.stderr)
+    sys.exit(exit_code)
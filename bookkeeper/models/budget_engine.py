@@ -0,0 +1,131 @@
+"""
+Модуль содержит подсчет трат за текущий день, неделю и месяц
+
+BudgetEngine хранит суммы трат по периодам (корзинам, определяемым датой
+начала периода) и обновляет их при добавлении, изменении и удалении трат,
+не перечитывая таблицу расходов. Сумма за период загружается из репозитория
+одним запросом по диапазону дат только при первом обращении к этому периоду,
+в том числе после смены дня, недели или месяца.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterable
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import (
+    AbstractRepository, AggregateRepository
+)
+from bookkeeper.repository.query import date_range
+
+# порядок совпадает с порядком строк бюджета (pk 1, 2, 3) в BudgetTable
+PERIODS = ('day', 'week', 'month')
+
+
+def to_date(moment: date | datetime | str) -> date:
+    """ Получить дату из date, datetime или строки ISO 8601 """
+    if isinstance(moment, datetime):
+        return moment.date()
+    if isinstance(moment, date):
+        return moment
+    return date.fromisoformat(moment[:10])
+
+
+def period_bounds(period: str, moment: date | datetime | str) -> tuple[date, date]:
+    """
+    Границы периода, содержащего момент moment, в виде полуинтервала
+    [начало, начало следующего периода)
+    """
+    day = to_date(moment)
+    if period == 'day':
+        return day, day + timedelta(days=1)
+    if period == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    if period == 'month':
+        start = day.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1)
+    raise ValueError(f'unknown period {period!r}')
+
+
+class BudgetEngine:
+    """
+    Текущие суммы трат по периодам PERIODS.
+    exp_repo - репозиторий с тратами
+    today - функция, возвращающая текущую дату
+    """
+
+    def __init__(self, exp_repo: AbstractRepository[Expense],
+                 periods: Iterable[str] = PERIODS,
+                 today: Callable[[], date] = date.today) -> None:
+        self.exp_repo = exp_repo
+        self.periods = tuple(periods)
+        self.today = today
+        self._totals: dict[str, tuple[date, int]] = {}
+
+    def _load(self, period: str, start: date, end: date) -> int:
+        where = {'expense_date': date_range(start, end)}
+        if isinstance(self.exp_repo, AggregateRepository):
+            total = self.exp_repo.total('amount', where)
+        else:
+            total = sum(exp.amount for exp in self.exp_repo.iter_all(where))
+        self._totals[period] = (start, total)
+        return total
+
+    def spent(self, period: str) -> int:
+        """
+        Сумма трат за текущий период. Если период сменился с последнего
+        обращения, сумма за новый период загружается из репозитория.
+        """
+        start, end = period_bounds(period, self.today())
+        cached = self._totals.get(period)
+        if cached is not None and cached[0] == start:
+            return cached[1]
+        return self._load(period, start, end)
+
+    def _register(self, expense: Expense, sign: int) -> None:
+        for period in self.periods:
+            cached = self._totals.get(period)
+            if cached is None:
+                continue
+            start, total = cached
+            if period_bounds(period, expense.expense_date)[0] == start:
+                self._totals[period] = (start, total + sign * int(expense.amount))
+
+    def expense_added(self, expense: Expense) -> None:
+        """ Учесть добавленную трату """
+        self._register(expense, 1)
+
+    def expense_deleted(self, expense: Expense) -> None:
+        """ Учесть удаленную трату """
+        self._register(expense, -1)
+
+    def expense_updated(self, old: Expense, new: Expense) -> None:
+        """ Учесть изменение траты, old - трата до изменения """
+        self._register(old, -1)
+        self._register(new, 1)
+
+    def sync_budgets(self, budget_repo: AbstractRepository[Budget]) -> list[Budget]:
+        """
+        Записать суммы за текущие периоды в поле cur_sum бюджетов (бюджет
+        с наименьшим pk - на день, затем на неделю и месяц) и сохранить
+        изменившиеся бюджеты. Недостающие бюджеты (например, в новой базе
+        данных) создаются с нулевым лимитом.
+        Returns
+        -------
+        Список бюджетов
+        """
+        budgets = budget_repo.get_all(order_by='pk')
+        missing = [Budget() for _ in self.periods[len(budgets):]]
+        if missing:
+            budget_repo.add_many(missing)
+            budgets += missing
+        changed = []
+        for budget, period in zip(budgets, self.periods):
+            spent = self.spent(period)
+            if budget.cur_sum != spent:
+                budget.cur_sum = spent
+                changed.append(budget)
+        if changed:
+            budget_repo.update_many(changed)
+        return budgets
@@ -3,9 +3,9 @@
 """
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Iterator
+from typing import ClassVar, Iterator
 
-from ..repository.abstract_repository import AbstractRepository
+from ..repository.abstract_repository import AbstractRepository, HierarchyRepository
 
 
 @dataclass
@@ -14,7 +14,13 @@ class Category:
     Категория расходов, хранит название в атрибуте name и ссылку (id) на
     родителя (категория, подкатегорией которой является данная) в атрибуте parent.
     У категорий верхнего уровня parent = None
+    indexes, foreign_keys, tree_parent - описание индексов, внешних ключей
+    и иерархии для sqlite
     """
+    indexes: ClassVar[tuple[tuple[str, ...], ...]] = (('name',), ('parent',))
+    foreign_keys: ClassVar[dict[str, str]] = {'parent': 'category'}
+    tree_parent: ClassVar[str] = 'parent'
+
     name: str
     parent: int | None = None
     pk: int = 0
@@ -47,6 +53,9 @@ class Category:
         -------
         Объекты Category от родителя и выше до категории верхнего уровня
         """
+        if isinstance(repo, HierarchyRepository):
+            yield from repo.ancestors(self.pk)
+            return
         parent = self.get_parent(repo)
         if parent is None:
             return
@@ -59,6 +68,8 @@ class Category:
         """
         Получить все подкатегории из иерархии, т.е. непосредственные
         подкатегории данной, все их подкатегории и т.д.
+        Если репозиторий поддерживает индекс иерархии, подкатегории
+        получаются одним запросом, иначе загружаются все категории.
         Parameters
         ----------
         repo - репозиторий для получения объектов
@@ -74,6 +85,9 @@ class Category:
                 yield x
                 yield from get_children(graph, x.pk)
 
+        if isinstance(repo, HierarchyRepository):
+            return (cat for cat in repo.descendants(self.pk))
+
         subcats = defaultdict(list)
         for cat in repo.get_all():
             subcats[cat.parent].append(cat)
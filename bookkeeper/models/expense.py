@@ -2,8 +2,18 @@
 Описан класс, представляющий расходную операцию
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
+from typing import ClassVar
+
+
+def now() -> str:
+    """
+    Текущее время в формате хранения дат: ISO 8601 с точностью до секунд,
+    например '2023-03-01 18:30:00'. Строки в этом формате упорядочены так же,
+    как соответствующие даты.
+    """
+    return datetime.now().isoformat(sep=' ', timespec='seconds')
 
 
 @dataclass(slots=True)
@@ -12,14 +22,18 @@ class Expense:
     Расходная операция.
     amount - сумма
     category - id категории расходов
-    expense_date - дата расхода
-    added_date - дата добавления в бд
+    expense_date - дата расхода (ISO 8601, см. now)
+    added_date - дата добавления в бд (ISO 8601, см. now)
     comment - комментарий
     pk - id записи в базе данных
+    indexes, foreign_keys - описание индексов и внешних ключей для sqlite
     """
+    indexes: ClassVar[tuple[tuple[str, ...], ...]] = (('category',), ('expense_date',))
+    foreign_keys: ClassVar[dict[str, str]] = {'category': 'category'}
+
     amount: int
     category: int
-    expense_date: str = datetime.now().strftime("%H:%M, %d/%m/%Y")
-    added_date: str = datetime.now().strftime("%H:%M, %d/%m/%Y")
+    expense_date: str = field(default_factory=now)
+    added_date: str = field(default_factory=now)
     comment: str = ''
-    pk: int = 0
\ No newline at end of file
+    pk: int = 0
@@ -0,0 +1,140 @@
+"""
+Модуль содержит отчет о тратах по категориям и периодам
+
+Отчет строится одним проходом по тратам: из репозитория получаются суммы
+по парам (категория, день). Для репозиториев с суммами (AggregateRepository)
+это один запрос GROUP BY или один проход по колонкам, для остальных - один
+проход по тратам. Все остальные суммы вычисляются из этих пар, число которых
+не больше (число категорий) x (число дней) и не зависит от числа трат:
+суммы по категориям, суммы с подкатегориями (свертка по дереву категорий
+от листьев к корню) и суммы по дням, неделям и месяцам.
+"""
+
+from datetime import date, datetime
+from typing import Iterable
+
+from bookkeeper.models.budget_engine import period_bounds
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import (
+    AbstractRepository, AggregateRepository
+)
+from bookkeeper.repository.query import date_range
+
+
+def category_day_totals(exp_repo: AbstractRepository[Expense],
+                        start: date | datetime | str | None = None,
+                        end: date | datetime | str | None = None
+                        ) -> dict[tuple[int, str], int]:
+    """
+    Суммы трат в полуинтервале [start, end) по парам
+    (pk категории, день 'YYYY-MM-DD')
+    """
+    where = None if start is None and end is None \
+        else {'expense_date': date_range(start, end)}
+    if isinstance(exp_repo, AggregateRepository):
+        return exp_repo.totals_by(('category', 'expense_date'), 'amount', where)
+    totals: dict[tuple[int, str], int] = {}
+    for exp in exp_repo.iter_all(where):
+        key = (exp.category, exp.expense_date[:10])
+        totals[key] = totals.get(key, 0) + exp.amount
+    return totals
+
+
+class SpendingReport:
+    """
+    Суммы трат по категориям и периодам.
+    totals - суммы по парам (pk категории, день), см. category_day_totals
+    categories - все категории (для сумм с подкатегориями)
+    """
+
+    def __init__(self, totals: dict[tuple[int, str], int],
+                 categories: Iterable[Category]) -> None:
+        self.totals = totals
+        self.parents = {cat.pk: cat.parent for cat in categories}
+        self._order = self._bottom_up()
+
+    @classmethod
+    def load(cls, exp_repo: AbstractRepository[Expense],
+             cat_repo: AbstractRepository[Category],
+             start: date | datetime | str | None = None,
+             end: date | datetime | str | None = None) -> 'SpendingReport':
+        """ Построить отчет по тратам в полуинтервале [start, end) """
+        return cls(category_day_totals(exp_repo, start, end), cat_repo.get_all())
+
+    def _bottom_up(self) -> list[int]:
+        """ Категории в порядке от самых глубоких к верхнему уровню """
+        depth: dict[int, int] = {}
+        for pk in self.parents:
+            chain = []
+            node: int | None = pk
+            while node is not None and node not in depth:
+                if node in chain:
+                    raise ValueError(f'cycle in category hierarchy at {node}')
+                chain.append(node)
+                node = self.parents.get(node)
+            base = -1 if node is None else depth[node]
+            for i, item in enumerate(reversed(chain), 1):
+                depth[item] = base + i
+        return sorted(depth, key=depth.__getitem__, reverse=True)
+
+    def by_category(self) -> dict[int, int]:
+        """ Суммы трат каждой категории без подкатегорий """
+        totals: dict[int, int] = {}
+        for (category, _), amount in self.totals.items():
+            totals[category] = totals.get(category, 0) + amount
+        return totals
+
+    def _rollup(self, own: dict[int, int]) -> dict[int, int]:
+        totals = {pk: own.get(pk, 0) for pk in self._order}
+        # траты с категорией, которой нет в дереве, учитываются только в ней
+        for pk, amount in own.items():
+            totals.setdefault(pk, amount)
+        for pk in self._order:
+            parent = self.parents[pk]
+            if parent is not None and parent in totals:
+                totals[parent] += totals[pk]
+        return totals
+
+    def rollup(self) -> dict[int, int]:
+        """ Суммы трат каждой категории вместе со всеми подкатегориями """
+        return self._rollup(self.by_category())
+
+    def by_period(self, period: str = 'month',
+                  category: int | None = None) -> dict[date, int]:
+        """
+        Суммы трат по периодам ('day', 'week' или 'month'), ключ - дата
+        начала периода. Если задана категория, учитываются траты этой
+        категории и ее подкатегорий.
+        """
+        subtree = None if category is None else self._subtree(category)
+        starts: dict[str, date] = {}
+        totals: dict[date, int] = {}
+        for (cat, day), amount in self.totals.items():
+            if subtree is not None and cat not in subtree:
+                continue
+            start = starts.get(day)
+            if start is None:
+                start = starts[day] = period_bounds(period, day)[0]
+            totals[start] = totals.get(start, 0) + amount
+        return dict(sorted(totals.items()))
+
+    def rollup_by_period(self, period: str = 'month') -> dict[date, dict[int, int]]:
+        """ Суммы с подкатегориями для каждого периода """
+        own: dict[date, dict[int, int]] = {}
+        starts: dict[str, date] = {}
+        for (cat, day), amount in self.totals.items():
+            start = starts.get(day)
+            if start is None:
+                start = starts[day] = period_bounds(period, day)[0]
+            bucket = own.setdefault(start, {})
+            bucket[cat] = bucket.get(cat, 0) + amount
+        return {start: self._rollup(own[start]) for start in sorted(own)}
+
+    def _subtree(self, category: int) -> set[int]:
+        subtree = {category}
+        # в порядке от корня к листьям родитель попадает в поддерево раньше потомков
+        for pk in reversed(self._order):
+            if self.parents[pk] in subtree:
+                subtree.add(pk)
+        return subtree
@@ -8,7 +8,12 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import Generic, TypeVar, Protocol, Any
+from datetime import date, datetime
+from typing import (
+    Generic, TypeVar, Protocol, Any, Iterable, Iterator, Sequence, runtime_checkable
+)
+
+from bookkeeper.repository.query import date_range
 
 
 class Model(Protocol):  # pylint: disable=too-few-public-methods
@@ -21,6 +26,39 @@ class Model(Protocol):  # pylint: disable=too-few-public-methods
 T = TypeVar('T', bound=Model)
 
 
+@runtime_checkable
+class HierarchyRepository(Protocol[T]):
+    """
+    Репозиторий с индексом иерархии: предки и потомки записи
+    получаются одним запросом
+    """
+
+    def ancestors(self, pk: int) -> list[T]:
+        """ Предки записи от непосредственного родителя до верхнего уровня """
+
+    def descendants(self, pk: int) -> list[T]:
+        """ Все потомки записи """
+
+
+@runtime_checkable
+class AggregateRepository(Protocol):
+    """
+    Репозиторий, вычисляющий суммы по полям без создания объектов
+    """
+
+    def total(self, field: str = 'amount',
+              where: dict[str, Any] | None = None) -> int:
+        """ Сумма поля field объектов, удовлетворяющих условию where """
+
+    def totals_by(self, group: str | Sequence[str] = 'category', field: str = 'amount',
+                  where: dict[str, Any] | None = None) -> dict[Any, int]:
+        """
+        Суммы поля field по значениям поля group или по сочетаниям значений
+        полей кортежа group (ключ - кортеж). Поля с датами группируются
+        по дням, ключ - строка 'YYYY-MM-DD'.
+        """
+
+
 class AbstractRepository(ABC, Generic[T]):
     """
     Абстрактный репозиторий.
@@ -30,6 +68,9 @@ class AbstractRepository(ABC, Generic[T]):
     get_all
     update
     delete
+    Пакетные методы add_many, update_many, delete_many по умолчанию
+    вызывают соответствующий одиночный метод для каждого объекта,
+    наследники могут переопределить их более эффективной реализацией.
     """
 
     @abstractmethod
@@ -44,13 +85,43 @@ class AbstractRepository(ABC, Generic[T]):
         """ Получить объект по id """
 
     @abstractmethod
-    def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
+    def get_all(self, where: dict[str, Any] | None = None,
+                order_by: str | Sequence[str] | None = None,
+                limit: int | None = None) -> list[T]:
         """
         Получить все записи по некоторому условию
         where - условие в виде словаря {'название_поля': значение}
-        если условие не задано (по умолчанию), вернуть все записи
+        если условие не задано (по умолчанию), вернуть все записи.
+        Значением может быть предикат из модуля query (In, Range, IsNull),
+        значение None означает проверку на отсутствие значения.
+        order_by - поле или список полей для сортировки, '-поле' - по убыванию
+        limit - максимальное количество записей
         """
 
+    def iter_all(self, where: dict[str, Any] | None = None,
+                 order_by: str | Sequence[str] | None = None,
+                 batch_size: int = 1000) -> Iterator[T]:
+        """
+        Перебрать записи по условию, не загружая их в память одновременно.
+        where и order_by - как в get_all
+        batch_size - количество записей, загружаемых за одно обращение к хранилищу
+        По умолчанию перебирает результат get_all.
+        """
+        yield from self.get_all(where, order_by)
+
+    def get_between(self, field: str,
+                    start: date | datetime | str | None = None,
+                    end: date | datetime | str | None = None,
+                    where: dict[str, Any] | None = None,
+                    order_by: str | Sequence[str] | None = None) -> list[T]:
+        """
+        Получить записи, у которых дата в поле field лежит в полуинтервале
+        [start, end), например траты за месяц:
+        repo.get_between('expense_date', date(2023, 3, 1), date(2023, 4, 1))
+        where и order_by - дополнительные условия и сортировка, как в get_all
+        """
+        return self.get_all({**(where or {}), field: date_range(start, end)}, order_by)
+
     @abstractmethod
     def update(self, obj: T) -> None:
         """ Обновить данные об объекте. Объект должен содержать поле pk. """
@@ -58,3 +129,21 @@ class AbstractRepository(ABC, Generic[T]):
     @abstractmethod
     def delete(self, pk: int) -> None:
         """ Удалить запись """
+
+    def add_many(self, objs: Iterable[T], chunk_size: int = 1000) -> list[int]:
+        """
+        Добавить объекты в репозиторий, вернуть список id объектов в том же
+        порядке, также записать id в атрибут pk каждого объекта.
+        chunk_size - количество объектов, обрабатываемых за один шаг
+        """
+        return [self.add(obj) for obj in objs]
+
+    def update_many(self, objs: Iterable[T], chunk_size: int = 1000) -> None:
+        """ Обновить данные об объектах. Объекты должны содержать поле pk. """
+        for obj in objs:
+            self.update(obj)
+
+    def delete_many(self, pks: Iterable[int], chunk_size: int = 1000) -> None:
+        """ Удалить записи """
+        for pk in pks:
+            self.delete(pk)
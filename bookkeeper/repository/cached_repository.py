@@ -0,0 +1,198 @@
+"""
+Модуль описывает кэширующую обертку репозитория
+
+Виджеты и модели вызывают get в циклах (родители категории, бюджеты при
+изменении ячейки), и для SqliteRepository каждый вызов - отдельный запрос.
+CachedRepository хранит последние полученные по pk объекты в кэше LRU
+ограниченного размера и, если нужно, результаты get_all. Запись идет
+сразу в репозиторий (write-through): add, update и delete обновляют кэш
+объектов и сбрасывают кэш запросов, так как изменение может затронуть
+результат любого запроса.
+
+Из кэша возвращаются копии объектов, как и из SqliteRepository: изменение
+полученного объекта без update не меняет кэш. Изменения, сделанные в обход
+обертки (другим процессом или другим объектом репозитория), не видны до
+вызова clear.
+"""
+
+import threading
+from collections import OrderedDict
+from copy import copy
+from dataclasses import dataclass
+from typing import Any, Hashable, Iterable, Iterator, Sequence
+
+from bookkeeper.repository.abstract_repository import AbstractRepository, T
+
+
+@dataclass
+class CacheStats:
+    """
+    Статистика кэша: попадания, промахи и вытеснения
+    """
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        """ Доля попаданий среди всех обращений """
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+
+def query_key(where: dict[str, Any] | None,
+              order_by: str | Sequence[str] | None,
+              limit: int | None) -> Hashable:
+    """
+    Ключ кэша для аргументов get_all; TypeError, если значения условия
+    не хешируемы
+    """
+    where_key = None if where is None else tuple(sorted(where.items()))
+    order_key = order_by if order_by is None or isinstance(order_by, str) \
+        else tuple(order_by)
+    key = (where_key, order_key, limit)
+    hash(key)
+    return key
+
+
+def uncached(repo: AbstractRepository[T]) -> AbstractRepository[T]:
+    """ Репозиторий, обернутый CachedRepository, или сам repo """
+    return repo.repo if isinstance(repo, CachedRepository) else repo
+
+
+class CachedRepository(AbstractRepository[T]):
+    """
+    Репозиторий с кэшем чтения.
+    repo - репозиторий, к которому идут обращения при промахе и все записи
+    maxsize - наибольшее число объектов в кэше get
+    query_maxsize - наибольшее число результатов get_all в кэше
+    (0 - результаты get_all не кэшируются)
+    Остальные атрибуты (например, total или ancestors) берутся у repo.
+    """
+
+    def __init__(self, repo: AbstractRepository[T], maxsize: int = 1024,
+                 query_maxsize: int = 0) -> None:
+        if maxsize < 1 or query_maxsize < 0:
+            raise ValueError('cache size must be positive')
+        self.repo = repo
+        self.maxsize = maxsize
+        self.query_maxsize = query_maxsize
+        self.stats = CacheStats()
+        self.query_stats = CacheStats()
+        self._objects: OrderedDict[int, T] = OrderedDict()
+        self._queries: OrderedDict[Hashable, list[T]] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name: str) -> Any:
+        # вызывается только для атрибутов, которых нет у обертки
+        if name == 'repo':
+            raise AttributeError(name)
+        return getattr(self.repo, name)
+
+    def _put(self, obj: T) -> None:
+        self._objects[obj.pk] = copy(obj)
+        self._objects.move_to_end(obj.pk)
+        if len(self._objects) > self.maxsize:
+            self._objects.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _invalidate_queries(self) -> None:
+        self._queries.clear()
+
+    def clear(self) -> None:
+        """ Сбросить оба кэша, например после изменений в обход обертки """
+        with self._lock:
+            self._objects.clear()
+            self._queries.clear()
+
+    def get(self, pk: int) -> T | None:
+        with self._lock:
+            obj = self._objects.get(pk)
+            if obj is not None:
+                self._objects.move_to_end(pk)
+                self.stats.hits += 1
+                return copy(obj)
+            self.stats.misses += 1
+            obj = self.repo.get(pk)
+            if obj is not None:
+                self._put(obj)
+            return obj
+
+    def get_all(self, where: dict[str, Any] | None = None,
+                order_by: str | Sequence[str] | None = None,
+                limit: int | None = None) -> list[T]:
+        if not self.query_maxsize:
+            return self.repo.get_all(where, order_by, limit)
+        try:
+            key = query_key(where, order_by, limit)
+        except TypeError:
+            return self.repo.get_all(where, order_by, limit)
+        with self._lock:
+            objs = self._queries.get(key)
+            if objs is not None:
+                self._queries.move_to_end(key)
+                self.query_stats.hits += 1
+                return [copy(obj) for obj in objs]
+            self.query_stats.misses += 1
+            objs = self.repo.get_all(where, order_by, limit)
+            self._queries[key] = [copy(obj) for obj in objs]
+            if len(self._queries) > self.query_maxsize:
+                self._queries.popitem(last=False)
+                self.query_stats.evictions += 1
+            return objs
+
+    def iter_all(self, where: dict[str, Any] | None = None,
+                 order_by: str | Sequence[str] | None = None,
+                 batch_size: int = 1000) -> Iterator[T]:
+        # перебор нужен для больших выборок, которые кэшировать незачем
+        return self.repo.iter_all(where, order_by, batch_size)
+
+    def add(self, obj: T) -> int:
+        with self._lock:
+            pk = self.repo.add(obj)
+            self._invalidate_queries()
+            return pk
+
+    def add_many(self, objs: Iterable[T], chunk_size: int = 1000) -> list[int]:
+        with self._lock:
+            pks = self.repo.add_many(objs, chunk_size)
+            self._invalidate_queries()
+            return pks
+
+    def update(self, obj: T) -> None:
+        with self._lock:
+            try:
+                self.repo.update(obj)
+            finally:
+                # объект только вытесняется: update несуществующего pk
+                # может не вызвать ошибку, и в кэше остался бы фантом
+                self._objects.pop(obj.pk, None)
+                self._invalidate_queries()
+
+    def update_many(self, objs: Iterable[T], chunk_size: int = 1000) -> None:
+        objs = list(objs)
+        with self._lock:
+            try:
+                self.repo.update_many(objs, chunk_size)
+            finally:
+                for obj in objs:
+                    self._objects.pop(obj.pk, None)
+                self._invalidate_queries()
+
+    def delete(self, pk: int) -> None:
+        with self._lock:
+            try:
+                self.repo.delete(pk)
+            finally:
+                self._objects.pop(pk, None)
+                self._invalidate_queries()
+
+    def delete_many(self, pks: Iterable[int], chunk_size: int = 1000) -> None:
+        pks = list(pks)
+        with self._lock:
+            try:
+                self.repo.delete_many(pks, chunk_size)
+            finally:
+                for pk in pks:
+                    self._objects.pop(pk, None)
+                self._invalidate_queries()
@@ -0,0 +1,296 @@
+"""
+Модуль описывает колоночное хранилище трат в оперативной памяти
+
+Вместо объекта Expense на каждую трату ColumnarExpenseRepository хранит
+поля трат в типизированных массивах (array): pk, сумма, категория и даты -
+по 8 байт на значение. Даты хранятся целыми числами вида
+YYYYMMDDhhmmss, которые упорядочены так же, как строки ISO 8601.
+Комментарии хранятся в таблице уникальных строк, а в массиве - номера строк
+в ней. Объекты Expense создаются только при чтении.
+
+Условия get_all и суммы (total, totals_by) вычисляются проходом по массивам
+встроенными функциями (map с функциями operator, itertools.compress, sum),
+без создания объектов и без вызова функций Python для каждой строки.
+"""
+
+from array import array
+from bisect import bisect_left
+from itertools import compress, repeat
+from operator import and_, eq, ge, lt
+from typing import Any, Iterable, Iterator, Sequence
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.query import (
+    In, IsNull, Predicate, Range, apply_order, group_fields
+)
+
+DATE_FIELDS = ('expense_date', 'added_date')
+
+_DAY = 1_000_000
+
+
+def date_key(value: str) -> int:
+    """
+    Число YYYYMMDDhhmmss для даты в формате ISO 8601 ('2023-03-01 18:30:00'
+    или '2023-03-01'), доли секунды отбрасываются
+    """
+    return int(value[:4] + value[5:7] + value[8:10] + (value[11:13] or '00')
+               + (value[14:16] or '00') + (value[17:19] or '00'))
+
+
+def day_from_key(day: int) -> str:
+    """ Строка 'YYYY-MM-DD' для числа YYYYMMDD """
+    return f'{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}'
+
+
+def date_from_key(key: int) -> str:
+    """ Строка ISO 8601 для числа, полученного date_key """
+    date_part, time_part = divmod(key, 1_000_000)
+    year, month_day = divmod(date_part, 10000)
+    hours, minutes_seconds = divmod(time_part, 10000)
+    return f'{year:04d}-{month_day // 100:02d}-{month_day % 100:02d} ' \
+        f'{hours:02d}:{minutes_seconds // 100:02d}:{minutes_seconds % 100:02d}'
+
+
+def _is_custom(condition: Any) -> bool:
+    """ Является ли условие предикатом, отличным от In, Range и IsNull """
+    return isinstance(condition, Predicate) \
+        and not isinstance(condition, (In, Range, IsNull))
+
+
+def _date_condition(condition: Any) -> Any:
+    """ Перевести даты ISO 8601 в условии в числа date_key """
+    if isinstance(condition, Range):
+        return Range(None if condition.start is None else date_key(condition.start),
+                     None if condition.stop is None else date_key(condition.stop))
+    if isinstance(condition, In):
+        return In(map(date_key, condition.values))
+    if isinstance(condition, str):
+        return date_key(condition)
+    return condition
+
+
+def _column_mask(column: array, condition: Any) -> Iterable[bool]:
+    """ Маска значений столбца, удовлетворяющих условию """
+    if isinstance(condition, Range):
+        masks = []
+        if condition.start is not None:
+            masks.append(map(ge, column, repeat(condition.start)))
+        if condition.stop is not None:
+            masks.append(map(lt, column, repeat(condition.stop)))
+        if not masks:
+            return repeat(True, len(column))
+        return masks[0] if len(masks) == 1 else map(and_, *masks)
+    if isinstance(condition, In):
+        return map(frozenset(condition.values).__contains__, column)
+    if condition is None or isinstance(condition, IsNull):
+        return repeat(False, len(column))
+    if isinstance(condition, Predicate):
+        return map(condition, column)
+    # операторы, а не методы значений: метод вернул бы NotImplemented
+    # (истину) для значения другого типа
+    return map(eq, column, repeat(condition))
+
+
+class ColumnarExpenseRepository(AbstractRepository[Expense]):
+    """
+    Колоночный репозиторий трат в оперативной памяти.
+    Возвращаемые объекты Expense - копии: изменения сохраняются через update.
+    Даты хранятся с точностью до секунды.
+    """
+
+    def __init__(self) -> None:
+        self._pk = array('q')
+        self._amount = array('q')
+        self._category = array('q')
+        self._expense_date = array('q')
+        self._added_date = array('q')
+        self._comment = array('L')
+        self._strings: list[str] = ['']
+        self._string_ids: dict[str, int] = {'': 0}
+        self._next_pk = 1
+
+    def __len__(self) -> int:
+        return len(self._pk)
+
+    def _columns(self) -> tuple[array, ...]:
+        return (self._pk, self._amount, self._category,
+                self._expense_date, self._added_date, self._comment)
+
+    def _intern(self, value: str) -> int:
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings.append(value)
+            self._string_ids[value] = string_id
+        return string_id
+
+    def _row(self, pk: int) -> int | None:
+        # pk назначаются по возрастанию, поэтому массив pk упорядочен
+        row = bisect_left(self._pk, pk)
+        return row if row < len(self._pk) and self._pk[row] == pk else None
+
+    def _values(self, obj: Expense) -> tuple[int, ...]:
+        return (int(obj.amount), int(obj.category), date_key(obj.expense_date),
+                date_key(obj.added_date), self._intern(obj.comment))
+
+    def _materialize(self, row: int) -> Expense:
+        return Expense(self._amount[row], self._category[row],
+                       date_from_key(self._expense_date[row]),
+                       date_from_key(self._added_date[row]),
+                       self._strings[self._comment[row]], self._pk[row])
+
+    def add(self, obj: Expense) -> int:
+        if getattr(obj, 'pk', None) != 0:
+            raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+        values = self._values(obj)
+        pk = self._next_pk
+        self._pk.append(pk)
+        for column, value in zip(self._columns()[1:], values):
+            column.append(value)
+        self._next_pk += 1
+        obj.pk = pk
+        return pk
+
+    def add_many(self, objs: Iterable[Expense], chunk_size: int = 1000) -> list[int]:
+        objs = list(objs)
+        if any(getattr(obj, 'pk', None) != 0 for obj in objs):
+            raise ValueError('trying to add object with filled `pk` attribute')
+        # значения вычисляются до изменения массивов, чтобы ошибка
+        # преобразования не оставила репозиторий в частично измененном виде
+        rows = [self._values(obj) for obj in objs]
+        pks = range(self._next_pk, self._next_pk + len(objs))
+        self._pk.extend(pks)
+        for i, column in enumerate(self._columns()[1:]):
+            column.extend(row[i] for row in rows)
+        for obj, pk in zip(objs, pks):
+            obj.pk = pk
+        self._next_pk += len(objs)
+        return list(pks)
+
+    def get(self, pk: int) -> Expense | None:
+        row = self._row(pk)
+        return None if row is None else self._materialize(row)
+
+    def _predicate_mask(self, field: str, condition: Any) -> Iterable[bool]:
+        if field == 'comment':
+            return self._comment_mask(condition)
+        if field not in DATE_FIELDS + ('pk', 'amount', 'category'):
+            raise ValueError(f'unknown field {field!r}')
+        column = getattr(self, f'_{field}')
+        if field in DATE_FIELDS:
+            if _is_custom(condition):
+                # произвольный предикат получает дату строкой, как в других
+                # репозиториях
+                return map(condition, map(date_from_key, column))
+            condition = _date_condition(condition)
+        return _column_mask(column, condition)
+
+    def _comment_mask(self, condition: Any) -> Iterable[bool]:
+        """ Маска по комментарию: условие проверяется для таблицы строк """
+        if isinstance(condition, Predicate):
+            ids = {i for i, value in enumerate(self._strings) if condition(value)}
+        else:
+            ids = {self._string_ids.get(condition, -1)}
+        return map(ids.__contains__, self._comment)
+
+    def _mask(self, where: dict[str, Any] | None) -> Iterable[bool] | None:
+        """ Маска строк, удовлетворяющих условию, или None для всех строк """
+        if not where:
+            return None
+        masks = [self._predicate_mask(field, condition)
+                 for field, condition in where.items()]
+        return masks[0] if len(masks) == 1 else map(all, zip(*masks))
+
+    def _rows(self, where: dict[str, Any] | None) -> Iterable[int]:
+        mask = self._mask(where)
+        rows = range(len(self._pk))
+        return rows if mask is None else compress(rows, mask)
+
+    def get_all(self, where: dict[str, Any] | None = None,
+                order_by: str | Sequence[str] | None = None,
+                limit: int | None = None) -> list[Expense]:
+        rows = self._rows(where)
+        if order_by is None and limit is not None:
+            rows = list(rows)[:limit]
+        res = list(map(self._materialize, rows))
+        if order_by is not None:
+            apply_order(res, order_by)
+        return res if limit is None else res[:limit]
+
+    def iter_all(self, where: dict[str, Any] | None = None,
+                 order_by: str | Sequence[str] | None = None,
+                 batch_size: int = 1000) -> Iterator[Expense]:
+        if order_by is not None:
+            yield from self.get_all(where, order_by)
+            return
+        # номера строк сохраняются заранее, так как удаление сдвигает строки
+        for row in array('q', self._rows(where)):
+            yield self._materialize(row)
+
+    def update(self, obj: Expense) -> None:
+        if obj.pk == 0:
+            raise ValueError('attempt to update object with unknown primary key')
+        row = self._row(obj.pk)
+        if row is None:
+            raise KeyError(obj.pk)
+        for column, value in zip(self._columns()[1:], self._values(obj)):
+            column[row] = value
+
+    def delete(self, pk: int) -> None:
+        row = self._row(pk)
+        if row is None:
+            raise KeyError(pk)
+        for column in self._columns():
+            del column[row]
+
+    def total(self, field: str = 'amount',
+              where: dict[str, Any] | None = None) -> int:
+        """
+        Сумма поля field трат, удовлетворяющих условию where
+        """
+        column = self._numeric(field)
+        mask = self._mask(where)
+        return sum(column if mask is None else compress(column, mask))
+
+    def totals_by(self, group: str | Sequence[str] = 'category', field: str = 'amount',
+                  where: dict[str, Any] | None = None) -> dict[Any, int]:
+        """
+        Суммы поля field трат, удовлетворяющих условию where, по значениям
+        поля group, например {pk категории: сумма}, или по сочетаниям
+        значений полей кортежа group. Даты группируются по дням.
+        """
+        fields = group_fields(group)
+        columns: list[Iterable[int]] = [self._group_column(name) for name in fields]
+        values: Iterable[int] = self._numeric(field)
+        mask = self._mask(where)
+        if mask is not None:
+            selected = bytes(mask)
+            columns = [compress(column, selected) for column in columns]
+            values = compress(values, selected)
+        keys = columns[0] if len(columns) == 1 else zip(*columns)
+        totals: dict[Any, int] = {}
+        get = totals.get
+        for key, value in zip(keys, values):
+            totals[key] = get(key, 0) + value
+        # числа дней переводятся в строки только для различных ключей
+        dates = [i for i, name in enumerate(fields) if name in DATE_FIELDS]
+        if not dates:
+            return totals
+        if len(fields) == 1:
+            return {day_from_key(key): total for key, total in totals.items()}
+        return {tuple(day_from_key(part) if i in dates else part
+                      for i, part in enumerate(key)): total
+                for key, total in totals.items()}
+
+    def _group_column(self, field: str) -> Iterable[int]:
+        if field in DATE_FIELDS:
+            # YYYYMMDDhhmmss // 10**6 = YYYYMMDD
+            return map(_DAY.__rfloordiv__, getattr(self, f'_{field}'))
+        return self._numeric(field)
+
+    def _numeric(self, field: str) -> array:
+        if field not in ('pk', 'amount', 'category'):
+            raise ValueError(f'cannot aggregate field {field!r}')
+        return getattr(self, f'_{field}')
@@ -0,0 +1,206 @@
+"""
+Модуль описывает менеджер соединений с базой данных sqlite
+
+Менеджер хранит долгоживущие соединения с одним файлом базы данных и
+раздает их репозиториям, так что открытие соединения и настройка pragma
+выполняются один раз, а не при каждой операции. Каждый поток получает
+собственное соединение, поэтому менеджер можно использовать из нескольких
+потоков одновременно.
+
+Репозитории, использующие один менеджер, в одном потоке работают через одно
+соединение, поэтому их операции можно объединить в одну транзакцию
+(см. transaction и bookkeeper.repository.unit_of_work).
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Iterable, Iterator
+
+from bookkeeper.repository.instrumentation import Instrumentation, TracingConnection
+
+
+class ConnectionManager:
+    """
+    Менеджер долгоживущих соединений с файлом базы данных sqlite.
+    Для получения общего менеджера следует использовать for_file:
+    все репозитории, работающие с одним файлом, будут использовать
+    одни и те же соединения.
+    """
+
+    _instances: dict[str, 'ConnectionManager'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, db_file: str,
+                 journal_mode: str = 'WAL',
+                 synchronous: str = 'NORMAL',
+                 busy_timeout: int = 5000,
+                 cache_size: int = -16000) -> None:
+        """
+        Parameters
+        ----------
+        db_file - путь к файлу базы данных
+        journal_mode - режим журнала (PRAGMA journal_mode)
+        synchronous - уровень синхронизации с диском (PRAGMA synchronous)
+        busy_timeout - время ожидания блокировки в миллисекундах
+        cache_size - размер кэша страниц (отрицательное значение - в килобайтах)
+        """
+        # каждое соединение с ':memory:' (и '') открывает отдельную пустую
+        # базу, а менеджер открывает по соединению на поток
+        if db_file in (':memory:', ''):
+            raise ValueError('ConnectionManager needs a database file, '
+                             f'{db_file!r} gives each thread its own database')
+        self.db_file = db_file
+        self.pragmas = {
+            'foreign_keys': 'ON',
+            'journal_mode': journal_mode,
+            'synchronous': synchronous,
+            'busy_timeout': str(busy_timeout),
+            'cache_size': str(cache_size),
+        }
+        self.instrumentation: Instrumentation | None = None
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_file(cls, db_file: str) -> 'ConnectionManager':
+        """
+        Получить общий менеджер для файла базы данных, создав его при
+        первом обращении
+        """
+        key = os.path.abspath(db_file)
+        with cls._instances_lock:
+            manager = cls._instances.get(key)
+            if manager is None:
+                manager = cls(db_file)
+                cls._instances[key] = manager
+            return manager
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Получить соединение текущего потока, открыв его при первом обращении
+        """
+        con: sqlite3.Connection | None = getattr(self._local, 'con', None)
+        if con is None:
+            con = self._connect()
+            self._local.con = con
+        return con
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Контекст транзакции соединения текущего потока: при выходе изменения
+        фиксируются, при исключении - откатываются. Вложенный вызов не
+        фиксирует изменения, а создает точку сохранения (SAVEPOINT), так что
+        при исключении откатываются только изменения вложенного блока,
+        а фиксация происходит при выходе из внешнего.
+        При откате pk объектов, добавленных в блоке (см. track_added),
+        сбрасываются в 0.
+        """
+        con = self.connection()
+        depth = getattr(self._local, 'depth', 0)
+        added = self._added()
+        mark = len(added)
+        # транзакция, открытая на соединении в обход менеджера, тоже
+        # считается внешней и не фиксируется здесь
+        outer = depth == 0 and not con.in_transaction
+        savepoint = f'sp{depth}'
+        if outer:
+            # блокировка на запись берется сразу, чтобы не получить
+            # SQLITE_BUSY при переходе от чтения к записи внутри транзакции
+            con.execute('BEGIN IMMEDIATE')
+        else:
+            con.execute(f'SAVEPOINT {savepoint}')
+        self._local.depth = depth + 1
+        try:
+            try:
+                yield con
+            except BaseException:
+                if outer:
+                    con.rollback()
+                else:
+                    con.execute(f'ROLLBACK TO {savepoint}')
+                    con.execute(f'RELEASE {savepoint}')
+                raise
+            if outer:
+                con.commit()
+            else:
+                con.execute(f'RELEASE {savepoint}')
+        except BaseException:
+            for obj in added[mark:]:
+                obj.pk = 0
+            del added[mark:]
+            raise
+        finally:
+            self._local.depth = depth
+            if outer:
+                added.clear()
+
+    def _added(self) -> list[Any]:
+        added: list[Any] | None = getattr(self._local, 'added', None)
+        if added is None:
+            added = self._local.added = []
+        return added
+
+    def track_added(self, objs: Iterable[Any]) -> None:
+        """
+        Запомнить объекты, добавленные в открытой транзакции текущего
+        потока: при ее откате их pk сбрасываются в 0
+        """
+        if self.in_transaction():
+            self._added().extend(objs)
+
+    def in_transaction(self) -> bool:
+        """ Открыта ли транзакция (transaction) в текущем потоке """
+        return getattr(self._local, 'depth', 0) > 0
+
+    def instrument(self, instrumentation: Instrumentation | None) -> None:
+        """
+        Записывать время и число строк каждого запроса в instrumentation
+        (None - перестать записывать). Открытые соединения закрываются
+        и будут открыты заново, поэтому вызывать следует вне транзакций.
+        """
+        self.instrumentation = instrumentation
+        self.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        instrumentation = self.instrumentation
+        start = perf_counter()
+        # соединение используется только своим потоком, проверка sqlite3
+        # отключена, чтобы close мог закрыть соединения из любого потока
+        if instrumentation is None:
+            con = sqlite3.connect(self.db_file, check_same_thread=False)
+        else:
+            con = sqlite3.connect(self.db_file, check_same_thread=False,
+                                  factory=TracingConnection)
+            con.instrumentation = instrumentation
+        for name, value in self.pragmas.items():
+            con.execute(f'PRAGMA {name} = {value}')
+        if instrumentation is not None and instrumentation.enabled:
+            instrumentation.record('connection.connect', perf_counter() - start, 1)
+        with self._lock:
+            self._connections.append(con)
+        return con
+
+    def close(self) -> None:
+        """
+        Закрыть все открытые менеджером соединения. После закрытия менеджер
+        можно продолжать использовать, соединения будут открыты заново.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for con in connections:
+            con.close()
+        self._local = threading.local()
+
+    @classmethod
+    def close_all(cls) -> None:
+        """ Закрыть соединения всех общих менеджеров """
+        with cls._instances_lock:
+            managers = list(cls._instances.values())
+            cls._instances.clear()
+        for manager in managers:
+            manager.close()
@@ -0,0 +1,228 @@
+"""
+Модуль описывает репозиторий в оперативной памяти с сохранением на диск
+
+DurableMemoryRepository работает так же быстро, как MemoryRepository, но
+дописывает каждое изменение в журнал <path>.log (только добавление в конец
+файла). Периодически состояние целиком записывается в снимок
+<path>.snapshot, после чего журнал очищается. При создании репозиторий
+загружает снимок и повторяет записи журнала, сделанные после него.
+
+Записи журнала и снимок - последовательности pickle; объект хранится как
+кортеж значений полей модели (см. model_fields), поэтому файлы компактны
+и быстро загружаются. Неполная последняя запись журнала (например, после
+сбоя во время записи) отбрасывается.
+
+Каждая запись журнала сразу передается операционной системе (flush), так
+что завершение процесса их не теряет. Политика fsync определяет, сколько
+изменений может быть потеряно при сбое системы: 'always' - fsync после
+каждой записи, 'batch' - не позже чем через fsync_interval секунд после
+записи (по таймеру, даже если записей больше нет), 'close' - только при
+snapshot и close.
+"""
+
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from itertools import count
+from time import monotonic
+from typing import Any, BinaryIO, Iterable, Iterator
+
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.abstract_repository import T
+from bookkeeper.repository.schema import model_fields
+
+FSYNC_POLICIES = ('always', 'batch', 'close')
+
+_STORE, _REMOVE = 's', 'r'
+
+
+class DurableMemoryRepository(MemoryRepository[T]):
+    """
+    Репозиторий в оперативной памяти с журналом изменений и снимками.
+    path - путь к файлам без расширения: <path>.log и <path>.snapshot
+    cls - модель (dataclass), объекты которой хранятся в репозитории
+    fsync - политика fsync, одна из FSYNC_POLICIES
+    fsync_interval - наибольший интервал между fsync для политики 'batch'
+    snapshot_every - после скольких записей журнала делать снимок
+    (None - только при вызове snapshot и close)
+    indexes, sorted_indexes - как в MemoryRepository
+    """
+
+    def __init__(self, path: str, cls: type, fsync: str = 'batch',
+                 fsync_interval: float = 1.0,
+                 snapshot_every: int | None = 100_000,
+                 indexes: Iterable[str] = (),
+                 sorted_indexes: Iterable[str] = ()) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f'unknown fsync policy {fsync!r}')
+        super().__init__(indexes, sorted_indexes)
+        self.cls = cls
+        self.fields = list(model_fields(cls))
+        self.log_path = path + '.log'
+        self.snapshot_path = path + '.snapshot'
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self._pending: list[tuple[Any, ...]] = []
+        self._depth = 0
+        # число записей журнала после последнего снимка
+        self._log_records = 0
+        self._loading = True
+        self._load()
+        self._loading = False
+        self._log: BinaryIO = open(  # pylint: disable=consider-using-with
+            self.log_path, 'ab')
+        self._last_sync = monotonic()
+        # таймер fsync политики 'batch' и блокировка, защищающая от него
+        # закрытие журнала
+        self._timer: threading.Timer | None = None
+        self._sync_lock = threading.Lock()
+
+    def _next_pk(self) -> int:
+        pk = next(self._counter)
+        self._counter = count(pk)
+        return pk
+
+    def _load(self) -> None:
+        next_pk = 1
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'rb') as file:
+                next_pk, rows = pickle.load(file)
+            cls = self.cls
+            self._container = {pk: cls(*values, pk=pk) for pk, values in rows}
+            self._reindex()
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'r+b') as file:
+                valid = 0
+                while True:
+                    try:
+                        operation, pk, values = pickle.load(file)
+                    except (EOFError, pickle.UnpicklingError, ValueError):
+                        break
+                    valid = file.tell()
+                    self._log_records += 1
+                    if operation == _STORE:
+                        self._store(pk, self._restore(pk, values))
+                        next_pk = max(next_pk, pk + 1)
+                    else:
+                        self._container.pop(pk, None)
+                        self._unindex(pk)
+                # неполная запись в конце журнала отбрасывается
+                file.truncate(valid)
+        self._counter = count(max(next_pk, max(self._container, default=0) + 1))
+
+    def _restore(self, pk: int, values: tuple[Any, ...]) -> T:
+        # поля модели, кроме pk, идут в порядке аргументов конструктора
+        return self.cls(*values, pk=pk)
+
+    def _store(self, pk: int, obj: T) -> None:
+        super()._store(pk, obj)
+        if not self._loading:
+            self._append((_STORE, pk,
+                          tuple(getattr(obj, field) for field in self.fields)))
+
+    def _remove(self, pk: int) -> T:
+        obj = super()._remove(pk)
+        self._append((_REMOVE, pk, None))
+        return obj
+
+    def _append(self, record: tuple[Any, ...]) -> None:
+        if self._depth:
+            # записи транзакции попадают в журнал после ее успешного завершения
+            self._pending.append(record)
+            return
+        self._write([record])
+
+    def _write(self, records: list[tuple[Any, ...]]) -> None:
+        for record in records:
+            pickle.dump(record, self._log, pickle.HIGHEST_PROTOCOL)
+        self._log.flush()
+        self._log_records += len(records)
+        if self.fsync == 'always':
+            self.sync()
+        elif self.fsync == 'batch':
+            self._schedule_sync()
+        if self.snapshot_every is not None and self._log_records >= self.snapshot_every:
+            self.snapshot()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Контекст транзакции MemoryRepository; изменения записываются
+        в журнал при успешном завершении внешнего контекста
+        """
+        mark = len(self._pending)
+        self._depth += 1
+        try:
+            with super().transaction():
+                yield
+        except BaseException:
+            del self._pending[mark:]
+            raise
+        finally:
+            self._depth -= 1
+        if not self._depth and self._pending:
+            records, self._pending = self._pending, []
+            self._write(records)
+
+    def _schedule_sync(self) -> None:
+        delay = self._last_sync + self.fsync_interval - monotonic()
+        if delay <= 0:
+            self.sync()
+            return
+        with self._sync_lock:
+            if self._timer is None:
+                self._timer = threading.Timer(delay, self._timed_sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_sync(self) -> None:
+        # журнал уже передан системе (flush в _write), остается только fsync
+        with self._sync_lock:
+            self._timer = None
+            if not self._log.closed:
+                os.fsync(self._log.fileno())
+                self._last_sync = monotonic()
+
+    def sync(self) -> None:
+        """ Сбросить журнал на диск (flush и fsync) """
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._last_sync = monotonic()
+
+    def snapshot(self) -> None:
+        """
+        Записать текущее состояние в снимок и очистить журнал. Снимок
+        записывается во временный файл и атомарно заменяет прежний, так что
+        при сбое сохраняется либо старый снимок с журналом, либо новый.
+        """
+        rows = [(pk, tuple(getattr(obj, field) for field in self.fields))
+                for pk, obj in self._container.items()]
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump((self._next_pk(), rows), file, pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        # если сбой произойдет до очистки журнала, его повторное применение
+        # к новому снимку дает то же состояние
+        self._log.flush()
+        self._log.truncate(0)
+        self._log.seek(0)
+        self.sync()
+        self._log_records = 0
+
+    def close(self) -> None:
+        """ Записать снимок и закрыть журнал """
+        if self._log.closed:
+            return
+        if self._log_records:
+            self.snapshot()
+        else:
+            self.sync()
+        with self._sync_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._log.close()
@@ -0,0 +1,131 @@
+"""
+Модуль описывает чтение трат вместе с данными их категорий
+
+Для отображения траты нужны название категории и полный путь к ней в
+иерархии. Вместо запроса категории для каждой траты ExpenseRows получает
+их вместе с тратами: для sqlite - одним запросом с соединением таблиц,
+для остальных репозиториев - через словарь категорий, построенный один раз.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.cached_repository import uncached
+from bookkeeper.repository.instrumentation import uninstrumented
+from bookkeeper.repository.query import compile_order, compile_where
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+
+
+@dataclass(slots=True)
+class ExpenseRow:
+    """
+    Трата с данными категории.
+    expense - трата
+    category_name - название категории
+    category_path - путь к категории от верхнего уровня, например
+    'продукты / мясо / сырое мясо'
+    """
+    expense: Expense
+    category_name: str
+    category_path: str
+
+
+class ExpenseRows:
+    """
+    Чтение трат вместе с названием и путем категории.
+    exp_repo - репозиторий с тратами
+    cat_repo - репозиторий с категориями
+    separator - разделитель названий в пути категории
+    """
+
+    def __init__(self, exp_repo: AbstractRepository[Expense],
+                 cat_repo: AbstractRepository[Category],
+                 separator: str = ' / ') -> None:
+        self.exp_repo = exp_repo
+        self.cat_repo = cat_repo
+        self.separator = separator
+        self._categories: dict[int, tuple[str, str]] | None = None
+
+    def _joined(self) -> bool:
+        # кэш не мешает соединению таблиц: запрос идет мимо него к базе
+        exp_repo, cat_repo = self._sqlite_repos()
+        return isinstance(exp_repo, SqliteRepository) \
+            and isinstance(cat_repo, SqliteRepository) \
+            and exp_repo.connections is cat_repo.connections
+
+    def _sqlite_repos(self) -> tuple[AbstractRepository[Expense],
+                                     AbstractRepository[Category]]:
+        return (uncached(uninstrumented(self.exp_repo)),
+                uncached(uninstrumented(self.cat_repo)))
+
+    def invalidate(self) -> None:
+        """ Сбросить словарь категорий после изменения категорий """
+        self._categories = None
+
+    def categories(self) -> dict[int, tuple[str, str]]:
+        """
+        Словарь {pk категории: (название, путь)}, строится по всем
+        категориям один раз до вызова invalidate
+        """
+        if self._categories is None:
+            cats = {cat.pk: cat for cat in self.cat_repo.get_all()}
+            paths: dict[int, str] = {}
+
+            def path(pk: int) -> str:
+                if pk not in paths:
+                    cat = cats[pk]
+                    paths[pk] = cat.name if cat.parent is None \
+                        else path(cat.parent) + self.separator + cat.name
+                return paths[pk]
+
+            self._categories = {pk: (cat.name, path(pk)) for pk, cat in cats.items()}
+        return self._categories
+
+    def get_all(self, where: dict[str, Any] | None = None,
+                order_by: str | Sequence[str] | None = None,
+                limit: int | None = None) -> list[ExpenseRow]:
+        """
+        Получить траты с данными категорий, аргументы - как в get_all
+        репозитория трат
+        """
+        if self._joined():
+            return self._get_all_joined(where, order_by, limit)
+        categories = self.categories()
+        return [ExpenseRow(exp, *categories[exp.category])
+                for exp in self.exp_repo.get_all(where, order_by, limit)]
+
+    def _get_all_joined(self, where: dict[str, Any] | None,
+                        order_by: str | Sequence[str] | None,
+                        limit: int | None) -> list[ExpenseRow]:
+        exp_repo, cat_repo = self._sqlite_repos()
+        assert isinstance(exp_repo, SqliteRepository) \
+            and isinstance(cat_repo, SqliteRepository)
+        exp_table, cat_table = exp_repo.table_name, cat_repo.table_name
+        columns = ['pk', *exp_repo.fields]
+        condition, params = compile_where(where, columns)
+        inner = f'SELECT {exp_repo.select_list()} FROM {exp_table}{condition}' \
+            + compile_order(order_by, columns)
+        if limit is not None:
+            inner += ' LIMIT ?'
+            params.append(limit)
+        # пути всех категорий считаются рекурсивным запросом по таблице
+        # категорий, которая намного меньше таблицы трат
+        query = (
+            f'WITH RECURSIVE path (pk, path) AS ('
+            f'SELECT pk, name FROM {cat_table} WHERE parent IS NULL '
+            f'UNION ALL '
+            f'SELECT c.pk, path.path || ? || c.name FROM {cat_table} AS c '
+            f'JOIN path ON c.parent = path.pk) '
+            f'SELECT {exp_repo.select_list("e")}, c.name, path.path '
+            f'FROM ({inner}) AS e '
+            f'JOIN {cat_table} AS c ON c.pk = e.category '
+            f'JOIN path ON path.pk = e.category'
+            + compile_order(order_by or 'pk', columns, table='e')
+        )
+        rows = exp_repo.connections.connection().execute(
+            query, [self.separator, *params]).fetchall()
+        make, n = exp_repo.make_object, len(exp_repo.columns)
+        return [ExpenseRow(make(*row[:n]), *row[n:]) for row in rows]
@@ -0,0 +1,510 @@
+"""
+Модуль описывает сбор статистики работы репозиториев
+
+Instrumentation накапливает для каждого ключа (метода репозитория,
+SQL-запроса, вызова в потоке RepositoryWorker) число вызовов, ошибок,
+обработанных строк и гистограмму времени выполнения, а также журнал
+медленных запросов с их планом выполнения (EXPLAIN QUERY PLAN).
+Статистика собирается в двух местах:
+- InstrumentedRepository (Instrumentation.wrap) - обертка любого
+  репозитория, время методов включает преобразование строк в объекты;
+- соединения ConnectionManager после вызова instrument - время каждого
+  SQL-запроса, в том числе запросов ExpenseRows и unit_of_work.
+
+Без Instrumentation репозитории и соединения работают как обычно и
+ничего не тратят на сбор статистики. Отключить сбор, не убирая обертки,
+можно флагом enabled.
+
+    instrumentation = Instrumentation(slow_threshold=0.05)
+    connections.instrument(instrumentation)
+    exp_repo = instrumentation.wrap(SqliteRepository(db_file, Expense))
+    ...
+    print(instrumentation.report())
+"""
+
+import re
+import sqlite3
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from time import perf_counter
+from typing import Any, Callable, Iterable, Iterator, Sequence, cast
+
+from bookkeeper.repository.abstract_repository import AbstractRepository, T
+
+# верхние границы интервалов гистограммы: от 1 мкс до 8 с с шагом в 2 раза
+BUCKETS = tuple(2 ** i / 1e6 for i in range(24))
+
+_PLACEHOLDERS = re.compile(r'\?(?:\s*,\s*\?)+')
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Текст запроса для статистики: пробелы схлопываются, а списки
+    параметров IN (?, ?, ...) разной длины приводятся к одному виду
+    """
+    return _PLACEHOLDERS.sub('?, ...', ' '.join(sql.split()))
+
+
+class Histogram:
+    """
+    Гистограмма времени выполнения с логарифмическими интервалами (BUCKETS),
+    последний интервал - все, что дольше 8 с
+    """
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        """ Учесть одно измерение """
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """
+        Оценка q-квантили (0 < q <= 1) сверху: граница интервала,
+        в который она попадает, но не больше наибольшего измерения
+        """
+        rank = q * sum(self.counts)
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return 0.0
+
+
+@dataclass
+class CallStats:
+    """
+    Статистика одного ключа.
+    rows - число возвращенных или измененных строк (объектов);
+    fetch_seconds - для SQL-запросов время получения строк после execute
+    (sqlite вычисляет строки по мере их чтения), в seconds и гистограмму
+    не входит
+    """
+    calls: int = 0
+    errors: int = 0
+    rows: int = 0
+    seconds: float = 0.0
+    fetch_seconds: float = 0.0
+    histogram: Histogram = field(default_factory=Histogram, repr=False)
+
+    @property
+    def mean(self) -> float:
+        """ Среднее время вызова """
+        return self.seconds / self.calls if self.calls else 0.0
+
+    def summary(self) -> dict[str, Any]:
+        """ Статистика в виде словаря (для JSON), время - в секундах """
+        return {'calls': self.calls, 'errors': self.errors, 'rows': self.rows,
+                'seconds': self.seconds, 'fetch_seconds': self.fetch_seconds,
+                'mean': self.mean, 'p50': self.histogram.percentile(0.5),
+                'p95': self.histogram.percentile(0.95),
+                'p99': self.histogram.percentile(0.99), 'max': self.histogram.max}
+
+
+@dataclass
+class SlowQuery:
+    """
+    Запись журнала медленных запросов.
+    params - параметры запроса (None для executemany);
+    plan - строки EXPLAIN QUERY PLAN (пустой список, если план не получен)
+    """
+    sql: str
+    seconds: float
+    params: Sequence[Any] | None
+    plan: list[str]
+    time: datetime = field(default_factory=datetime.now)
+
+
+class Instrumentation:
+    """
+    Накопитель статистики.
+    slow_threshold - время в секундах, начиная с которого SQL-запрос
+    попадает в журнал медленных запросов
+    slow_log_size - число хранимых записей журнала (старые вытесняются)
+    """
+
+    def __init__(self, slow_threshold: float = 0.1, slow_log_size: int = 100) -> None:
+        self.enabled = True
+        self.slow_threshold = slow_threshold
+        self.methods: dict[str, CallStats] = {}
+        self.statements: dict[str, CallStats] = {}
+        self.slow_queries: deque[SlowQuery] = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float, rows: int = 0,
+               error: bool = False) -> None:
+        """ Учесть вызов key (например, 'expense.get_all') """
+        with self._lock:
+            self._add(self.methods, key, seconds, rows, error)
+
+    def record_statement(self, sql: str, seconds: float, rows: int = 0,
+                         error: bool = False) -> CallStats:
+        """ Учесть выполнение SQL-запроса, вернуть его статистику """
+        with self._lock:
+            return self._add(self.statements, normalize_sql(sql), seconds, rows, error)
+
+    @staticmethod
+    def _add(table: dict[str, CallStats], key: str, seconds: float, rows: int,
+             error: bool) -> CallStats:
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = CallStats()
+        stats.calls += 1
+        stats.errors += error
+        stats.rows += rows
+        stats.seconds += seconds
+        stats.histogram.add(seconds)
+        return stats
+
+    def record_fetch(self, stats: CallStats, seconds: float, rows: int) -> None:
+        """ Учесть строки запроса, полученные после execute """
+        with self._lock:
+            stats.rows += rows
+            stats.fetch_seconds += seconds
+
+    def record_slow(self, query: SlowQuery) -> None:
+        """ Добавить запись в журнал медленных запросов """
+        with self._lock:
+            self.slow_queries.append(query)
+
+    @contextmanager
+    def timer(self, key: str) -> Iterator[None]:
+        """ Учесть время выполнения блока with как вызов key """
+        if not self.enabled:
+            yield
+            return
+        start = perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record(key, perf_counter() - start, error=True)
+            raise
+        self.record(key, perf_counter() - start)
+
+    def wrap(self, repo: AbstractRepository[T],
+             name: str | None = None) -> 'InstrumentedRepository[T]':
+        """ Обернуть репозиторий, см. InstrumentedRepository """
+        return InstrumentedRepository(repo, self, name)
+
+    def reset(self) -> None:
+        """ Сбросить всю накопленную статистику """
+        with self._lock:
+            self.methods.clear()
+            self.statements.clear()
+            self.slow_queries.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Вся статистика в виде словаря из простых типов (для JSON):
+        methods и statements - {ключ: CallStats.summary()},
+        slow_queries - список записей журнала
+        """
+        with self._lock:
+            return {
+                'methods': {key: s.summary() for key, s in self.methods.items()},
+                'statements': {key: s.summary() for key, s in self.statements.items()},
+                'slow_queries': [{'sql': q.sql, 'seconds': q.seconds,
+                                  'params': None if q.params is None else list(q.params),
+                                  'plan': q.plan, 'time': q.time.isoformat()}
+                                 for q in self.slow_queries],
+            }
+
+    def report(self, top: int = 10) -> str:
+        """
+        Текстовый отчет: методы, top самых долгих по суммарному времени
+        SQL-запросов и журнал медленных запросов; время - в миллисекундах
+        """
+        data = self.snapshot()
+        lines = [f'{"":40} {"calls":>7} {"errors":>6} {"rows":>9} {"total ms":>9} '
+                 f'{"mean ms":>8} {"p95 ms":>8} {"max ms":>8}']
+
+        def table(title: str, items: Iterable[tuple[str, dict[str, Any]]]) -> None:
+            lines.append(title)
+            for key, s in items:
+                key = key if len(key) <= 40 else key[:37] + '...'
+                lines.append(f'{key:40} {s["calls"]:7} {s["errors"]:6} {s["rows"]:9} '
+                             f'{s["seconds"] * 1e3:9.1f} {s["mean"] * 1e3:8.3f} '
+                             f'{s["p95"] * 1e3:8.3f} {s["max"] * 1e3:8.3f}')
+
+        table('methods:', sorted(data['methods'].items()))
+        table('statements:', sorted(data['statements'].items(),
+                                    key=lambda item: -item[1]['seconds'])[:top])
+        lines.append('slow queries:')
+        for query in data['slow_queries']:
+            lines.append(f'{query["seconds"] * 1e3:9.1f} {query["sql"]}')
+            lines.extend(f'{"":10}{step}' for step in query['plan'])
+        return '\n'.join(lines)
+
+
+def uninstrumented(repo: AbstractRepository[T]) -> AbstractRepository[T]:
+    """ Репозиторий, обернутый InstrumentedRepository, или сам repo """
+    return repo.repo if isinstance(repo, InstrumentedRepository) else repo
+
+
+class _Counted:
+    """ Итератор по objs, считающий выданные элементы """
+
+    def __init__(self, objs: Iterable[Any]) -> None:
+        self._objs = iter(objs)
+        self.count = 0
+
+    def __iter__(self) -> '_Counted':
+        return self
+
+    def __next__(self) -> Any:
+        obj = next(self._objs)
+        self.count += 1
+        return obj
+
+
+class InstrumentedRepository(AbstractRepository[T]):
+    """
+    Репозиторий, записывающий в instrumentation время, число вызовов,
+    ошибок и строк каждого метода под ключом '<name>.<метод>'.
+    name по умолчанию - имя таблицы репозитория (или имя его класса).
+    Обертка должна быть внешней (поверх CachedRepository): тогда время
+    методов - то, что видят вызывающие, с учетом попаданий в кэш.
+    Остальные атрибуты берутся у repo; из них методы AGGREGATES тоже
+    измеряются.
+    """
+
+    AGGREGATES = ('total', 'totals_by', 'ancestors', 'descendants', 'subtree_sum')
+
+    def __init__(self, repo: AbstractRepository[T], instrumentation: Instrumentation,
+                 name: str | None = None) -> None:
+        self.repo = repo
+        self.instrumentation = instrumentation
+        self.name = name or getattr(repo, 'table_name', None) or type(repo).__name__
+
+    def __getattr__(self, name: str) -> Any:
+        # вызывается только для атрибутов, которых нет у обертки
+        if name in ('repo', 'instrumentation'):
+            raise AttributeError(name)
+        attr = getattr(self.repo, name)
+        if name not in self.AGGREGATES:
+            return attr
+
+        def measured(*args: Any, **kwargs: Any) -> Any:
+            return self._call(name, _rows, attr, *args, **kwargs)
+        return measured
+
+    def _call(self, method: str, rows: Callable[[Any], int], fn: Callable[..., Any],
+              *args: Any, **kwargs: Any) -> Any:
+        if not self.instrumentation.enabled:
+            return fn(*args, **kwargs)
+        key = f'{self.name}.{method}'
+        start = perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.instrumentation.record(key, perf_counter() - start, error=True)
+            raise
+        self.instrumentation.record(key, perf_counter() - start, rows(result))
+        return result
+
+    def _call_many(self, method: str, fn: Callable[..., Any], objs: Iterable[Any],
+                   chunk_size: int) -> Any:
+        # объекты считаются по мере чтения, без копирования в список
+        if not self.instrumentation.enabled:
+            return fn(objs, chunk_size)
+        key = f'{self.name}.{method}'
+        counted = _Counted(objs)
+        start = perf_counter()
+        try:
+            result = fn(counted, chunk_size)
+        except Exception:
+            self.instrumentation.record(key, perf_counter() - start, counted.count, True)
+            raise
+        self.instrumentation.record(key, perf_counter() - start, counted.count)
+        return result
+
+    def get(self, pk: int) -> T | None:
+        return self._call('get', lambda obj: obj is not None, self.repo.get, pk)
+
+    def get_all(self, where: dict[str, Any] | None = None,
+                order_by: str | Sequence[str] | None = None,
+                limit: int | None = None) -> list[T]:
+        return self._call('get_all', len, self.repo.get_all, where, order_by, limit)
+
+    def iter_all(self, where: dict[str, Any] | None = None,
+                 order_by: str | Sequence[str] | None = None,
+                 batch_size: int = 1000) -> Iterator[T]:
+        if not self.instrumentation.enabled:
+            yield from self.repo.iter_all(where, order_by, batch_size)
+            return
+        # учитывается только время внутри iter_all, без обработки объектов
+        # вызывающим кодом между шагами перебора
+        objs = self.repo.iter_all(where, order_by, batch_size)
+        seconds = 0.0
+        rows = 0
+        error = False
+        try:
+            while True:
+                start = perf_counter()
+                try:
+                    obj = next(objs)
+                except StopIteration:
+                    break
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    seconds += perf_counter() - start
+                rows += 1
+                yield obj
+        finally:
+            self.instrumentation.record(f'{self.name}.iter_all', seconds, rows, error)
+
+    def add(self, obj: T) -> int:
+        return self._call('add', _one, self.repo.add, obj)
+
+    def add_many(self, objs: Iterable[T], chunk_size: int = 1000) -> list[int]:
+        return self._call_many('add_many', self.repo.add_many, objs, chunk_size)
+
+    def update(self, obj: T) -> None:
+        self._call('update', _one, self.repo.update, obj)
+
+    def update_many(self, objs: Iterable[T], chunk_size: int = 1000) -> None:
+        self._call_many('update_many', self.repo.update_many, objs, chunk_size)
+
+    def delete(self, pk: int) -> None:
+        self._call('delete', _one, self.repo.delete, pk)
+
+    def delete_many(self, pks: Iterable[int], chunk_size: int = 1000) -> None:
+        self._call_many('delete_many', self.repo.delete_many, pks, chunk_size)
+
+
+def _rows(result: Any) -> int:
+    return len(result) if isinstance(result, (list, dict)) else 0
+
+
+def _one(_: Any) -> int:
+    return 1
+
+
+class TracingCursor(sqlite3.Cursor):
+    """
+    Курсор, записывающий время и число строк каждого запроса
+    в Instrumentation своего соединения (TracingConnection)
+    """
+
+    _stats: CallStats | None = None
+
+    @property
+    def instrumentation(self) -> Instrumentation:
+        """ Instrumentation соединения, создавшего курсор """
+        return cast('TracingConnection', self.connection).instrumentation
+
+    def _record(self, sql: str, params: Any, start: float, many: bool) -> None:
+        seconds = perf_counter() - start
+        instrumentation = self.instrumentation
+        # rowcount - число измененных строк, для SELECT это -1
+        rows = max(self.rowcount, 0)
+        self._stats = instrumentation.record_statement(sql, seconds, rows)
+        if seconds >= instrumentation.slow_threshold:
+            instrumentation.record_slow(SlowQuery(
+                normalize_sql(sql), seconds, None if many else tuple(params),
+                query_plan(self.connection, sql, None if many else params)))
+
+    def execute(self, sql: str, parameters: Any = (), /) -> 'TracingCursor':
+        if not self.instrumentation.enabled:
+            super().execute(sql, parameters)
+            self._stats = None
+            return self
+        start = perf_counter()
+        try:
+            super().execute(sql, parameters)
+        except Exception:
+            self.instrumentation.record_statement(
+                sql, perf_counter() - start, error=True)
+            raise
+        self._record(sql, parameters, start, False)
+        return self
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any],
+                    /) -> 'TracingCursor':
+        if not self.instrumentation.enabled:
+            super().executemany(sql, seq_of_parameters)
+            self._stats = None
+            return self
+        start = perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        except Exception:
+            self.instrumentation.record_statement(
+                sql, perf_counter() - start, error=True)
+            raise
+        self._record(sql, None, start, True)
+        return self
+
+    def _fetched(self, start: float, rows: int) -> None:
+        if self._stats is not None:
+            self.instrumentation.record_fetch(
+                self._stats, perf_counter() - start, rows)
+
+    def fetchone(self) -> Any:
+        start = perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None)
+        return row
+
+    def fetchmany(self, size: int | None = None) -> list[Any]:
+        start = perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self) -> list[Any]:
+        start = perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+    def __next__(self) -> Any:
+        start = perf_counter()
+        row = super().__next__()
+        self._fetched(start, 1)
+        return row
+
+
+class TracingConnection(sqlite3.Connection):
+    """
+    Соединение, все курсоры которого - TracingCursor.
+    Создается ConnectionManager (см. ConnectionManager.instrument),
+    атрибут instrumentation назначается после открытия соединения.
+    """
+
+    instrumentation: Instrumentation
+
+    def cursor(self, factory: Any = TracingCursor) -> Any:
+        return super().cursor(factory)
+
+    # execute и executemany соединения создают курсор в обход cursor
+    def execute(self, sql: str, parameters: Any = (), /) -> Any:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any], /) -> Any:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def query_plan(con: sqlite3.Connection, sql: str,
+               params: Sequence[Any] | None = None) -> list[str]:
+    """
+    План выполнения запроса (EXPLAIN QUERY PLAN) мимо статистики соединения;
+    без params вместо параметров подставляется NULL. Для запросов без
+    плана (BEGIN, PRAGMA и т.п.) и при ошибке - пустой список.
+    """
+    if params is None:
+        params = [None] * sql.count('?')
+    try:
+        cur = sqlite3.Cursor(con).execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cur]
+    except sqlite3.Error:
+        return []
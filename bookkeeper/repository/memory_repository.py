@@ -1,43 +1,271 @@
 """
 Модуль описывает репозиторий, работающий в оперативной памяти
+
+Для ускорения get_all репозиторий может поддерживать индексы по полям:
+хеш-индекс (словарь {значение: множество pk}) отвечает на условия на
+равенство, In и IsNull, сортированный индекс (упорядоченный список значений
+с двоичным поиском) - также на условия Range. Условие на поле с индексом
+выбирает кандидатов без просмотра всех объектов, остальные условия
+проверяются только для кандидатов.
 """
 
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
 from itertools import count
-from typing import Any
+from typing import Any, Iterable, Iterator, Sequence
 
 from bookkeeper.repository.abstract_repository import AbstractRepository, T
+from bookkeeper.repository.query import In, IsNull, Predicate, Range, matches, apply_order
+
+
+class _HashIndex:
+    """ Хеш-индекс поля: {значение: множество pk} """
+
+    def __init__(self) -> None:
+        self._pks: dict[Any, set[int]] = {}
+
+    def add(self, pk: int, value: Any) -> None:
+        self._pks.setdefault(value, set()).add(pk)
+
+    def remove(self, pk: int, value: Any) -> None:
+        pks = self._pks[value]
+        pks.discard(pk)
+        if not pks:
+            del self._pks[value]
+
+    def lookup(self, condition: Any) -> set[int] | None:
+        """ pk объектов, удовлетворяющих условию, или None, если индекс не применим """
+        if isinstance(condition, In):
+            return set().union(*(self._pks.get(value, ()) for value in condition.values))
+        if isinstance(condition, IsNull):
+            condition = None
+        elif isinstance(condition, Predicate):
+            return None
+        return set(self._pks.get(condition, ()))
+
+
+class _SortedIndex:
+    """
+    Сортированный индекс поля: значения и pk в параллельных списках,
+    упорядоченных по значению. Значения None хранятся отдельно.
+    """
+
+    def __init__(self) -> None:
+        self._values: list[Any] = []
+        self._pks: list[int] = []
+        self._nulls: set[int] = set()
+
+    def add(self, pk: int, value: Any) -> None:
+        if value is None:
+            self._nulls.add(pk)
+            return
+        i = bisect_right(self._values, value)
+        self._values.insert(i, value)
+        self._pks.insert(i, pk)
+
+    def remove(self, pk: int, value: Any) -> None:
+        if value is None:
+            self._nulls.discard(pk)
+            return
+        i = self._pks.index(pk, bisect_left(self._values, value),
+                            bisect_right(self._values, value))
+        del self._values[i]
+        del self._pks[i]
+
+    def _between(self, lo: int, hi: int) -> set[int]:
+        return set(self._pks[lo:hi])
+
+    def _equal(self, value: Any) -> set[int]:
+        if value is None:
+            return set(self._nulls)
+        return self._between(bisect_left(self._values, value),
+                             bisect_right(self._values, value))
+
+    def lookup(self, condition: Any) -> set[int] | None:
+        """ pk объектов, удовлетворяющих условию, или None, если индекс не применим """
+        if isinstance(condition, Range):
+            lo = 0 if condition.start is None \
+                else bisect_left(self._values, condition.start)
+            hi = len(self._values) if condition.stop is None \
+                else bisect_left(self._values, condition.stop)
+            return self._between(lo, hi)
+        if isinstance(condition, In):
+            return set().union(*(self._equal(value) for value in condition.values))
+        if isinstance(condition, IsNull):
+            return set(self._nulls)
+        if isinstance(condition, Predicate):
+            return None
+        return self._equal(condition)
 
 
 class MemoryRepository(AbstractRepository[T]):
     """
     Репозиторий, работающий в оперативной памяти. Хранит данные в словаре.
+    indexes - поля с хеш-индексом (условия на равенство, In, IsNull)
+    sorted_indexes - поля с сортированным индексом (также условия Range)
+    Индексы обновляются методами add, update и delete, поэтому изменение
+    поля сохраненного объекта нужно сохранять через update.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, indexes: Iterable[str] = (),
+                 sorted_indexes: Iterable[str] = ()) -> None:
         self._container: dict[int, T] = {}
         self._counter = count(1)
+        self._indexes: list[tuple[str, _HashIndex | _SortedIndex]] = \
+            [(field, _HashIndex()) for field in indexes] \
+            + [(field, _SortedIndex()) for field in sorted_indexes]
+        # значения полей, под которыми объект записан в индексы
+        self._indexed: dict[int, tuple[Any, ...]] = {}
+        # журнал отмены транзакции: (pk, прежний объект или None)
+        self._undo: list[tuple[int, T | None]] | None = None
+
+    def _store(self, pk: int, obj: T) -> None:
+        if self._undo is not None:
+            self._undo.append((pk, self._container.get(pk)))
+        if self._indexes:
+            self._unindex(pk)
+            values = tuple(getattr(obj, field) for field, _ in self._indexes)
+            for (_, index), value in zip(self._indexes, values):
+                index.add(pk, value)
+            self._indexed[pk] = values
+        self._container[pk] = obj
+
+    def _unindex(self, pk: int) -> None:
+        values = self._indexed.pop(pk, None)
+        if values is not None:
+            for (_, index), value in zip(self._indexes, values):
+                index.remove(pk, value)
+
+    def _remove(self, pk: int) -> T:
+        obj = self._container.pop(pk)
+        self._unindex(pk)
+        if self._undo is not None:
+            self._undo.append((pk, obj))
+        return obj
+
+    def _reindex(self) -> None:
+        if not self._indexes:
+            return
+        container = self._container
+        self._container = {}
+        self._indexes = [(field, type(index)()) for field, index in self._indexes]
+        self._indexed = {}
+        for pk, obj in container.items():
+            self._store(pk, obj)
+
+    def _candidates(self, where: dict[str, Any] | None) -> Iterable[T]:
+        """ Объекты, среди которых нужно искать удовлетворяющие условию """
+        best: set[int] | None = None
+        for field, index in self._indexes:
+            if where and field in where:
+                pks = index.lookup(where[field])
+                if pks is not None and (best is None or len(pks) < len(best)):
+                    best = pks
+        if best is None:
+            return self._container.values()
+        return [self._container[pk] for pk in sorted(best)]
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Контекст транзакции: при исключении изменения репозитория
+        отменяются по журналу отмены, а pk добавленных в контексте объектов
+        сбрасывается в 0. Изменения атрибутов самих объектов не
+        откатываются. Контексты могут быть вложенными.
+        """
+        outer = self._undo is None
+        undo: list[tuple[int, T | None]] = [] if self._undo is None else self._undo
+        self._undo = undo
+        mark = len(undo)
+        next_pk = next(self._counter)
+        self._counter = count(next_pk)
+        try:
+            yield
+        except BaseException:
+            self._rollback(undo, mark)
+            self._counter = count(next_pk)
+            raise
+        finally:
+            if outer:
+                self._undo = None
+
+    def _rollback(self, undo: list[tuple[int, T | None]], mark: int) -> None:
+        """ Отменить изменения, записанные в журнал отмены undo после mark """
+        entries = undo[mark:]
+        del undo[mark:]
+        # сама отмена в журнал не записывается
+        self._undo = None
+        try:
+            for pk, obj in reversed(entries):
+                if obj is not None:
+                    self._store(pk, obj)
+                elif pk in self._container:
+                    self._remove(pk).pk = 0
+        finally:
+            self._undo = undo
 
     def add(self, obj: T) -> int:
         if getattr(obj, 'pk', None) != 0:
             raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
         pk = next(self._counter)
-        self._container[pk] = obj
+        self._store(pk, obj)
         obj.pk = pk
         return pk
 
     def get(self, pk: int) -> T | None:
         return self._container.get(pk)
 
-    def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
+    def get_all(self, where: dict[str, Any] | None = None,
+                order_by: str | Sequence[str] | None = None,
+                limit: int | None = None) -> list[T]:
         if where is None:
-            return list(self._container.values())
-        return [obj for obj in self._container.values()
-                if all(getattr(obj, attr) == value for attr, value in where.items())]
+            res = list(self._container.values())
+        else:
+            res = [obj for obj in self._candidates(where) if matches(obj, where)]
+        if order_by is not None:
+            apply_order(res, order_by)
+        return res if limit is None else res[:limit]
+
+    def iter_all(self, where: dict[str, Any] | None = None,
+                 order_by: str | Sequence[str] | None = None,
+                 batch_size: int = 1000) -> Iterator[T]:
+        if order_by is not None:
+            yield from self.get_all(where, order_by)
+            return
+        for obj in list(self._candidates(where)):
+            if matches(obj, where):
+                yield obj
 
     def update(self, obj: T) -> None:
         if obj.pk == 0:
             raise ValueError('attempt to update object with unknown primary key')
-        self._container[obj.pk] = obj
+        self._store(obj.pk, obj)
 
     def delete(self, pk: int) -> None:
-        self._container.pop(pk)
+        self._remove(pk)
+
+    def add_many(self, objs: Iterable[T], chunk_size: int = 1000) -> list[int]:
+        pks: list[int] = []
+        try:
+            for obj in objs:
+                pks.append(self.add(obj))
+        except ValueError:
+            for pk in pks:
+                self._remove(pk).pk = 0
+            raise
+        return pks
+
+    def update_many(self, objs: Iterable[T], chunk_size: int = 1000) -> None:
+        objs = list(objs)
+        if any(obj.pk == 0 for obj in objs):
+            raise ValueError('attempt to update object with unknown primary key')
+        for obj in objs:
+            self._store(obj.pk, obj)
+
+    def delete_many(self, pks: Iterable[int], chunk_size: int = 1000) -> None:
+        pks = list(pks)
+        missing = [pk for pk in pks if pk not in self._container]
+        if missing:
+            raise KeyError(missing)
+        for pk in pks:
+            self._remove(pk)
@@ -0,0 +1,100 @@
+"""
+Модуль содержит миграции существующих баз данных sqlite
+
+Версия схемы хранится в PRAGMA user_version, каждая миграция выполняется
+один раз. Запуск из командной строки:
+python -m bookkeeper.repository.migrations project_db.db
+"""
+
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Callable
+
+from bookkeeper.models.expense import now
+
+LEGACY_DATE_FORMATS = ("%H:%M, %d/%m/%Y", "%d/%m/%Y, %H:%M")
+
+
+def convert_legacy_date(value: str | None) -> str | None:
+    """
+    Перевести дату из прежнего формата ("%H:%M, %d/%m/%Y") в ISO 8601.
+    Значения в другом формате (в том числе уже переведенные) возвращаются
+    без изменений.
+    """
+    if value is None:
+        return None
+    for fmt in LEGACY_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).isoformat(sep=' ', timespec='seconds')
+        except ValueError:
+            continue
+    return value
+
+
+def migrate_expense_dates(con: sqlite3.Connection, batch_size: int = 1000) -> int:
+    """
+    Перевести даты в таблице expense в формат ISO 8601 на месте.
+    Таблица обрабатывается порциями по batch_size строк, каждая порция
+    фиксируется отдельной транзакцией, так что миграцию можно прервать
+    и запустить снова.
+    Returns
+    -------
+    Количество измененных строк
+    """
+    changed = 0
+    last_pk = 0
+    while True:
+        rows = con.execute(
+            'SELECT pk, expense_date, added_date FROM expense '
+            'WHERE pk > ? ORDER BY pk LIMIT ?', [last_pk, batch_size]
+        ).fetchall()
+        if not rows:
+            return changed
+        last_pk = rows[-1][0]
+        updates = []
+        for pk, expense_date, added_date in rows:
+            new_expense_date = convert_legacy_date(expense_date) or now()
+            new_added_date = convert_legacy_date(added_date) or new_expense_date
+            if (new_expense_date, new_added_date) != (expense_date, added_date):
+                updates.append([new_expense_date, new_added_date, pk])
+        with con:
+            con.executemany('UPDATE expense SET expense_date = ?, added_date = ? '
+                            'WHERE pk = ?', updates)
+        changed += len(updates)
+
+
+def _table_exists(con: sqlite3.Connection, name: str) -> bool:
+    return con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                       [name]).fetchone() is not None
+
+
+def _migrate_v1(con: sqlite3.Connection) -> None:
+    if _table_exists(con, 'expense'):
+        migrate_expense_dates(con)
+
+
+MIGRATIONS: list[Callable[[sqlite3.Connection], None]] = [
+    _migrate_v1,
+]
+
+
+def migrate(con: sqlite3.Connection) -> int:
+    """
+    Выполнить миграции, которые еще не применялись к базе данных.
+    Returns
+    -------
+    Номер версии схемы после миграции
+    """
+    version = con.execute('PRAGMA user_version').fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        migration(con)
+        with con:
+            con.execute(f'PRAGMA user_version = {number}')
+    return len(MIGRATIONS)
+
+
+if __name__ == '__main__':
+    with sqlite3.connect(sys.argv[1]) as connection:
+        print(f'schema version: {migrate(connection)}')
+    connection.close()
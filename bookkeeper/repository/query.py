@@ -0,0 +1,228 @@
+"""
+Модуль описывает условия выборки для метода get_all репозиториев
+
+Условие задается словарем {'название_поля': значение}. Значение может быть
+обычным объектом (проверка на равенство, None - проверка на NULL) или
+предикатом: In, Range, IsNull. Одно и то же условие компилируется в
+параметризованный SQL для SqliteRepository и проверяется в Python для
+MemoryRepository, так что оба репозитория возвращают одинаковый результат.
+
+Сортировка задается названием поля или списком названий, префикс '-'
+означает сортировку по убыванию: order_by=['-expense_date', 'pk'].
+
+Даты хранятся строками ISO 8601, поэтому условие на период - это Range
+по строкам, см. date_range. Поля с датами называются '<...>_date'.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Callable, Iterable, Sequence
+
+
+class Predicate(ABC):
+    """
+    Условие на значение одного поля
+    """
+
+    @abstractmethod
+    def to_sql(self, column: str) -> tuple[str, list[Any]]:
+        """ Вернуть SQL-выражение для столбца column и его параметры """
+
+    @abstractmethod
+    def __call__(self, value: Any) -> bool:
+        """ Проверить, удовлетворяет ли значение условию """
+
+
+@dataclass(frozen=True)
+class In(Predicate):
+    """ Значение поля входит в набор values """
+    values: tuple[Any, ...]
+
+    def __init__(self, values: Iterable[Any]) -> None:
+        object.__setattr__(self, 'values', tuple(values))
+
+    def to_sql(self, column: str) -> tuple[str, list[Any]]:
+        return f'{column} IN ({", ".join("?" * len(self.values))})', list(self.values)
+
+    def __call__(self, value: Any) -> bool:
+        return value in self.values
+
+
+@dataclass(frozen=True)
+class Range(Predicate):
+    """
+    Значение поля лежит в полуинтервале [start, stop).
+    Не заданная граница не ограничивает значение.
+    """
+    start: Any = None
+    stop: Any = None
+
+    def to_sql(self, column: str) -> tuple[str, list[Any]]:
+        parts, params = [], []
+        if self.start is not None:
+            parts.append(f'{column} >= ?')
+            params.append(self.start)
+        if self.stop is not None:
+            parts.append(f'{column} < ?')
+            params.append(self.stop)
+        if not parts:
+            return f'{column} IS NOT NULL', []
+        return ' AND '.join(parts), params
+
+    def __call__(self, value: Any) -> bool:
+        if value is None:
+            return False
+        if self.start is not None and value < self.start:
+            return False
+        return self.stop is None or value < self.stop
+
+
+@dataclass(frozen=True)
+class IsNull(Predicate):
+    """ Значение поля не задано (None / NULL) """
+
+    def to_sql(self, column: str) -> tuple[str, list[Any]]:
+        return f'{column} IS NULL', []
+
+    def __call__(self, value: Any) -> bool:
+        return value is None
+
+
+def is_date_field(name: str) -> bool:
+    """ Хранит ли поле дату (ISO 8601) """
+    return name.endswith('_date')
+
+
+def group_fields(group: str | Sequence[str]) -> tuple[str, ...]:
+    """ Привести группировку totals_by (поле или кортеж полей) к кортежу """
+    return (group,) if isinstance(group, str) else tuple(group)
+
+
+def to_iso(value: date | datetime | str) -> str:
+    """
+    Привести дату к формату хранения: datetime - 'YYYY-MM-DD HH:MM:SS',
+    date - 'YYYY-MM-DD' (т.е. начало дня), строка возвращается без изменений
+    """
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ', timespec='seconds')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def date_range(start: date | datetime | str | None = None,
+               end: date | datetime | str | None = None) -> Range:
+    """
+    Условие на дату в полуинтервале [start, end). Границы - date, datetime
+    или строка ISO 8601, не заданная граница не ограничивает дату.
+    date_range(date(2023, 3, 1), date(2023, 4, 1)) - весь март 2023 года.
+    """
+    return Range(None if start is None else to_iso(start),
+                 None if end is None else to_iso(end))
+
+
+def as_predicate(value: Any) -> Predicate | None:
+    """
+    Привести значение из условия к предикату. Для проверки на равенство
+    возвращает None.
+    """
+    if isinstance(value, Predicate):
+        return value
+    if value is None:
+        return IsNull()
+    return None
+
+
+def compile_where(where: dict[str, Any] | None,
+                  columns: Iterable[str]) -> tuple[str, list[Any]]:
+    """
+    Скомпилировать условие в SQL
+    Parameters
+    ----------
+    where - условие в виде словаря {'название_поля': значение или предикат}
+    columns - допустимые названия столбцов
+    Returns
+    -------
+    Строка вида ' WHERE ...' (пустая, если условий нет) и список параметров
+    """
+    if not where:
+        return '', []
+    allowed = set(columns)
+    parts, params = [], []
+    for column, value in where.items():
+        if column not in allowed:
+            raise ValueError(f'unknown field {column!r} in condition')
+        predicate = as_predicate(value)
+        if predicate is None:
+            parts.append(f'{column} = ?')
+            params.append(value)
+        else:
+            sql, values = predicate.to_sql(column)
+            parts.append(f'({sql})')
+            params.extend(values)
+    return ' WHERE ' + ' AND '.join(parts), params
+
+
+def compile_order(order_by: str | Sequence[str] | None,
+                  columns: Iterable[str], table: str | None = None) -> str:
+    """
+    Скомпилировать сортировку в SQL. Вернуть строку вида ' ORDER BY ...'
+    или пустую строку. table - название или псевдоним таблицы, которым
+    уточняются столбцы (для запросов с соединением таблиц).
+    """
+    keys = parse_order(order_by)
+    if not keys:
+        return ''
+    allowed = set(columns)
+    parts = []
+    for column, descending in keys:
+        if column not in allowed:
+            raise ValueError(f'unknown field {column!r} in order_by')
+        if table is not None:
+            column = f'{table}.{column}'
+        parts.append(f'{column} DESC' if descending else column)
+    return ' ORDER BY ' + ', '.join(parts)
+
+
+def parse_order(order_by: str | Sequence[str] | None) -> list[tuple[str, bool]]:
+    """ Разобрать сортировку в список пар (название поля, по убыванию) """
+    if order_by is None:
+        return []
+    if isinstance(order_by, str):
+        order_by = [order_by]
+    return [(key[1:], True) if key.startswith('-') else (key, False)
+            for key in order_by]
+
+
+def matches(obj: Any, where: dict[str, Any] | None) -> bool:
+    """ Проверить, удовлетворяет ли объект условию """
+    if not where:
+        return True
+    for attr, value in where.items():
+        predicate = as_predicate(value)
+        field = getattr(obj, attr)
+        if predicate is None:
+            if field != value:
+                return False
+        elif not predicate(field):
+            return False
+    return True
+
+
+def apply_order(objs: list[Any], order_by: str | Sequence[str] | None) -> list[Any]:
+    """
+    Отсортировать список объектов на месте так же, как это сделал бы sqlite:
+    значения None считаются меньше любых других
+    """
+    for attr, descending in reversed(parse_order(order_by)):
+        objs.sort(key=_order_key(attr), reverse=descending)
+    return objs
+
+
+def _null_first(value: Any) -> tuple[bool, Any]:
+    return (False, 0) if value is None else (True, value)
+
+
+def _order_key(attr: str) -> Callable[[Any], tuple[bool, Any]]:
+    return lambda obj: _null_first(getattr(obj, attr))
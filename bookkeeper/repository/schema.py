@@ -0,0 +1,184 @@
+"""
+Модуль создает таблицы и индексы sqlite по аннотациям моделей
+
+Тип столбца выводится из аннотации поля (int, str, float, bool и их
+варианты с None). Модель может дополнительно объявить атрибуты класса:
+indexes - кортеж индексов, каждый индекс - кортеж названий полей,
+foreign_keys - словарь {'поле': 'таблица'}, поле ссылается на pk таблицы,
+tree_parent - название поля со ссылкой на родителя для древовидных моделей.
+Для древовидной модели создается таблица замыкания <таблица>_closure
+(ancestor, descendant, depth) со всеми парами предок-потомок, включая
+пары (pk, pk, 0). Таблицу поддерживают триггеры на добавление, изменение
+родителя и удаление, так что она согласована с любыми изменениями таблицы.
+Создание идемпотентно: существующие таблицы и индексы не изменяются.
+"""
+
+import dataclasses
+import sqlite3
+import types
+from inspect import get_annotations
+from typing import Any, Callable, ClassVar, Union, get_args, get_origin
+
+SQL_TYPES: dict[type, str] = {
+    int: 'INTEGER',
+    bool: 'INTEGER',
+    float: 'REAL',
+    str: 'TEXT',
+    bytes: 'BLOB',
+}
+
+
+def model_fields(cls: type) -> dict[str, Any]:
+    """
+    Получить поля модели, хранящиеся в базе данных, в виде словаря
+    {'название': аннотация}, без pk и атрибутов класса (ClassVar)
+    """
+    fields = get_annotations(cls, eval_str=True)
+    return {name: annotation for name, annotation in fields.items()
+            if name != 'pk' and get_origin(annotation) is not ClassVar}
+
+
+def column_type(annotation: Any) -> tuple[str, bool]:
+    """
+    Вернуть тип столбца sqlite для аннотации и признак допустимости NULL
+    """
+    nullable = False
+    if get_origin(annotation) in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        nullable = len(args) < len(get_args(annotation))
+        annotation = args[0] if len(args) == 1 else None
+    return SQL_TYPES.get(annotation, 'TEXT'), nullable
+
+
+def table_name(cls: type) -> str:
+    """ Название таблицы для модели """
+    return cls.__name__.lower()
+
+
+def create_table_sql(cls: type) -> list[str]:
+    """
+    Сгенерировать команды создания таблицы и индексов для модели
+    """
+    name = table_name(cls)
+    foreign_keys: dict[str, str] = getattr(cls, 'foreign_keys', {})
+    columns = ['pk INTEGER PRIMARY KEY']
+    for field, annotation in model_fields(cls).items():
+        sql_type, nullable = column_type(annotation)
+        columns.append(f'{field} {sql_type}' + ('' if nullable else ' NOT NULL'))
+    for field, target in foreign_keys.items():
+        columns.append(f'FOREIGN KEY ({field}) REFERENCES {target}(pk)')
+    commands = [f'CREATE TABLE IF NOT EXISTS {name} ({", ".join(columns)})']
+    for index in getattr(cls, 'indexes', ()):
+        commands.append(
+            f'CREATE INDEX IF NOT EXISTS idx_{name}_{"_".join(index)} '
+            f'ON {name} ({", ".join(index)})'
+        )
+    parent = getattr(cls, 'tree_parent', None)
+    if parent is not None:
+        commands.extend(closure_sql(name, parent))
+    return commands
+
+
+def closure_sql(name: str, parent: str) -> list[str]:
+    """
+    Сгенерировать команды создания таблицы замыкания для таблицы name
+    с полем parent, ее триггеров и заполнения по существующим строкам
+    """
+    closure = f'{name}_closure'
+    return [
+        f'CREATE TABLE IF NOT EXISTS {closure} ('
+        f'ancestor INTEGER NOT NULL, descendant INTEGER NOT NULL, '
+        f'depth INTEGER NOT NULL, PRIMARY KEY (ancestor, descendant)) WITHOUT ROWID',
+        f'CREATE INDEX IF NOT EXISTS idx_{closure}_descendant '
+        f'ON {closure} (descendant, depth)',
+        f'CREATE TRIGGER IF NOT EXISTS {closure}_insert AFTER INSERT ON {name} '
+        f'BEGIN '
+        f'INSERT INTO {closure} (ancestor, descendant, depth) '
+        f'VALUES (NEW.pk, NEW.pk, 0); '
+        f'INSERT INTO {closure} (ancestor, descendant, depth) '
+        f'SELECT ancestor, NEW.pk, depth + 1 FROM {closure} '
+        f'WHERE descendant = NEW.{parent}; '
+        f'END',
+        # запрет циклов: новый родитель не может быть потомком категории
+        f'CREATE TRIGGER IF NOT EXISTS {closure}_cycle BEFORE UPDATE OF {parent} '
+        f'ON {name} WHEN NEW.{parent} IS NOT NULL AND EXISTS ('
+        f'SELECT 1 FROM {closure} WHERE ancestor = NEW.pk '
+        f'AND descendant = NEW.{parent}) '
+        f'BEGIN SELECT RAISE(ABORT, \'cycle in {name} hierarchy\'); END',
+        # перенос поддерева: удалить связи поддерева с прежними предками
+        # и связать его с предками нового родителя
+        f'CREATE TRIGGER IF NOT EXISTS {closure}_update AFTER UPDATE OF {parent} '
+        f'ON {name} WHEN OLD.{parent} IS NOT NEW.{parent} '
+        f'BEGIN '
+        f'DELETE FROM {closure} WHERE descendant IN ('
+        f'SELECT descendant FROM {closure} WHERE ancestor = NEW.pk) '
+        f'AND ancestor NOT IN ('
+        f'SELECT descendant FROM {closure} WHERE ancestor = NEW.pk); '
+        f'INSERT INTO {closure} (ancestor, descendant, depth) '
+        f'SELECT up.ancestor, down.descendant, up.depth + down.depth + 1 '
+        f'FROM {closure} AS up, {closure} AS down '
+        f'WHERE up.descendant = NEW.{parent} AND down.ancestor = NEW.pk; '
+        f'END',
+        f'CREATE TRIGGER IF NOT EXISTS {closure}_delete AFTER DELETE ON {name} '
+        f'BEGIN '
+        f'DELETE FROM {closure} WHERE descendant = OLD.pk OR ancestor = OLD.pk; '
+        f'END',
+        # заполнение для базы, созданной до появления таблицы замыкания
+        f'INSERT INTO {closure} (ancestor, descendant, depth) '
+        f'WITH RECURSIVE tree (ancestor, descendant, depth) AS ('
+        f'SELECT pk, pk, 0 FROM {name} '
+        f'UNION ALL '
+        f'SELECT t.{parent}, tree.descendant, tree.depth + 1 '
+        f'FROM tree JOIN {name} AS t ON t.pk = tree.ancestor '
+        f'WHERE t.{parent} IS NOT NULL) '
+        f'SELECT ancestor, descendant, depth FROM tree '
+        f'WHERE NOT EXISTS (SELECT 1 FROM {closure})',
+    ]
+
+
+def row_factory(cls: type) -> tuple[list[str], Callable[..., Any]]:
+    """
+    Сгенерировать по аннотациям модели функцию создания объекта из значений
+    столбцов строки, переданных позиционно (make(*row)), и список этих
+    столбцов (pk и поля модели) в порядке ее аргументов - для явного
+    списка столбцов в SELECT.
+    Для dataclass, все поля которого передаются в __init__, функция - сам
+    класс, а столбцы идут в порядке аргументов __init__. Для остальных
+    моделей генерируется функция, которая передает в __init__ dataclass
+    его аргументы по именам (или создает объект без вызова __init__) и
+    присваивает остальные поля.
+    """
+    columns = ['pk', *model_fields(cls)]
+    init: list[str] = []
+    if dataclasses.is_dataclass(cls):
+        init = [f.name for f in dataclasses.fields(cls) if f.init]
+        if sorted(init) == sorted(columns):
+            return init, cls
+        init = [name for name in init if name in columns]
+    create = f'cls({", ".join(f"{name}={name}" for name in init)})' \
+        if dataclasses.is_dataclass(cls) else 'cls.__new__(cls)'
+    lines = [f'def make({", ".join(columns)}):', f'    obj = {create}']
+    lines += [f'    obj.{name} = {name}' for name in columns if name not in init]
+    lines.append('    return obj')
+    namespace: dict[str, Any] = {'cls': cls}
+    exec('\n'.join(lines), namespace)  # pylint: disable=exec-used
+    return columns, namespace['make']
+
+
+def create_schema(con: sqlite3.Connection, *models: type) -> None:
+    """
+    Создать таблицы и индексы для моделей, если они еще не существуют
+    """
+    with con:
+        for cls in models:
+            for command in create_table_sql(cls):
+                con.execute(command)
+
+
+def explain(con: sqlite3.Connection, query: str,
+            params: list[Any] | tuple[Any, ...] = ()) -> list[str]:
+    """
+    Получить план выполнения запроса (EXPLAIN QUERY PLAN) в виде списка строк,
+    например ['SEARCH expense USING INDEX idx_expense_category (category=?)']
+    """
+    return [row[-1] for row in con.execute(f'EXPLAIN QUERY PLAN {query}', params)]
@@ -2,25 +2,71 @@
 Модуль описывает репозиторий, работающий в СУБД sqlite
 """
 
-from typing import Any
-from inspect import get_annotations
-from bookkeeper.utils import adapters
+from itertools import starmap
+from typing import Any, Iterable, Iterator, Sequence
+from bookkeeper.utils import chunked
 import sqlite3
 
 from bookkeeper.repository.abstract_repository import AbstractRepository, T
+from bookkeeper.repository.connection import ConnectionManager
+from bookkeeper.repository.query import (
+    compile_where, compile_order, group_fields, is_date_field
+)
+from bookkeeper.repository.schema import (
+    create_schema, explain, model_fields, row_factory, table_name
+)
 
 
 class SqliteRepository(AbstractRepository[T]):
     """
     Репозиторий, работающий в sqlite. Хранит данные в базе данных.
+    Соединения берутся из общего для файла базы данных ConnectionManager.
+    Таблица и индексы модели создаются при создании репозитория,
+    если они еще не существуют.
+    Каждая операция записи выполняется в транзакции ConnectionManager;
+    внутри открытой транзакции (например, unit_of_work) она становится
+    ее частью и фиксируется вместе с ней.
+    Запросы выбирают явный список столбцов columns, объекты создаются
+    из кортежей значений функцией make_object (см. schema.row_factory).
     """
 
-    def __init__(self, db_file: str, cls: type) -> None:
+    def __init__(self, db_file: str, cls: type,
+                 connections: ConnectionManager | None = None) -> None:
 
         self.db_file = db_file
-        self.table_name = cls.__name__.lower()
-        self.fields = get_annotations(cls, eval_str=True)
-        self.fields.pop('pk')
+        self.table_name = table_name(cls)
+        self.fields = model_fields(cls)
+        self.foreign_keys: dict[str, str] = getattr(cls, 'foreign_keys', {})
+        self.tree_parent: str | None = getattr(cls, 'tree_parent', None)
+        self.columns, self.make_object = row_factory(cls)
+        self.connections = connections or ConnectionManager.for_file(db_file)
+        create_schema(self._connection(), cls)
+
+    def _connection(self) -> sqlite3.Connection:
+        return self.connections.connection()
+
+    def _select(self, where: dict[str, Any] | None = None,
+                order_by: str | Sequence[str] | None = None) -> tuple[str, list[Any]]:
+        columns = ['pk', *self.fields]
+        condition, params = compile_where(where, columns)
+        return f'SELECT {self.select_list()} FROM {self.table_name}{condition}' \
+            + compile_order(order_by, columns), params
+
+    def select_list(self, alias: str | None = None) -> str:
+        """
+        Список столбцов для SELECT в порядке аргументов make_object,
+        с префиксом alias таблицы, если он задан
+        """
+        prefix = '' if alias is None else f'{alias}.'
+        return ', '.join(prefix + column for column in self.columns)
+
+    def query_plan(self, where: dict[str, Any] | None = None,
+                   order_by: str | Sequence[str] | None = None) -> list[str]:
+        """
+        Получить план выполнения запроса get_all с такими же аргументами
+        (EXPLAIN QUERY PLAN), например для проверки использования индексов
+        """
+        return explain(self._connection(), *self._select(where, order_by))
 
     def add(self, obj: T) -> int:
         if getattr(obj, 'pk', None) != 0:
@@ -28,74 +74,185 @@ class SqliteRepository(AbstractRepository[T]):
         names = ', '.join(self.fields.keys())
         p = ', '.join("?" * len(self.fields))
         values = [getattr(obj, x) for x in self.fields]
-        with sqlite3.connect(self.db_file) as con:
-            cur = con.cursor()
-            cur.execute('PRAGMA foreign_keys = ON')
-            cur.execute(
+        with self.connections.transaction() as con:
+            cur = con.execute(
                 f'INSERT INTO {self.table_name} ({names}) VALUES ({p})', values
             )
             obj.pk = cur.lastrowid
-        con.close()
+            self.connections.track_added([obj])
         return obj.pk
 
     def get(self, pk: int) -> T | None:
-        with sqlite3.connect(self.db_file) as con:
-            con.row_factory = sqlite3.Row
-            cur = con.cursor()
-            cur.execute('PRAGMA foreign_keys = ON')
-            cur.execute(
-                f'SELECT * FROM {self.table_name} WHERE pk=(?)', [pk]
-            )
-            res = cur.fetchall()
-        con.close()
-        adapter = adapters[self.table_name]
-
-        return adapter(res[-1]) if res else None
-
-    def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
-
-        with sqlite3.connect(self.db_file) as con:
-            con.row_factory = sqlite3.Row
-            cur = con.cursor()
-            cur.execute('PRAGMA foreign_keys = ON')
-            if where is None:
-                cur.execute(f'SELECT * FROM {self.table_name}')
-                res = cur.fetchall()
-            else:
-                columns, values = list(where.keys()), \
-                                  list(where.values())
-                cur.execute(f'SELECT * FROM {self.table_name} WHERE {columns[0]}=(?)',
-                            [values[0]])
-                res = cur.fetchall()
-                if columns[1:]:
-                    res = [x_res for x_res in res if all(x_res[column] == value for column,
-                                                                                    value in zip(columns[1:],
-                                                                                                 values[1:]))]
-            adapter = adapters[self.table_name]
-            res = list(map(adapter, res))
-        con.close()
-        return res
+        row = self._connection().execute(
+            f'SELECT {self.select_list()} FROM {self.table_name} WHERE pk = ?', [pk]
+        ).fetchone()
+        return None if row is None else self.make_object(*row)
+
+    def get_all(self, where: dict[str, Any] | None = None,
+                order_by: str | Sequence[str] | None = None,
+                limit: int | None = None) -> list[T]:
+        query, params = self._select(where, order_by)
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        return self._select_related(query, params)
+
+    def iter_all(self, where: dict[str, Any] | None = None,
+                 order_by: str | Sequence[str] | None = None,
+                 batch_size: int = 1000) -> Iterator[T]:
+        cur = self._connection().execute(*self._select(where, order_by))
+        try:
+            while rows := cur.fetchmany(batch_size):
+                yield from starmap(self.make_object, rows)
+        finally:
+            cur.close()
+
+    def _closure(self) -> str:
+        if self.tree_parent is None:
+            raise TypeError(f'{self.table_name} is not a hierarchical model')
+        return f'{self.table_name}_closure'
+
+    def _select_related(self, query: str, params: list[Any]) -> list[T]:
+        rows = self._connection().execute(query, params).fetchall()
+        return list(starmap(self.make_object, rows))
+
+    def ancestors(self, pk: int) -> list[T]:
+        """
+        Получить всех предков записи pk одним запросом к таблице замыкания,
+        от непосредственного родителя до верхнего уровня
+        """
+        closure = self._closure()
+        return self._select_related(
+            f'SELECT {self.select_list("t")} FROM {closure} AS c '
+            f'JOIN {self.table_name} AS t ON t.pk = c.ancestor '
+            f'WHERE c.descendant = ? AND c.depth > 0 '
+            f'ORDER BY c.depth', [pk])
+
+    def descendants(self, pk: int) -> list[T]:
+        """
+        Получить всех потомков записи pk одним запросом к таблице замыкания,
+        упорядоченных по уровню вложенности
+        """
+        closure = self._closure()
+        return self._select_related(
+            f'SELECT {self.select_list("t")} FROM {closure} AS c '
+            f'JOIN {self.table_name} AS t ON t.pk = c.descendant '
+            f'WHERE c.ancestor = ? AND c.depth > 0 '
+            f'ORDER BY c.depth, t.pk', [pk])
+
+    def subtree_sum(self, pk: int, repo: 'SqliteRepository[Any]', field: str) -> Any:
+        """
+        Сумма поля field записей репозитория repo, ссылающихся на запись pk
+        или на любого ее потомка, одним запросом. Например, сумма трат
+        по категории вместе с подкатегориями:
+        cat_repo.subtree_sum(cat.pk, exp_repo, 'amount')
+        """
+        closure = self._closure()
+        if field not in repo.fields:
+            raise ValueError(f'unknown field {field!r}')
+        fk = next((name for name, target in repo.foreign_keys.items()
+                   if target == self.table_name), None)
+        if fk is None:
+            raise ValueError(f'{repo.table_name} does not reference {self.table_name}')
+        return self._connection().execute(
+            f'SELECT COALESCE(SUM(r.{field}), 0) FROM {closure} AS c '
+            f'JOIN {repo.table_name} AS r ON r.{fk} = c.descendant '
+            f'WHERE c.ancestor = ?', [pk]).fetchone()[0]
+
+    def _column(self, field: str) -> str:
+        if field != 'pk' and field not in self.fields:
+            raise ValueError(f'unknown field {field!r}')
+        return field
+
+    def total(self, field: str = 'amount',
+              where: dict[str, Any] | None = None) -> int:
+        """ Сумма поля field записей, удовлетворяющих условию where (SUM) """
+        condition, params = compile_where(where, ['pk', *self.fields])
+        return self._connection().execute(
+            f'SELECT COALESCE(SUM({self._column(field)}), 0) '
+            f'FROM {self.table_name}{condition}', params).fetchone()[0]
+
+    def totals_by(self, group: str | Sequence[str] = 'category', field: str = 'amount',
+                  where: dict[str, Any] | None = None) -> dict[Any, int]:
+        """
+        Суммы поля field по значениям поля group или полей кортежа group
+        (GROUP BY), поля с датами группируются по дням
+        """
+        condition, params = compile_where(where, ['pk', *self.fields])
+        keys = [f'substr({name}, 1, 10)' if is_date_field(name) else name
+                for name in map(self._column, group_fields(group))]
+        rows = self._connection().execute(
+            f'SELECT {", ".join(keys)}, SUM({self._column(field)}) '
+            f'FROM {self.table_name}{condition} GROUP BY {", ".join(keys)}', params)
+        if isinstance(group, str):
+            return dict(rows)
+        return {tuple(row[:-1]): row[-1] for row in rows}
 
     def update(self, obj: T) -> None:
 
         if obj.pk == 0:
             raise ValueError('attempt to update object with unknown primary key')
 
-        with sqlite3.connect(self.db_file) as con:
-            cur = con.cursor()
-            cur.execute('PRAGMA foreign_keys = ON')
-            names = list(self.fields.keys())
-            values = [getattr(obj, x) for x in self.fields]
-            update_command = f'UPDATE {self.table_name} SET ' + ', '.join(
-                [f'{name} = ?' for name in names]) + ' WHERE pk = ?'
-            cur.execute(update_command, values + [obj.pk])
-        con.close()
+        names = list(self.fields.keys())
+        values = [getattr(obj, x) for x in self.fields]
+        update_command = f'UPDATE {self.table_name} SET ' + ', '.join(
+            [f'{name} = ?' for name in names]) + ' WHERE pk = ?'
+        with self.connections.transaction() as con:
+            con.execute(update_command, values + [obj.pk])
 
     def delete(self, pk: int) -> None:
-        with sqlite3.connect(self.db_file) as con:
-            cur = con.cursor()
-            cur.execute('PRAGMA foreign_keys = ON')
-            cur.execute(f'DELETE FROM {self.table_name} WHERE pk=  ?', [pk])
+        with self.connections.transaction() as con:
+            cur = con.execute(f'DELETE FROM {self.table_name} WHERE pk=  ?', [pk])
             if cur.rowcount == 0:
                 raise KeyError('Object with such pk do not exist in the database')
-        con.close()
+
+    def add_many(self, objs: Iterable[T], chunk_size: int = 1000) -> list[int]:
+        """
+        Добавить объекты одной транзакцией, выполняя executemany по chunk_size
+        строк. Первичные ключи назначаются явно подряд после максимального,
+        т.к. executemany не сообщает lastrowid для каждой строки.
+        При ошибке транзакция откатывается, а pk объектов сбрасывается в 0
+        (см. ConnectionManager.track_added).
+        """
+        names = ', '.join(['pk', *self.fields.keys()])
+        p = ', '.join("?" * (len(self.fields) + 1))
+        added: list[T] = []
+        with self.connections.transaction() as con:
+            next_pk = con.execute(
+                f'SELECT COALESCE(MAX(pk), 0) FROM {self.table_name}'
+            ).fetchone()[0] + 1
+            for chunk in chunked(objs, chunk_size):
+                if any(getattr(obj, 'pk', None) != 0 for obj in chunk):
+                    raise ValueError(
+                        'trying to add object with filled `pk` attribute')
+                con.executemany(
+                    f'INSERT INTO {self.table_name} ({names}) VALUES ({p})',
+                    ([next_pk + i, *(getattr(obj, x) for x in self.fields)]
+                     for i, obj in enumerate(chunk))
+                )
+                for i, obj in enumerate(chunk):
+                    obj.pk = next_pk + i
+                added.extend(chunk)
+                self.connections.track_added(chunk)
+                next_pk += len(chunk)
+        return [obj.pk for obj in added]
+
+    def update_many(self, objs: Iterable[T], chunk_size: int = 1000) -> None:
+        names = list(self.fields.keys())
+        update_command = f'UPDATE {self.table_name} SET ' + ', '.join(
+            [f'{name} = ?' for name in names]) + ' WHERE pk = ?'
+        with self.connections.transaction() as con:
+            for chunk in chunked(objs, chunk_size):
+                if any(obj.pk == 0 for obj in chunk):
+                    raise ValueError('attempt to update object with unknown primary key')
+                con.executemany(update_command,
+                                ([*(getattr(obj, x) for x in names), obj.pk]
+                                 for obj in chunk))
+
+    def delete_many(self, pks: Iterable[int], chunk_size: int = 1000) -> None:
+        with self.connections.transaction() as con:
+            for chunk in chunked(pks, chunk_size):
+                cur = con.executemany(f'DELETE FROM {self.table_name} WHERE pk = ?',
+                                      ([pk] for pk in chunk))
+                if cur.rowcount != len(chunk):
+                    raise KeyError('Object with such pk do not exist in the database')
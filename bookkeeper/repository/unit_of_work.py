@@ -0,0 +1,63 @@
+"""
+Модуль описывает единицу работы - транзакцию над несколькими репозиториями
+
+Операции нескольких репозиториев внутри unit_of_work фиксируются вместе
+одной транзакцией или вместе откатываются при исключении:
+
+    with unit_of_work(exp_repo, budget_repo):
+        exp_repo.add(expense)
+        budget_repo.update_many(budgets)
+
+При откате pk объектов, добавленных внутри единицы работы, сбрасываются
+в 0 (и для sqlite, и для MemoryRepository), так что объект можно добавить
+снова. Остальные изменения атрибутов объектов не откатываются.
+
+Репозитории sqlite должны использовать один ConnectionManager: тогда
+в одном потоке они работают через одно соединение, и вся единица работы
+стоит одной фиксации (одного fsync) вместо фиксации на каждую операцию.
+Для MemoryRepository используется его собственный контекст transaction.
+Для CachedRepository транзакция выполняется над обернутым репозиторием,
+а при откате (в том числе при ошибке фиксации) кэш обертки сбрасывается;
+InstrumentedRepository также снимается.
+"""
+
+from contextlib import ExitStack, contextmanager
+from typing import Any, Iterator
+
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.cached_repository import CachedRepository, uncached
+from bookkeeper.repository.instrumentation import uninstrumented
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+
+
+@contextmanager
+def unit_of_work(*repos: AbstractRepository[Any]) -> Iterator[None]:
+    """
+    Выполнить операции репозиториев repos в одной транзакции
+    """
+    repos = tuple(map(uninstrumented, repos))
+    caches = [repo for repo in repos if isinstance(repo, CachedRepository)]
+    repos = tuple(map(uncached, repos))
+    connections = {repo.connections for repo in repos
+                   if isinstance(repo, SqliteRepository)}
+    if len(connections) > 1:
+        raise ValueError('sqlite repositories in a unit of work '
+                         'must share one ConnectionManager')
+    unsupported = [repo for repo in repos
+                   if not isinstance(repo, (SqliteRepository, MemoryRepository))]
+    if unsupported:
+        raise TypeError(f'{type(unsupported[0]).__name__} does not support transactions')
+    # кэш сбрасывается и при исключении в теле, и при ошибке фиксации
+    try:
+        with ExitStack() as stack:
+            for manager in connections:
+                stack.enter_context(manager.transaction())
+            for repo in repos:
+                if isinstance(repo, MemoryRepository):
+                    stack.enter_context(repo.transaction())
+            yield
+    except BaseException:
+        for cache in caches:
+            cache.clear()
+        raise
@@ -0,0 +1,190 @@
+"""
+Модуль описывает репозиторий с отложенной записью (write-behind)
+
+При частом добавлении трат (скрипты, быстрый ввод, импорт) каждая операция
+SqliteRepository фиксируется отдельно и стоит отдельного fsync.
+WriteBehindRepository ставит операции записи в очередь и записывает их
+пачкой, одной транзакцией (групповая фиксация), когда в очереди набирается
+max_batch операций, когда с первой операции пачки прошло max_delay секунд,
+при вызове flush и при закрытии. Операции выполняются в порядке вызова.
+Закрыть репозиторий можно вызовом close или выходом из блока with;
+не закрытые репозитории закрываются (с записью очереди) при завершении
+интерпретатора.
+
+Методы записи сразу возвращают concurrent.futures.Future; pk добавленного
+объекта присваивается при записи пачки и доступен как результат future.
+"""
+
+import atexit
+import threading
+import weakref
+from concurrent.futures import Future
+from time import monotonic
+from typing import Any, Generic, Sequence
+
+from bookkeeper.repository.abstract_repository import AbstractRepository, T
+from bookkeeper.repository.unit_of_work import unit_of_work
+
+_ADD, _UPDATE, _DELETE, _FLUSH = 'add', 'update', 'delete', 'flush'
+
+# открытые репозитории; слабые ссылки не мешают сборке мусора
+_open: 'weakref.WeakSet[WriteBehindRepository[Any]]' = weakref.WeakSet()
+
+
+@atexit.register
+def _close_all() -> None:
+    # поток записи - демон, без этого очередь при выходе была бы потеряна
+    for repo in list(_open):
+        repo.close()
+
+
+class WriteBehindRepository(Generic[T]):
+    """
+    Репозиторий с отложенной групповой записью.
+    repo - репозиторий, поддерживающий транзакции (см. unit_of_work)
+    max_batch - наибольшее число операций в одной транзакции
+    max_delay - наибольшая задержка записи операции в секундах
+    """
+
+    def __init__(self, repo: AbstractRepository[T], max_batch: int = 500,
+                 max_delay: float = 0.05) -> None:
+        if max_batch < 1:
+            raise ValueError('max_batch must be positive')
+        self.repo = repo
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: list[tuple[str, Any, Future]] = []
+        self._flushes = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='write-behind',
+                                        daemon=True)
+        self._thread.start()
+        _open.add(self)
+
+    def __enter__(self) -> 'WriteBehindRepository[T]':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _submit(self, operation: str, arg: Any) -> Future:
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('write-behind repository is closed')
+            self._queue.append((operation, arg, future))
+            if operation == _FLUSH:
+                self._flushes += 1
+            self._cond.notify()
+        return future
+
+    def add(self, obj: T) -> 'Future[int]':
+        """ Поставить добавление объекта в очередь """
+        if getattr(obj, 'pk', None) != 0:
+            raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+        return self._submit(_ADD, obj)
+
+    def update(self, obj: T) -> 'Future[None]':
+        """ Поставить изменение объекта в очередь """
+        if obj.pk == 0:
+            raise ValueError('attempt to update object with unknown primary key')
+        return self._submit(_UPDATE, obj)
+
+    def delete(self, pk: int) -> 'Future[None]':
+        """ Поставить удаление объекта в очередь """
+        return self._submit(_DELETE, pk)
+
+    def flush(self) -> None:
+        """ Записать все поставленные в очередь операции и дождаться записи """
+        self._submit(_FLUSH, None).result()
+
+    def get(self, pk: int) -> T | None:
+        """ get репозитория после записи очереди """
+        self.flush()
+        return self.repo.get(pk)
+
+    def get_all(self, where: dict[str, Any] | None = None,
+                order_by: str | Sequence[str] | None = None,
+                limit: int | None = None) -> list[T]:
+        """ get_all репозитория после записи очереди """
+        self.flush()
+        return self.repo.get_all(where, order_by, limit)
+
+    def close(self) -> None:
+        """ Записать очередь и остановить поток записи """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        _open.discard(self)
+
+    def _next_batch(self) -> list[tuple[str, Any, Future]] | None:
+        with self._cond:
+            while not self._queue:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            deadline = monotonic() + self.max_delay
+            while len(self._queue) < self.max_batch \
+                    and not self._flushes and not self._closed:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._queue[:self.max_batch]
+            del self._queue[:self.max_batch]
+            self._flushes -= sum(operation == _FLUSH for operation, _, _ in batch)
+            return batch
+
+    def _run(self) -> None:
+        while (batch := self._next_batch()) is not None:
+            # отмененные до записи операции пропускаются
+            self._write([(operation, arg, future) for operation, arg, future in batch
+                         if future.set_running_or_notify_cancel()])
+
+    def _apply(self, operation: str, arg: Any) -> Any:
+        if operation == _ADD:
+            return self.repo.add(arg)
+        if operation == _UPDATE:
+            return self.repo.update(arg)
+        if operation == _DELETE:
+            return self.repo.delete(arg)
+        return None
+
+    def _apply_batch(self, batch: list[tuple[str, Any, Future]]) -> list[Any]:
+        # идущие подряд добавления выполняются одним add_many (executemany)
+        results: list[Any] = []
+        added: list[Any] = []
+        for operation, arg, _ in batch:
+            if operation == _ADD:
+                added.append(arg)
+                continue
+            if added:
+                results.extend(self.repo.add_many(added))
+                added = []
+            results.append(self._apply(operation, arg))
+        if added:
+            results.extend(self.repo.add_many(added))
+        return results
+
+    def _write(self, batch: list[tuple[str, Any, Future]]) -> None:
+        try:
+            with unit_of_work(self.repo):
+                results = self._apply_batch(batch)
+        except Exception:  # pylint: disable=broad-except
+            # пачка откатена целиком; чтобы ошибка одной операции не
+            # отменила остальные, операции повторяются по одной
+            for operation, arg, future in batch:
+                if operation == _ADD:
+                    arg.pk = 0
+                try:
+                    with unit_of_work(self.repo):
+                        result = self._apply(operation, arg)
+                except Exception as error:  # pylint: disable=broad-except
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+            return
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
@@ -4,11 +4,17 @@
 
 from bookkeeper.models.category import Category
 from bookkeeper.models.expense import Expense
+from bookkeeper.repository.instrumentation import Instrumentation
 from bookkeeper.repository.memory_repository import MemoryRepository
 from bookkeeper.utils import read_tree
 
-cat_repo = MemoryRepository[Category]()
-exp_repo = MemoryRepository[Expense]()
+# статистика вызовов репозиториев, выводится командой stats
+instrumentation = Instrumentation()
+cat_repo = instrumentation.wrap(
+    MemoryRepository[Category](indexes=['name', 'parent']), 'category')
+exp_repo = instrumentation.wrap(
+    MemoryRepository[Expense](indexes=['category'], sorted_indexes=['expense_date']),
+    'expense')
 
 cats = '''
 продукты
@@ -22,24 +28,33 @@ cats = '''
 
 Category.create_from_tree(read_tree(cats), cat_repo)
 
+
+def add_expense(cmd: str) -> None:
+    """ Добавить трату по команде вида '<сумма> <категория>' """
+    amount, name = cmd.split(maxsplit=1)
+    try:
+        cat = cat_repo.get_all({'name': name})[0]
+    except IndexError:
+        print(f'категория {name} не найдена')
+        return
+    exp = Expense(int(amount), cat.pk)
+    exp_repo.add(exp)
+    print(exp)
+
+
+commands = {
+    'категории': lambda: print(*cat_repo.get_all(), sep='\n'),
+    'расходы': lambda: print(*exp_repo.get_all(), sep='\n'),
+    'stats': lambda: print(instrumentation.report()),
+    'stats reset': instrumentation.reset,
+}
+
 while True:
     try:
         cmd = input('$> ')
     except EOFError:
         break
-    if not cmd:
-        continue
-    if cmd == 'категории':
-        print(*cat_repo.get_all(), sep='\n')
-    elif cmd == 'расходы':
-        print(*exp_repo.get_all(), sep='\n')
-    elif cmd[0].isdecimal():
-        amount, name = cmd.split(maxsplit=1)
-        try:
-            cat = cat_repo.get_all({'name': name})[0]
-        except IndexError:
-            print(f'категория {name} не найдена')
-            continue
-        exp = Expense(int(amount), cat.pk)
-        exp_repo.add(exp)
-        print(exp)
+    if cmd in commands:
+        commands[cmd]()
+    elif cmd and cmd[0].isdecimal():
+        add_expense(cmd)
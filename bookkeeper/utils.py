@@ -2,10 +2,10 @@
 Вспомогательные функции
 """
 
-from typing import Iterable, Iterator, Any
-from bookkeeper.models.expense import Expense
-from bookkeeper.models.category import Category
-from bookkeeper.models.budget import Budget
+from itertools import islice
+from typing import Iterable, Iterator, TypeVar
+
+X = TypeVar('X')
 
 
 def _get_indent(line: str) -> int:
@@ -61,54 +61,20 @@ def read_tree(lines: Iterable[str]) -> list[tuple[str, str | None]]:
     return result
 
 
-def expense_adapter(exp_row: dict[str, Any]) -> Expense:
-    """
-    Адаптер для базы с тратами
-    Parameters
-    ----------
-    exp_row - строка в базе с тратами в виде словаря
-    Returns
-    -------
-    Expense объект с данными из базы
-    """
-    return Expense(pk=int(exp_row['pk']), amount=int(exp_row['amount']),
-                   expense_date=exp_row['expense_date'],
-                   added_date=exp_row['added_date'],
-                   comment=exp_row['comment'], category=int(exp_row['category']))
-
-
-def category_adapter(cat_row: dict[str, Any]) -> Category:
-    """
-    Адаптер для базы с категориями
-    Parameters
-    ----------
-    cat_row - строка в базе с категориями в виде словаря
-    Returns
-    -------
-    Category объект с данными из базы
-    """
-    return Category(pk=cat_row['pk'], name=cat_row['name'],
-                    parent=cat_row['parent'])
-
-
-def budget_adapter(budget_row: dict[str, Any]) -> Budget:
+def chunked(items: Iterable[X], size: int) -> Iterator[list[X]]:
     """
-    Адаптер для базы с бюджетом
+    Разбить итерируемый объект на списки длиной не более size,
+    не загружая его в память целиком
     Parameters
     ----------
-    budget_row - строка в базе с бюджетом в виде словаря
-    Returns
+    items - итерируемый объект
+    size - максимальная длина списка
+    Yields
     -------
-    Budget объект с данными из базы
+    Списки последовательных элементов items
     """
-    return Budget(pk=int(budget_row['pk']),
-                  budget=int(budget_row['budget']),
-                  cur_sum=int(budget_row['cur_sum'])
-                  )
-
-
-adapters = {
-    'budget': budget_adapter,
-    'expense': expense_adapter,
-    'category': category_adapter
-}
\ No newline at end of file
+    if size < 1:
+        raise ValueError('chunk size must be positive')
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
@@ -5,6 +5,9 @@ from PySide6 import QtWidgets, QtCore
 from PySide6.QtGui import QIntValidator
 
 from bookkeeper.models.expense import Expense
+from bookkeeper.repository.unit_of_work import unit_of_work
+from bookkeeper.view.changes import INSERTED
+from bookkeeper.view.worker import RepositoryWorker
 
 
 class AmountInput(QtWidgets.QWidget):
@@ -39,29 +42,27 @@ class CategoryInput(QtWidgets.QWidget):
     Виджет для ввода категории
     """
 
-    def __init__(self, cat_repo, *args, **kwargs):
+    def __init__(self, cat_repo, worker: RepositoryWorker, *args, **kwargs):
         """
         Parameters
         ----------
         cat_repo - репозиторий с категориями
+        worker - выполняет запросы к репозиториям вне потока интерфейса
         args
         kwargs
         """
         super().__init__(*args, **kwargs)
 
         self.cat_repo = cat_repo
+        self.worker = worker
         self.layout = QtWidgets.QFormLayout()
         self.label = QtWidgets.QLabel('Категория')
         self.input = QtWidgets.QComboBox()
 
-        cats = self.cat_repo.get_all()
-
-        features_list = [cat.name for cat in cats]
-
-        self.input.addItems(features_list)
         self.layout.addWidget(self.label)
         self.layout.addWidget(self.input)
         self.setLayout(self.layout)
+        self.categories_edited_response()
 
     def category(self) -> str:
         """
@@ -77,24 +78,34 @@ class CategoryInput(QtWidgets.QWidget):
         Returns
         -------
         """
-        cats = self.cat_repo.get_all()
-        features_list = [cat.name for cat in cats]
-        self.input.addItems(features_list)
+        self.worker.call(lambda: [cat.name for cat in self.cat_repo.get_all()],
+                         on_done=self._set_categories)
+
+    def _set_categories(self, names: list[str]) -> None:
+        current = self.input.currentText()
+        self.input.clear()
+        self.input.addItems(names)
+        if current in names:
+            self.input.setCurrentText(current)
 
 
 class AddPurchase(QtWidgets.QWidget):
     """
-    Виджет, объединяющий ввод цены, выбор категории и подтверждение ввода
+    Виджет, объединяющий ввод цены, выбор категории и подтверждение ввода.
+    Сигнал data_updated передает вид изменения и pk добавленной траты.
     """
-    data_updated = QtCore.Signal()
+    data_updated = QtCore.Signal(str, int)
 
-    def __init__(self, cat_repo, exp_repo, budget_repo, *args, **kwargs) -> None:
+    def __init__(self, cat_repo, exp_repo, budget_repo, budget_engine,
+                 worker: RepositoryWorker, *args, **kwargs) -> None:
         """
         Parameters
         ----------
         cat_repo - репозиторий с категориями
         exp_repo - репозиторий с расходами
         budget_repo - репозиторий с бюджетом
+        budget_engine - подсчет трат за текущие периоды (BudgetEngine)
+        worker - выполняет запросы к репозиториям вне потока интерфейса
         args
         kwargs
         """
@@ -104,8 +115,10 @@ class AddPurchase(QtWidgets.QWidget):
         self.cat_repo = cat_repo
         self.exp_repo = exp_repo
         self.budget_repo = budget_repo
+        self.budget_engine = budget_engine
+        self.worker = worker
 
-        self.category_input = CategoryInput(self.cat_repo)
+        self.category_input = CategoryInput(self.cat_repo, self.worker)
         self.amount_input = AmountInput()
         self.submit_button = QtWidgets.QPushButton('Добавить')
 
@@ -122,28 +135,37 @@ class AddPurchase(QtWidgets.QWidget):
         """
         Блокировка/Разблокировка кнопки в ответ на изменение бюджета
         """
-        budgets = self.budget_repo.get_all()
-        flag = []
-        for budget in budgets:
-            flag.append(budget.cur_sum <= budget.budget)
+        self.worker.call(lambda: all(budget.cur_sum <= budget.budget
+                                     for budget in self.budget_repo.get_all()),
+                         on_done=self._set_enabled)
 
-        self.submit_button.setEnabled(all(flag))
-        self.submit_button.setText('Добавить' if all(flag) else 'Бюджет исчерпан!')
+    def _set_enabled(self, enabled: bool) -> None:
+        self.submit_button.setEnabled(enabled)
+        self.submit_button.setText('Добавить' if enabled else 'Бюджет исчерпан!')
 
     def submit(self) -> None:
         """
-        Обработка подтверждения покупки
+        Обработка подтверждения покупки. Трата добавляется в потоке
+        worker вместе с обновлением бюджета одной транзакцией, сигнал
+        data_updated испускается после добавления.
         """
-        category = self.cat_repo. \
-            get_all(where={'name': self.category_input.category()})[0].pk
-        added_exp = Expense(category=category,
-                            amount=self.amount_input.amount())
-        self.exp_repo.add(added_exp)
-
-        budgets = self.budget_repo.get_all()
-
-        for budget in budgets:
-            budget.register_purchase(self.amount_input.amount())
-            self.budget_repo.update(budget)
-
-        self.data_updated.emit()
\ No newline at end of file
+        category_name = self.category_input.category()
+        amount = self.amount_input.amount()
+
+        def add() -> int:
+            category = self.cat_repo.get_all(where={'name': category_name})[0].pk
+            added_exp = Expense(category=category, amount=amount)
+            self.budget_engine.expense_added(added_exp)
+            # трата и суммы бюджетов фиксируются вместе, одной транзакцией;
+            # если она не удалась (в том числе при фиксации), трата
+            # исключается и из сумм BudgetEngine
+            try:
+                with unit_of_work(self.exp_repo, self.budget_repo):
+                    self.exp_repo.add(added_exp)
+                    self.budget_engine.sync_budgets(self.budget_repo)
+            except Exception:
+                self.budget_engine.expense_deleted(added_exp)
+                raise
+            return added_exp.pk
+
+        self.worker.call(add, on_done=lambda pk: self.data_updated.emit(INSERTED, pk))
@@ -3,7 +3,9 @@
 """
 
 from PySide6 import QtWidgets, QtCore
-from bookkeeper.repository.sqlite_repository import SqliteRepository
+from bookkeeper.models.budget import Budget
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.view.worker import RepositoryWorker
 
 
 class BudgetTable(QtWidgets.QTableWidget):
@@ -15,11 +17,13 @@ class BudgetTable(QtWidgets.QTableWidget):
     columns = ["Сумма", "Бюджет"]
     rows = ['День', 'Неделя', 'Месяц']
 
-    def __init__(self, budget_repo: SqliteRepository, *args, **kwargs) -> None:
+    def __init__(self, budget_repo: AbstractRepository[Budget], worker: RepositoryWorker,
+                 *args, **kwargs) -> None:
         """
         Parameters
         ----------
         budget_repo - репозиторий с бюджетом
+        worker - выполняет запросы к репозиториям вне потока интерфейса
         args
         kwargs
         """
@@ -46,6 +50,7 @@ class BudgetTable(QtWidgets.QTableWidget):
             2, QtWidgets.QHeaderView.Stretch)
 
         self.budget_repo = budget_repo
+        self.worker = worker
 
         self.setEditTriggers(
             QtWidgets.QTableWidget.DoubleClicked)
@@ -56,14 +61,30 @@ class BudgetTable(QtWidgets.QTableWidget):
         """
         Заполнение виджета данными из базы данных
         """
-
-        budgets = self.budget_repo.get_all()
-
-        for i in range(len(self.rows)):
-            self.setItem(i, 0, QtWidgets.QTableWidgetItem(str(budgets[i].cur_sum)))
-            self.setItem(i, 1, QtWidgets.QTableWidgetItem(str(budgets[i].budget)))
+        self.worker.call(self.budget_repo.get_all, on_done=self._set_budgets)
+
+    def _set_budgets(self, budgets: list) -> None:
+        # заполнение таблицы не является изменением пользователя
+        self.blockSignals(True)
+        for i, budget in enumerate(budgets[:len(self.rows)]):
+            self.setItem(i, 0, QtWidgets.QTableWidgetItem(str(budget.cur_sum)))
+            self.setItem(i, 1, QtWidgets.QTableWidgetItem(str(budget.budget)))
+        self.blockSignals(False)
         self.budget_updated.emit()
 
+    @QtCore.Slot(str, int)
+    def apply_change(self, kind: str, pk: int) -> None:
+        """
+        Обновление в ответ на изменение одной траты. Суммы за периоды
+        уже пересчитаны BudgetEngine, поэтому перечитываются только
+        строки бюджета (их число не зависит от количества трат).
+        Parameters
+        ----------
+        kind - вид изменения (см. bookkeeper.view.changes)
+        pk - pk измененной траты
+        """
+        self.fill_table()
+
     def handleCellChanged(self, row: int, column: int) -> None:
         """
         Регистрация изменения в таблице с бюджетом
@@ -73,15 +94,20 @@ class BudgetTable(QtWidgets.QTableWidget):
         column - измененный столбец
         """
 
-        new_value = self.item(row, column).text()
+        try:
+            new_value = int(self.item(row, column).text())
+        except ValueError:
+            return
         pk = row + 1
-        changed_row = self.budget_repo.get(pk)
-
-        if column == 0:
-            changed_row.cur_sum = new_value
-        elif column == 1:
-            changed_row.budget = new_value
 
-        self.budget_repo.update(changed_row)
-
-        self.budget_updated.emit()
+        def update() -> None:
+            changed_row = self.budget_repo.get(pk)
+            if changed_row is None:
+                raise KeyError(pk)
+            if column == 0:
+                changed_row.cur_sum = new_value
+            elif column == 1:
+                changed_row.budget = new_value
+            self.budget_repo.update(changed_row)
+
+        self.worker.call(update, on_done=lambda _: self.budget_updated.emit())
@@ -5,7 +5,8 @@
 from PySide6 import QtCore, QtWidgets
 
 from bookkeeper.models.category import Category
-from bookkeeper.repository.sqlite_repository import SqliteRepository
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.view.worker import RepositoryWorker
 
 
 class CategoryTable(QtWidgets.QTableWidget):
@@ -16,11 +17,13 @@ class CategoryTable(QtWidgets.QTableWidget):
 
     columns = ['pk', 'имя', 'родитель']
 
-    def __init__(self, cat_repo: SqliteRepository, *args, **kwargs) -> None:
+    def __init__(self, cat_repo: AbstractRepository[Category], worker: RepositoryWorker,
+                 *args, **kwargs) -> None:
         """
         Parameters
         ----------
         cat_repo - репозиторий с категориями расходов
+        worker - выполняет запросы к репозиториям вне потока интерфейса
         args
         kwargs
         """
@@ -28,6 +31,7 @@ class CategoryTable(QtWidgets.QTableWidget):
         super().__init__(*args, **kwargs)
 
         self.cat_repo = cat_repo
+        self.worker = worker
         self.setColumnCount(len(self.columns))
         self.setHorizontalHeaderLabels(self.columns)
 
@@ -40,8 +44,24 @@ class CategoryTable(QtWidgets.QTableWidget):
             1, QtWidgets.QHeaderView.Stretch)
         header.setSectionResizeMode(
             3, QtWidgets.QHeaderView.Stretch)
-        cats = cat_repo.get_all()
+        self.rows_len = 1
+        self.pk_dict: dict[int, int] = {}
 
+        self.setEditTriggers(
+            QtWidgets.QTableWidget.DoubleClicked)
+
+        self.cellChanged.connect(self.handleCellChanged)
+        self.fill_table()
+
+    def fill_table(self) -> None:
+        """
+        Заполнение таблицы категориями из базы данных
+        """
+        self.worker.call(self.cat_repo.get_all, on_done=self._set_categories)
+
+    def _set_categories(self, cats: list[Category]) -> None:
+        self.blockSignals(True)
+        self.clearContents()
         self.setRowCount(len(cats) + 1)
         self.rows_len = len(cats) + 1
         self.pk_dict = {}
@@ -57,11 +77,7 @@ class CategoryTable(QtWidgets.QTableWidget):
             self.setItem(i, 1, name_item)
             self.setItem(i, 2, parent_item)
             self.pk_dict[i] = cat.pk
-
-        self.setEditTriggers(
-            QtWidgets.QTableWidget.DoubleClicked)
-
-        self.cellChanged.connect(self.handleCellChanged)
+        self.blockSignals(False)
 
     def handleCellChanged(self, row, column) -> None:
 
@@ -73,23 +89,34 @@ class CategoryTable(QtWidgets.QTableWidget):
         column - столбец, на которую воздействовал пользователь
         """
 
+        if self.item(row, 1) is None:
+            return
         new_name = self.item(row, 1).text()
-        if self.item(row, 2):
-            new_parent = int(self.item(row, 2).text())
-        else:
-            new_parent = None
+        try:
+            new_parent = int(self.item(row, 2).text()) \
+                if self.item(row, 2) and self.item(row, 2).text() else None
+        except ValueError:
+            return
 
         if row == self.rows_len - 1:
-            new_value = Category(new_name, new_parent)
-            self.cat_repo.add(new_value)
+            def save() -> None:
+                self.cat_repo.add(Category(new_name, new_parent))
         else:
             pk = self.pk_dict[row]
-            edited_value = self.cat_repo.get(pk)
-            edited_value.name = new_name
-            edited_value.parent = new_parent
-            self.cat_repo.update(edited_value)
 
-        self.data_updated.emit()
+            def save() -> None:
+                edited_value = self.cat_repo.get(pk)
+                if edited_value is None:
+                    raise KeyError(pk)
+                edited_value.name = new_name
+                edited_value.parent = new_parent
+                self.cat_repo.update(edited_value)
+
+        def saved(_) -> None:
+            self.fill_table()
+            self.data_updated.emit()
+
+        self.worker.call(save, on_done=saved)
 
 
 class AddCategory(QtWidgets.QWidget):
@@ -97,11 +124,13 @@ class AddCategory(QtWidgets.QWidget):
     Кнопка для возова окна редактирования категорий
     """
 
-    def __init__(self, cat_repo: SqliteRepository, *args, **kwargs) -> None:
+    def __init__(self, cat_repo: AbstractRepository[Category], worker: RepositoryWorker,
+                 *args, **kwargs) -> None:
         """
         Parameters
         ----------
         cat_repo - repository with categories
+        worker - runs repository calls off the GUI thread
         args
         kwargs
         """
@@ -116,7 +145,7 @@ class AddCategory(QtWidgets.QWidget):
 
         self.add_button.clicked.connect(self.submit)
 
-        self.category_table = CategoryTable(self.cat_repo)
+        self.category_table = CategoryTable(self.cat_repo, worker)
 
     def submit(self) -> None:
         """
@@ -0,0 +1,8 @@
+"""
+Виды изменений данных, которые виджеты передают в сигналах вместе с pk
+измененной записи, чтобы получатели обновляли только эту запись
+"""
+
+INSERTED = 'inserted'
+UPDATED = 'updated'
+DELETED = 'deleted'
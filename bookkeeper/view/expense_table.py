@@ -2,33 +2,346 @@
 Модуль для вывода таблицы расходов
 """
 
-from PySide6 import QtWidgets
-from bookkeeper.repository.sqlite_repository import SqliteRepository
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import replace
+from datetime import datetime
+from typing import Any
 
+from PySide6 import QtCore, QtWidgets
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.budget_engine import BudgetEngine
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.expense_rows import ExpenseRow, ExpenseRows
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.query import In, Range, to_iso
+from bookkeeper.repository.unit_of_work import unit_of_work
+from bookkeeper.view.changes import INSERTED, UPDATED, DELETED
+from bookkeeper.view.worker import RepositoryWorker
 
-class ExpensesTable(QtWidgets.QTableWidget):
+
+class ExpensesModel(QtCore.QAbstractTableModel):
     """
-    виджет для таблицы с расходами
+    Model of the expense table backed by the repository.
+    Rows are fetched page by page through canFetchMore/fetchMore as the view
+    scrolls. Only primary keys of fetched rows are kept (8 bytes per row);
+    Expense objects are materialized for visible pages only and at most
+    cached_pages pages are kept in memory. Expenses are read together with
+    their category names (ExpenseRows), so a page costs a single query.
+    Queries run on the RepositoryWorker thread: a page that is not loaded
+    yet is shown empty and filled in when its query finishes.
+    Edits are saved together with the budgets; data_updated is emitted
+    after an edit is committed.
     """
     columns = ["Дата", "Сумма", "Категория", "Комментарий"]
+    data_updated = QtCore.Signal(str, int)
+
+    def __init__(self, cat_repo: AbstractRepository[Category],
+                 exp_repo: AbstractRepository[Expense],
+                 budget_repo: AbstractRepository[Budget], budget_engine: BudgetEngine,
+                 worker: RepositoryWorker, page_size: int = 200,
+                 cached_pages: int = 10, *args, **kwargs) -> None:
+        """
+        Parameters
+        ----------
+        cat_repo - repository for category data
+        exp_repo - repository for expenses
+        budget_repo - repository for budgets, their sums are updated on edits
+        budget_engine - running totals of expenses for the current periods
+        worker - runs repository calls off the GUI thread
+        page_size - number of rows fetched from the repository at once
+        cached_pages - number of materialized pages kept in memory
+        args
+        kwargs
+        """
+        super().__init__(*args, **kwargs)
+        self.cat_repo = cat_repo
+        self.exp_repo = exp_repo
+        self.budget_repo = budget_repo
+        self.budget_engine = budget_engine
+        self.worker = worker
+        self.rows = ExpenseRows(exp_repo, cat_repo)
+        self.page_size = page_size
+        self.cached_pages = cached_pages
+        self._pks = array('q')
+        self._pages: OrderedDict[int, list[ExpenseRow]] = OrderedDict()
+        self._exhausted = False
+        self._fetching = False
+        self._loading: set[int] = set()
+        # results of queries started before a reset (or, for pages,
+        # before a row removal) are stale and are dropped
+        self._generation = 0
+        self._page_generation = 0
+
+    def rowCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._pks)
+
+    def columnCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section: int, orientation: QtCore.Qt.Orientation,
+                   role: int = QtCore.Qt.DisplayRole) -> Any:
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.columns[section]
+        return None
+
+    def canFetchMore(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> bool:
+        return not parent.isValid() and not self._exhausted and not self._fetching
+
+    def fetchMore(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> None:
+        """
+        Start fetching the next page of expenses, continuing after
+        the last fetched pk
+        """
+        if self._fetching or self._exhausted:
+            return
+        self._fetching = True
+        generation = self._generation
+        last_pk = self._pks[-1] if self._pks else 0
+        self.worker.call(self.rows.get_all, {'pk': Range(last_pk + 1)}, 'pk',
+                         self.page_size,
+                         on_done=lambda rows: self._fetched(generation, rows))
+
+    def _fetched(self, generation: int, rows: list[ExpenseRow]) -> None:
+        if generation != self._generation:
+            return
+        self._fetching = False
+        if len(rows) < self.page_size:
+            self._exhausted = True
+        if not rows:
+            return
+        first = len(self._pks)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(rows) - 1)
+        self._pks.extend(row.expense.pk for row in rows)
+        if first % self.page_size == 0:
+            self._cache_page(first // self.page_size, rows)
+        self.endInsertRows()
+
+    def _cache_page(self, page: int, rows: list[ExpenseRow]) -> None:
+        self._pages[page] = rows
+        self._pages.move_to_end(page)
+        while len(self._pages) > self.cached_pages:
+            self._pages.popitem(last=False)
+
+    def expense_row(self, row: int) -> ExpenseRow | None:
+        """
+        Get the expense displayed in the row. If its page is not loaded,
+        start loading it and return None.
+        """
+        page, offset = divmod(row, self.page_size)
+        rows = self._pages.get(page)
+        if rows is None:
+            self._load_page(page)
+            return None
+        self._pages.move_to_end(page)
+        return rows[offset] if offset < len(rows) else None
+
+    def _load_page(self, page: int) -> None:
+        if page in self._loading:
+            return
+        self._loading.add(page)
+        generation = self._page_generation
+        pks = list(self._pks[page * self.page_size:(page + 1) * self.page_size])
+        self.worker.call(self.rows.get_all, {'pk': In(pks)}, 'pk',
+                         on_done=lambda rows: self._page_loaded(generation, page, rows))
+
+    def _page_loaded(self, generation: int, page: int,
+                     rows: list[ExpenseRow]) -> None:
+        if generation != self._page_generation:
+            return
+        self._loading.discard(page)
+        self._cache_page(page, rows)
+        first = page * self.page_size
+        last = min(first + self.page_size, len(self._pks)) - 1
+        if last >= first:
+            self.dataChanged.emit(self.index(first, 0),
+                                  self.index(last, len(self.columns) - 1))
+
+    def _drop_pages(self, first_page: int) -> None:
+        for page in [p for p in self._pages if p >= first_page]:
+            del self._pages[page]
+        self._page_generation += 1
+        self._loading.clear()
+
+    def data(self, index: QtCore.QModelIndex, role: int = QtCore.Qt.DisplayRole) -> Any:
+        if not index.isValid() or role not in (QtCore.Qt.DisplayRole,
+                                               QtCore.Qt.EditRole,
+                                               QtCore.Qt.ToolTipRole):
+            return None
+        expense_row = self.expense_row(index.row())
+        if expense_row is None:
+            return None
+        column = index.column()
+        if role == QtCore.Qt.ToolTipRole:
+            return expense_row.category_path if column == 2 else None
+        expense = expense_row.expense
+        if column == 0:
+            return expense.expense_date
+        if column == 1:
+            return str(expense.amount)
+        if column == 2:
+            return expense_row.category_name
+        return expense.comment
+
+    def flags(self, index: QtCore.QModelIndex) -> QtCore.Qt.ItemFlags:
+        return super().flags(index) | QtCore.Qt.ItemIsEditable
+
+    def setData(self, index: QtCore.QModelIndex, value: Any,
+                role: int = QtCore.Qt.EditRole) -> bool:
+        """
+        Rewrite database according to inputted data.
+        The value is checked here, the repository is updated on the worker.
+        The date must be in ISO 8601 format, it is stored normalized.
+        """
+        if not index.isValid() or role != QtCore.Qt.EditRole:
+            return False
+        expense_row = self.expense_row(index.row())
+        if expense_row is None:
+            return False
+        old_expense = expense_row.expense
+        expense = replace(old_expense)
+        column = index.column()
+        try:
+            if column == 0:
+                expense.expense_date = to_iso(datetime.fromisoformat(str(value)))
+            elif column == 1:
+                expense.amount = int(value)
+            elif column == 3:
+                expense.comment = str(value)
+        except ValueError:
+            return False
+        category_name = str(value) if column == 2 else None
+        self.worker.call(self._update, old_expense, expense, category_name,
+                         on_done=self._updated)
+        return True
+
+    def _update(self, old_expense: Expense, expense: Expense,
+                category_name: str | None) -> int:
+        # runs on the worker; returns 0 if the category is not found
+        if category_name is not None:
+            categories = self.cat_repo.get_all({'name': category_name})
+            if not categories:
+                return 0
+            expense.category = categories[0].pk
+        self.budget_engine.expense_updated(old_expense, expense)
+        # the engine is reverted if the transaction, commit included, fails
+        try:
+            with unit_of_work(self.exp_repo, self.budget_repo):
+                self.exp_repo.update(expense)
+                self.budget_engine.sync_budgets(self.budget_repo)
+        except Exception:
+            self.budget_engine.expense_updated(expense, old_expense)
+            raise
+        return expense.pk
+
+    def _updated(self, pk: int) -> None:
+        if pk:
+            self.apply_change(UPDATED, pk)
+            self.data_updated.emit(UPDATED, pk)
+
+    def _row_of(self, pk: int) -> int | None:
+        # pks are fetched in ascending order, so the row is found by bisection
+        row = bisect_left(self._pks, pk)
+        return row if row < len(self._pks) and self._pks[row] == pk else None
+
+    def apply_change(self, kind: str, pk: int) -> None:
+        """
+        Apply a change of a single expense without rereading the table.
+        Unknown changes fall back to the full reload.
+        Parameters
+        ----------
+        kind - INSERTED, UPDATED or DELETED
+        pk - primary key of the changed expense
+        """
+        if kind == INSERTED:
+            self._insert(pk)
+        elif kind == UPDATED and (row := self._row_of(pk)) is not None:
+            self._pages.pop(row // self.page_size, None)
+            self.dataChanged.emit(self.index(row, 0),
+                                  self.index(row, len(self.columns) - 1))
+        elif kind == DELETED and (row := self._row_of(pk)) is not None:
+            self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+            del self._pks[row]
+            # rows after the deleted one move to the previous position
+            self._drop_pages(row // self.page_size)
+            self.endRemoveRows()
+        elif kind not in (UPDATED, DELETED):
+            self.reload()
+
+    def _insert(self, pk: int) -> None:
+        if not self._exhausted:
+            # the row is fetched later by fetchMore
+            return
+        if self._pks and pk <= self._pks[-1]:
+            # the row does not belong to the end of the table
+            self.reload()
+            return
+        generation = self._generation
+        self.worker.call(self.rows.get_all, {'pk': pk},
+                         on_done=lambda rows: self._append(generation, pk, rows))
+
+    def _append(self, generation: int, pk: int, rows: list[ExpenseRow]) -> None:
+        if generation != self._generation or not rows \
+                or (self._pks and pk <= self._pks[-1]):
+            return
+        row = len(self._pks)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self._pks.append(pk)
+        page, offset = divmod(row, self.page_size)
+        if offset and page in self._pages:
+            self._pages[page].append(rows[0])
+        self.endInsertRows()
+
+    def reload(self) -> None:
+        """
+        Drop fetched rows; the view fetches the first pages again
+        """
+        self.beginResetModel()
+        self._generation += 1
+        # the categories are reread on the worker before the next page
+        self.worker.call(self.rows.invalidate)
+        self._pks = array('q')
+        self._exhausted = False
+        self._fetching = False
+        self._drop_pages(0)
+        self.endResetModel()
+
 
-    def __init__(self, cat_repo: SqliteRepository, exp_repo: SqliteRepository,
-                 *args, **kwargs) -> None:
+class ExpensesTable(QtWidgets.QTableView):
+    """
+    виджет для таблицы с расходами
+    """
+
+    def __init__(self, cat_repo: AbstractRepository[Category],
+                 exp_repo: AbstractRepository[Expense],
+                 budget_repo: AbstractRepository[Budget], budget_engine: BudgetEngine,
+                 worker: RepositoryWorker, *args, **kwargs) -> None:
         """
         Widget with expense table
         Parameters
         ----------
         cat_repo - repository for category data
         exp_repo - repository for expenses
+        budget_repo - repository for budgets
+        budget_engine - running totals of expenses for the current periods
+        worker - runs repository calls off the GUI thread
         args
         kwargs
         """
 
         super().__init__(*args, **kwargs)
 
-        self.setColumnCount(len(self.columns))
-        self.setRowCount(20)
-        self.setHorizontalHeaderLabels(self.columns)
+        self.exp_repo = exp_repo
+        self.cat_repo = cat_repo
+        self.budget_engine = budget_engine
+
+        self.expenses_model = ExpensesModel(cat_repo, exp_repo, budget_repo,
+                                            budget_engine, worker, parent=self)
+        self.setModel(self.expenses_model)
+        # edits made in the table, for the widgets showing budgets
+        self.data_updated = self.expenses_model.data_updated
 
         header = self.horizontalHeader()
         header.setSectionResizeMode(
@@ -39,64 +352,29 @@ class ExpensesTable(QtWidgets.QTableWidget):
             2, QtWidgets.QHeaderView.ResizeToContents)
         header.setSectionResizeMode(
             3, QtWidgets.QHeaderView.Stretch)
+        # resize to contents of visible rows only, otherwise Qt would
+        # materialize up to a thousand rows to measure the columns
+        header.setResizeContentsPrecision(0)
 
         self.setEditTriggers(
-            QtWidgets.QTableWidget.DoubleClicked)
+            QtWidgets.QTableView.DoubleClicked)
 
         self.verticalHeader().hide()
 
-        self.exp_repo = exp_repo
-        self.cat_repo = cat_repo
-
-        self.cellChanged.connect(self.handleCellChanged)
-
-        self.pk_row_dict = {}
-
-    def handleCellChanged(self, row: int, column: int) -> None:
-        """
-        Rewrite database according to inputted data
-        Parameters
-        ----------
-        row - changed row
-        column - changed column
-        """
-        new_value = self.item(row, column).text()
-
-        pk = self.pk_row_dict[row]
-
-        changed_row = self.exp_repo.get(pk)
-
-        if column == 0:
-            changed_row.added_date = new_value
-        elif column == 1:
-            changed_row.amount = new_value
-        elif column == 2:
-            changed_row.category = new_value
-        else:
-            changed_row.comment = new_value
-
-        self.exp_repo.update(changed_row)
-
     def fill_table(self) -> None:
         """
-        Fill the table widget with data from Expense repository
+        Reload the table from Expense repository
         Returns
         -------
         """
+        self.expenses_model.reload()
 
-        expenses = self.exp_repo.get_all()
-
-        self.cellChanged.disconnect()
-        row_count = self.rowCount()
-
-        for i, expense in enumerate(expenses):
-            if i >= row_count:
-                self.insertRow(i)
-            self.setItem(i, 0, QtWidgets.QTableWidgetItem(expense.added_date))
-            self.setItem(i, 1, QtWidgets.QTableWidgetItem(str(expense.amount)))
-            category = self.cat_repo.get(expense.category).name
-            self.setItem(i, 2, QtWidgets.QTableWidgetItem(category))
-            self.setItem(i, 3, QtWidgets.QTableWidgetItem(expense.comment))
-            self.pk_row_dict[i] = expense.pk
-
-        self.cellChanged.connect(self.handleCellChanged)
\ No newline at end of file
+    def apply_change(self, kind: str, pk: int) -> None:
+        """
+        Update only the changed expense
+        Parameters
+        ----------
+        kind - INSERTED, UPDATED or DELETED (see bookkeeper.view.changes)
+        pk - primary key of the changed expense
+        """
+        self.expenses_model.apply_change(kind, pk)
@@ -0,0 +1,103 @@
+"""
+Модуль для выполнения операций с репозиториями вне потока интерфейса
+"""
+
+import sys
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from PySide6 import QtCore
+
+from bookkeeper.repository.instrumentation import Instrumentation
+
+
+def serial_executor() -> ThreadPoolExecutor:
+    """ Исполнитель с одним потоком: задачи выполняются строго по очереди """
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='repository')
+
+
+class RepositoryWorker(QtCore.QObject):
+    """
+    Выполняет операции с репозиториями в отдельном потоке строго по очереди
+    и передает результаты в поток интерфейса через сигнал.
+    Все обращения виджетов к репозиториям и к BudgetEngine выполняются
+    через один RepositoryWorker, поэтому записи не переупорядочиваются.
+    """
+    _finished = QtCore.Signal(object, object, object)
+
+    def __init__(self, executor: Executor | None = None,
+                 instrumentation: Instrumentation | None = None,
+                 *args, **kwargs) -> None:
+        """
+        Parameters
+        ----------
+        executor - исполнитель с одним потоком (см. serial_executor)
+        instrumentation - если задан, в него записывается время функций
+        (ключ 'worker.<имя>') и обработчиков результата в потоке
+        интерфейса ('ui.<имя>')
+        args
+        kwargs
+        """
+        super().__init__(*args, **kwargs)
+        self.executor = executor or serial_executor()
+        self.instrumentation = instrumentation
+        # сигнал испускается в потоке исполнителя, а слот выполняется
+        # в потоке, которому принадлежит объект, т.е. в потоке интерфейса
+        self._finished.connect(self._deliver, QtCore.Qt.QueuedConnection)
+
+    def call(self, fn: Callable[..., Any], *args: Any,
+             on_done: Callable[[Any], None] | None = None,
+             on_error: Callable[[BaseException], None] | None = None) -> Future:
+        """
+        Выполнить функцию в потоке исполнителя
+        Parameters
+        ----------
+        fn - функция, выполняющая операции с репозиториями
+        args - аргументы функции
+        on_done - вызывается в потоке интерфейса с результатом функции
+        on_error - вызывается в потоке интерфейса с исключением
+        Returns
+        -------
+        Future с результатом функции
+        """
+        if self.instrumentation is not None:
+            fn = self._timed('worker', fn)
+            on_done = on_done and self._timed('ui', on_done)
+        future = self.executor.submit(fn, *args)
+        self.then(future, on_done, on_error)
+        return future
+
+    def _timed(self, prefix: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        assert self.instrumentation is not None
+        timer = self.instrumentation.timer
+        key = f'{prefix}.{getattr(fn, "__qualname__", type(fn).__name__)}'
+
+        def timed(*args: Any) -> Any:
+            with timer(key):
+                return fn(*args)
+        return timed
+
+    def then(self, future: Future,
+             on_done: Callable[[Any], None] | None = None,
+             on_error: Callable[[BaseException], None] | None = None) -> None:
+        """
+        Передать результат future в обработчики в потоке интерфейса
+        """
+        future.add_done_callback(lambda f: self._finished.emit(on_done, on_error, f))
+
+    @QtCore.Slot(object, object, object)
+    def _deliver(self, on_done: Callable[[Any], None] | None,
+                 on_error: Callable[[BaseException], None] | None,
+                 future: Future) -> None:
+        error = future.exception()
+        if error is None:
+            if on_done is not None:
+                on_done(future.result())
+        elif on_error is not None:
+            on_error(error)
+        else:
+            sys.excepthook(type(error), error, error.__traceback__)
+
+    def shutdown(self) -> None:
+        """ Дождаться выполнения поставленных операций """
+        self.executor.shutdown(wait=True)
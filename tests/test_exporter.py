@@ -0,0 +1,114 @@
+import csv
+import gzip
+import json
+import lzma
+import sqlite3
+from datetime import date
+
+import pytest
+
+from bookkeeper.exporter import (
+    CATEGORY_COLUMNS, EXPENSE_COLUMNS, category_rows, expense_rows, format_from_path,
+    main, open_output, write_rows
+)
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+
+TREE = [('продукты', None), ('мясо', 'продукты'), ('книги', None)]
+
+
+def fill(cat_repo, exp_repo):
+    Category.create_from_tree(TREE, cat_repo)
+    exp_repo.add_many([Expense(10, 2, '2023-03-02 10:00:00', comment='"фарш", 1 кг'),
+                       Expense(20, 3, '2023-03-01 12:00:00'),
+                       Expense(30, 1, '2023-04-01 09:00:00')])
+
+
+@pytest.fixture
+def repos():
+    cat_repo = MemoryRepository[Category]()
+    exp_repo = MemoryRepository[Expense]()
+    fill(cat_repo, exp_repo)
+    return exp_repo, cat_repo
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    db_file = str(tmp_path / 'export.db')
+    cat_repo = SqliteRepository(db_file=db_file, cls=Category)
+    fill(cat_repo, SqliteRepository(db_file=db_file, cls=Expense))
+    yield db_file
+    cat_repo.connections.close()
+
+
+def test_expense_rows(repos):
+    rows = list(expense_rows(*repos))
+    assert [row['amount'] for row in rows] == [20, 10, 30]
+    assert rows[1]['category_path'] == 'продукты / мясо'
+    assert [row['amount'] for row in expense_rows(*repos, start=date(2023, 3, 2),
+                                                  end=date(2023, 4, 1))] == [10]
+    assert [row['amount'] for row in expense_rows(*repos, categories=[1])] == [10, 30]
+    assert [row['amount'] for row in expense_rows(*repos, categories=[1],
+                                                  subcategories=False)] == [30]
+
+
+def test_category_rows(repos):
+    assert list(category_rows(*repos))[1] == {'pk': 2, 'name': 'мясо', 'parent': 1,
+                                              'path': 'продукты / мясо'}
+
+
+@pytest.mark.parametrize('name, opener', [('out.csv', open), ('out.csv.gz', gzip.open),
+                                          ('out.jsonl.xz', lzma.open)])
+def test_write_compressed(repos, tmp_path, name, opener):
+    path = str(tmp_path / name)
+    fmt = format_from_path(path)
+    with open_output(path) as file:
+        assert write_rows(file, expense_rows(*repos), EXPENSE_COLUMNS, fmt) == 3
+    with opener(path, 'rt', encoding='utf-8', newline='') as file:
+        if fmt == 'csv':
+            rows = list(csv.DictReader(file))
+        else:
+            rows = [json.loads(line) for line in file]
+    assert rows[1]['comment'] == '"фарш", 1 кг'
+    assert list(rows[0]) == EXPENSE_COLUMNS
+
+
+def test_write_rows_unknown_format(tmp_path):
+    with open_output(str(tmp_path / 'out.txt')) as file:
+        with pytest.raises(ValueError):
+            write_rows(file, [], CATEGORY_COLUMNS, 'xml')
+    with pytest.raises(ValueError):
+        open_output(str(tmp_path / 'out.txt'), 'zip')
+
+
+def test_main(db_file, tmp_path, capsys):
+    out = str(tmp_path / 'meat.jsonl.gz')
+    assert main([out, '--db', db_file, '--category', 'продукты',
+                 '--start', '2023-03-01', '--end', '2023-04-01']) == 0
+    with gzip.open(out, 'rt', encoding='utf-8') as file:
+        assert [json.loads(line)['category_name'] for line in file] == ['мясо']
+    assert main(['-', '--db', db_file, '--table', 'category']) == 0
+    assert capsys.readouterr().out.splitlines()[0] == ','.join(CATEGORY_COLUMNS)
+    assert main(['-', '--db', db_file, '--category', 'одежда']) == 1
+    dump = str(tmp_path / 'dump.sql.xz')
+    assert main([dump, '--db', db_file]) == 0
+    with lzma.open(dump, 'rt', encoding='utf-8') as file:
+        script = file.read()
+    con = sqlite3.connect(':memory:')
+    con.executescript(script)
+    assert con.execute('SELECT SUM(amount) FROM expense').fetchone()[0] == 60
+    con.close()
+
+
+def test_main_migrates_legacy_dates(db_file, tmp_path):
+    con = sqlite3.connect(db_file)
+    with con:
+        con.execute("UPDATE expense SET expense_date = '09:00, 01/04/2023' WHERE pk = 3")
+        con.execute('PRAGMA user_version = 0')
+    con.close()
+    out = str(tmp_path / 'april.jsonl')
+    assert main([out, '--db', db_file, '--start', '2023-04-01']) == 0
+    with open(out, encoding='utf-8') as file:
+        assert [json.loads(line)['amount'] for line in file] == [30]
@@ -0,0 +1,151 @@
+import io
+
+import pytest
+
+from bookkeeper.importer import (
+    CategoryMap, ColumnMapping, CsvImporter, DateParser, RowError, import_category_tree,
+    main, parse_amount
+)
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+
+STATEMENT = '''Дата операции;Сумма;Категория;Описание
+01.03.2023 18:30;-1 234,50;мясо;магазин
+02.03.2023 09:00;5000,00;;зарплата
+03.03.2023 10:15;-99,49;книги / фантастика;
+'''
+
+
+@pytest.fixture
+def cat_repo():
+    repo = MemoryRepository[Category]()
+    Category.create_from_tree([('продукты', None), ('мясо', 'продукты'),
+                               ('книги', None), ('фантастика', 'книги'),
+                               ('кино', None), ('фантастика', 'кино')], repo)
+    return repo
+
+
+def test_date_parser():
+    parse = DateParser()
+    assert parse('2023-03-01') == '2023-03-01 00:00:00'
+    assert parse('01.03.2023 18:30') == '2023-03-01 18:30:00'
+    assert parse.formats[0] == '%d.%m.%Y %H:%M'
+    assert parse('18:30, 01/03/2023') == '2023-03-01 18:30:00'
+    with pytest.raises(RowError):
+        parse('вчера')
+
+
+def test_parse_amount():
+    assert parse_amount('-1 234,50') == -parse_amount('1234.5')
+    assert parse_amount('1\xa0000') == 1000
+    with pytest.raises(RowError):
+        parse_amount('много')
+
+
+def test_category_map(cat_repo):
+    categories = CategoryMap(cat_repo)
+    assert categories.resolve('мясо') == 2
+    assert categories.resolve('продукты / мясо') == 2
+    assert categories.resolve('кино / фантастика') == 6
+    with pytest.raises(RowError, match='ambiguous'):
+        categories.resolve('фантастика')
+    with pytest.raises(RowError, match='unknown'):
+        categories.resolve('одежда')
+
+
+def test_category_map_create(cat_repo):
+    categories = CategoryMap(cat_repo, create=True)
+    pk = categories.resolve('продукты / сладости / торты')
+    cat = cat_repo.get(pk)
+    assert cat.name == 'торты'
+    assert [p.name for p in cat.get_all_parents(cat_repo)] == ['сладости', 'продукты']
+    assert categories.resolve('торты') == pk
+
+
+def test_import_statement(cat_repo):
+    exp_repo = MemoryRepository[Expense]()
+    importer = CsvImporter(exp_repo, cat_repo,
+                           ColumnMapping('Сумма', 'Дата операции', 'Категория',
+                                         'Описание', negate=True),
+                           chunk_size=1)
+    result = importer.run(io.StringIO(STATEMENT), delimiter=';')
+    assert (result.imported, result.skipped, result.errors) == (2, 1, [])
+    assert [(e.amount, e.category, e.expense_date, e.comment)
+            for e in exp_repo.get_all()] == [
+        (1235, 2, '2023-03-01 18:30:00', 'магазин'),
+        (99, 4, '2023-03-03 10:15:00', '')]
+
+
+def test_import_errors(cat_repo):
+    data = 'a,2023-03-01,мясо\n10,2023-03-01,одежда\n10\n20,2023-03-02,мясо\n'
+    mapping = ColumnMapping(0, 1, 2)
+    exp_repo = MemoryRepository[Expense]()
+    with pytest.raises(RowError, match='line 1'):
+        CsvImporter(exp_repo, cat_repo, mapping).run(io.StringIO(data), header=False)
+    result = CsvImporter(exp_repo, cat_repo, mapping, skip_errors=True) \
+        .run(io.StringIO(data), header=False)
+    assert (result.imported, result.skipped) == (1, 3)
+    assert [line for line, _ in result.errors] == [1, 2, 3]
+    with pytest.raises(ValueError, match='not found'):
+        CsvImporter(exp_repo, cat_repo, ColumnMapping('Сумма', 0)).run(io.StringIO(data))
+
+
+def test_main(tmp_path, capsys):
+    db_file = str(tmp_path / 'import.db')
+    csv_file = tmp_path / 'statement.csv'
+    csv_file.write_text(STATEMENT, encoding='cp1251')
+    assert main([str(csv_file), '--db', db_file, '--amount', 'Сумма',
+                 '--date', 'Дата операции', '--category', 'Категория',
+                 '--comment', 'Описание', '--delimiter', ';', '--encoding', 'cp1251',
+                 '--negate', '--create-categories']) == 0
+    assert 'imported 2, skipped 1' in capsys.readouterr().out
+    exp_repo = SqliteRepository(db_file=db_file, cls=Expense)
+    cat_repo = SqliteRepository(db_file=db_file, cls=Category)
+    assert [e.amount for e in exp_repo.get_all()] == [1235, 99]
+    assert {c.name for c in cat_repo.get_all()} == {'мясо', 'книги', 'фантастика'}
+    exp_repo.connections.close()
+
+
+TREE_TEXT = '''
+продукты
+    мясо
+        сырое мясо
+    сладости
+книги
+    фантастика
+кино
+    фантастика
+        космос
+'''.splitlines()
+
+
+def test_import_category_tree(tmp_path):
+    cat_repo = SqliteRepository(db_file=str(tmp_path / 'tree.db'), cls=Category)
+    created = import_category_tree(TREE_TEXT, cat_repo)
+    assert [c.pk for c in created] == list(range(1, 10))
+    space = cat_repo.get_all({'name': 'космос'})[0]
+    assert [c.name for c in space.get_all_parents(cat_repo)] == ['фантастика', 'кино']
+    more = import_category_tree(['продукты', '    мясо', '    хлеб', 'одежда'], cat_repo)
+    assert [(c.name, c.parent) for c in more] == [('хлеб', 1), ('одежда', None)]
+    assert len(cat_repo.get_all()) == 11
+    with pytest.raises(ValueError, match='already exists'):
+        import_category_tree(['книги', '    комиксы'], cat_repo, merge=False)
+    with pytest.raises(ValueError, match='twice'):
+        import_category_tree(['игры', 'игры'], cat_repo)
+    # при ошибке транзакция откатывается целиком
+    assert len(cat_repo.get_all()) == 11
+    cat_repo.connections.close()
+
+
+def test_main_category_tree(tmp_path, capsys):
+    db_file = str(tmp_path / 'tree.db')
+    tree_file = tmp_path / 'tree.txt'
+    tree_file.write_text('\n'.join(TREE_TEXT), encoding='utf-8')
+    assert main(['--db', db_file, '--category-tree', str(tree_file)]) == 0
+    assert main(['--db', db_file, '--category-tree', str(tree_file)]) == 0
+    assert capsys.readouterr().out.splitlines() == ['created 9 categories',
+                                                    'created 0 categories']
+    with pytest.raises(SystemExit):
+        main(['--db', db_file])
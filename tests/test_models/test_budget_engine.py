@@ -0,0 +1,108 @@
+from datetime import date
+
+import pytest
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.budget_engine import BudgetEngine, period_bounds
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.columnar_repository import ColumnarExpenseRepository
+from bookkeeper.repository.memory_repository import MemoryRepository
+
+
+class Clock:
+    def __init__(self, today):
+        self.value = today
+
+    def __call__(self):
+        return self.value
+
+
+@pytest.fixture
+def clock():
+    return Clock(date(2023, 3, 15))  # среда
+
+
+@pytest.fixture
+def exp_repo():
+    repo = MemoryRepository[Expense]()
+    repo.add(Expense(10, 1, expense_date='2023-03-15 10:00:00'))
+    repo.add(Expense(20, 1, expense_date='2023-03-13 10:00:00'))
+    repo.add(Expense(40, 1, expense_date='2023-03-01 10:00:00'))
+    repo.add(Expense(80, 1, expense_date='2023-02-28 10:00:00'))
+    return repo
+
+
+@pytest.fixture
+def engine(exp_repo, clock):
+    return BudgetEngine(exp_repo, today=clock)
+
+
+def test_period_bounds():
+    assert period_bounds('day', '2023-03-15 10:00:00') == (date(2023, 3, 15),
+                                                           date(2023, 3, 16))
+    assert period_bounds('week', date(2023, 3, 15)) == (date(2023, 3, 13),
+                                                        date(2023, 3, 20))
+    assert period_bounds('month', date(2023, 12, 31)) == (date(2023, 12, 1),
+                                                          date(2024, 1, 1))
+    with pytest.raises(ValueError):
+        period_bounds('year', date(2023, 1, 1))
+
+
+def test_spent(engine):
+    assert engine.spent('day') == 10
+    assert engine.spent('week') == 30
+    assert engine.spent('month') == 70
+
+
+def test_incremental(engine, exp_repo):
+    for period in ('day', 'week', 'month'):
+        engine.spent(period)
+    # после загрузки сумм репозиторий больше не читается
+    exp_repo.get_all = exp_repo.iter_all = None
+    exp = Expense(5, 1, expense_date='2023-03-14 09:00:00')
+    engine.expense_added(exp)
+    assert (engine.spent('day'), engine.spent('week'), engine.spent('month')) \
+        == (10, 35, 75)
+    old = Expense(5, 1, expense_date='2023-03-14 09:00:00')
+    exp.expense_date = '2023-03-15 09:00:00'
+    exp.amount = 7
+    engine.expense_updated(old, exp)
+    assert (engine.spent('day'), engine.spent('week'), engine.spent('month')) \
+        == (17, 37, 77)
+    engine.expense_deleted(exp)
+    assert (engine.spent('day'), engine.spent('week'), engine.spent('month')) \
+        == (10, 30, 70)
+
+
+def test_rollover(engine, exp_repo, clock):
+    assert engine.spent('day') == 10
+    exp_repo.add(Expense(3, 1, expense_date='2023-03-16 09:00:00'))
+    clock.value = date(2023, 3, 16)
+    assert engine.spent('day') == 3
+    clock.value = date(2023, 4, 2)
+    assert engine.spent('month') == 0
+
+
+def test_sync_budgets(engine):
+    budget_repo = MemoryRepository[Budget]()
+    budget_repo.add_many([Budget(100), Budget(500), Budget(1000)])
+    budgets = engine.sync_budgets(budget_repo)
+    assert [b.cur_sum for b in budgets] == [10, 30, 70]
+    assert [b.cur_sum for b in budget_repo.get_all()] == [10, 30, 70]
+
+
+def test_sync_budgets_creates_missing(engine):
+    budget_repo = MemoryRepository[Budget]()
+    budget_repo.add(Budget(100))
+    engine.sync_budgets(budget_repo)
+    assert [(b.budget, b.cur_sum) for b in budget_repo.get_all()] \
+        == [(100, 10), (0, 30), (0, 70)]
+
+
+def test_spent_uses_aggregate(exp_repo, clock):
+    columnar = ColumnarExpenseRepository()
+    columnar.add_many(Expense(e.amount, e.category, e.expense_date)
+                      for e in exp_repo.get_all())
+    columnar.iter_all = None  # суммы считаются без чтения трат
+    engine = BudgetEngine(columnar, today=clock)
+    assert [engine.spent(p) for p in ('day', 'week', 'month')] == [10, 30, 70]
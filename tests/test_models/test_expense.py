@@ -28,3 +28,18 @@ def test_can_add_to_repo(repo):
     e = Expense(100, 1)
     pk = repo.add(e)
     assert e.pk == pk
+
+
+def test_default_dates_per_instance(monkeypatch):
+    e1 = Expense(100, 1)
+    assert datetime.fromisoformat(e1.expense_date)
+
+    class FakeDatetime:
+        @staticmethod
+        def now():
+            return datetime(2000, 1, 1)
+
+    monkeypatch.setattr('bookkeeper.models.expense.datetime', FakeDatetime)
+    e2 = Expense(100, 1)
+    assert e2.expense_date == e2.added_date == '2000-01-01 00:00:00'
+    assert e1.expense_date != e2.expense_date
@@ -0,0 +1,91 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.models.report import SpendingReport, category_day_totals
+from bookkeeper.repository.columnar_repository import ColumnarExpenseRepository
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+
+TREE = [('еда', None), ('мясо', 'еда'), ('сырое', 'мясо'), ('фрукты', 'еда'),
+        ('книги', None)]
+
+
+def random_expenses(n):
+    rnd = random.Random(3)
+    for _ in range(n):
+        day = date(2023, 1, 1) + timedelta(days=rnd.randrange(90))
+        yield Expense(amount=rnd.randrange(1000), category=1 + rnd.randrange(5),
+                      expense_date=f'{day} {rnd.randrange(24):02d}:00:00')
+
+
+@pytest.fixture(params=['memory', 'columnar', 'sqlite'])
+def repos(request, tmp_path):
+    if request.param == 'sqlite':
+        db_file = str(tmp_path / 'report.db')
+        cat_repo = SqliteRepository(db_file=db_file, cls=Category)
+        exp_repo = SqliteRepository(db_file=db_file, cls=Expense)
+    else:
+        cat_repo = MemoryRepository[Category]()
+        exp_repo = MemoryRepository[Expense]() if request.param == 'memory' \
+            else ColumnarExpenseRepository()
+    Category.create_from_tree(TREE, cat_repo)
+    expenses = list(random_expenses(500))
+    exp_repo.add_many(expenses)
+    yield cat_repo, exp_repo, expenses
+    if request.param == 'sqlite':
+        exp_repo.connections.close()
+
+
+def test_category_day_totals(repos):
+    _, exp_repo, expenses = repos
+    expected = {}
+    for exp in expenses:
+        if '2023-02-01' <= exp.expense_date < '2023-03-01':
+            key = (exp.category, exp.expense_date[:10])
+            expected[key] = expected.get(key, 0) + exp.amount
+    assert category_day_totals(exp_repo, date(2023, 2, 1), date(2023, 3, 1)) == expected
+
+
+def test_rollup_matches_subcategories(repos):
+    cat_repo, exp_repo, expenses = repos
+    report = SpendingReport.load(exp_repo, cat_repo)
+    own = report.by_category()
+    rollup = report.rollup()
+    for cat in cat_repo.get_all():
+        subtree = {cat.pk} | {sub.pk for sub in cat.get_subcategories(cat_repo)}
+        assert rollup[cat.pk] == sum(e.amount for e in expenses if e.category in subtree)
+        assert own.get(cat.pk, 0) == sum(e.amount for e in expenses
+                                         if e.category == cat.pk)
+
+
+def test_by_period(repos):
+    cat_repo, exp_repo, expenses = repos
+    report = SpendingReport.load(exp_repo, cat_repo)
+    months = report.by_period('month')
+    assert list(months) == [date(2023, 1, 1), date(2023, 2, 1), date(2023, 3, 1)]
+    assert months[date(2023, 2, 1)] == sum(e.amount for e in expenses
+                                           if e.expense_date.startswith('2023-02'))
+    weeks = report.by_period('week')
+    assert all(start.weekday() == 0 for start in weeks)
+    assert sum(weeks.values()) == sum(e.amount for e in expenses)
+    meat = cat_repo.get_all({'name': 'мясо'})[0].pk
+    days = report.by_period('day', meat)
+    assert days[date(2023, 1, 5)] == sum(
+        e.amount for e in expenses
+        if e.category in (2, 3) and e.expense_date.startswith('2023-01-05'))
+    monthly = report.rollup_by_period('month')
+    assert monthly[date(2023, 2, 1)][1] == sum(
+        e.amount for e in expenses
+        if e.category in (1, 2, 3, 4) and e.expense_date.startswith('2023-02'))
+
+
+def test_unknown_category_and_cycle():
+    report = SpendingReport({(7, '2023-01-01'): 5, (1, '2023-01-01'): 1},
+                            [Category('a', None, 1), Category('b', 1, 2)])
+    assert report.rollup() == {1: 1, 2: 0, 7: 5}
+    with pytest.raises(ValueError):
+        SpendingReport({}, [Category('a', 2, 1), Category('b', 1, 2)])
@@ -0,0 +1,136 @@
+from contextlib import contextmanager
+
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.cached_repository import CachedRepository, uncached
+from bookkeeper.repository.expense_rows import ExpenseRows
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import In
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+from bookkeeper.repository.unit_of_work import unit_of_work
+
+
+class CountingRepository(MemoryRepository):
+    def __init__(self):
+        super().__init__()
+        self.gets = 0
+        self.queries = 0
+
+    def get(self, pk):
+        self.gets += 1
+        return super().get(pk)
+
+    def get_all(self, where=None, order_by=None, limit=None):
+        self.queries += 1
+        return super().get_all(where, order_by, limit)
+
+
+@pytest.fixture
+def inner():
+    return CountingRepository()
+
+
+@pytest.fixture
+def repo(inner):
+    return CachedRepository(inner, maxsize=2, query_maxsize=2)
+
+
+def test_get_is_cached(repo, inner):
+    pk = repo.add(Category('a'))
+    assert repo.get(pk) == repo.get(pk) == Category('a', pk=pk)
+    assert inner.gets == 1
+    assert (repo.stats.hits, repo.stats.misses) == (1, 1)
+    assert repo.get(pk) is not repo.get(pk)
+    repo.get(pk).name = 'changed'
+    assert repo.get(pk).name == 'a'
+
+
+def test_lru_eviction(repo, inner):
+    pks = repo.add_many([Category(name) for name in 'abc'])
+    repo.get(pks[0])
+    repo.get(pks[1])
+    repo.get(pks[0])
+    repo.get(pks[2])  # вытесняет pks[1], к которому обращались давнее всех
+    assert repo.stats.evictions == 1
+    inner.gets = 0
+    repo.get(pks[0])
+    repo.get(pks[1])
+    assert inner.gets == 1
+
+
+def test_write_through(repo, inner):
+    pk = repo.add(Category('a'))
+    repo.get(pk)
+    repo.update(Category('b', pk=pk))
+    assert repo.get(pk).name == 'b'
+    repo.delete(pk)
+    assert repo.get(pk) is None
+    assert inner.get(pk) is None
+
+
+def test_get_all_cache(repo, inner):
+    repo.add_many([Category('a'), Category('b', 1)])
+    assert repo.get_all({'parent': In([1])}) == repo.get_all({'parent': In([1])})
+    assert inner.queries == 1
+    assert repo.query_stats.hits == 1
+    repo.add(Category('c', 1))
+    assert len(repo.get_all({'parent': In([1])})) == 2
+    assert inner.queries == 2
+    repo.get_all({'name': 'a'})
+    repo.get_all({'name': 'b'})
+    assert repo.query_stats.evictions == 1
+
+
+def test_get_all_cache_disabled(inner):
+    repo = CachedRepository(inner)
+    repo.get_all()
+    repo.get_all()
+    assert inner.queries == 2
+
+
+def test_unit_of_work_rollback_clears_cache(repo, inner):
+    pk = repo.add(Category('a'))
+    with pytest.raises(RuntimeError):
+        with unit_of_work(repo):
+            repo.update(Category('b', pk=pk))
+            raise RuntimeError
+    assert inner.get(pk).name == 'a'
+    assert repo.get(pk).name == 'a'
+
+
+def test_unit_of_work_commit_failure_clears_cache(repo, inner, monkeypatch):
+    pk = repo.add(Category('a'))
+    transaction = inner.transaction
+
+    @contextmanager
+    def failing_commit():
+        with transaction():
+            yield
+            raise RuntimeError('commit failed')
+
+    monkeypatch.setattr(inner, 'transaction', failing_commit)
+    with pytest.raises(RuntimeError):
+        with unit_of_work(repo):
+            repo.update(Category('b', pk=pk))
+            repo.get(pk)
+    assert repo.get(pk).name == 'a'
+
+
+def test_sqlite_delegation(tmp_path):
+    db_file = str(tmp_path / 'cache.db')
+    cat_repo = CachedRepository(SqliteRepository(db_file=db_file, cls=Category))
+    exp_repo = SqliteRepository(db_file=db_file, cls=Expense)
+    parent = cat_repo.add(Category('еда'))
+    child = cat_repo.add(Category('мясо', parent))
+    exp_repo.add(Expense(10, child))
+    assert uncached(cat_repo) is cat_repo.repo
+    assert cat_repo.table_name == 'category'
+    assert [cat.pk for cat in cat_repo.get(child).get_all_parents(cat_repo)] == [parent]
+    rows = ExpenseRows(exp_repo, cat_repo)
+    assert rows._joined()
+    assert rows.get_all()[0].category_path == 'еда / мясо'
+    cat_repo.update(Category('фантом', pk=100))
+    assert cat_repo.get(100) is None
+    exp_repo.connections.close()
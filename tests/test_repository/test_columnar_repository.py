@@ -0,0 +1,125 @@
+import random
+from datetime import date
+
+import pytest
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AggregateRepository
+from bookkeeper.repository.columnar_repository import (
+    ColumnarExpenseRepository, date_from_key, date_key
+)
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import In, IsNull, Predicate, Range, date_range
+
+
+class Evening(Predicate):
+    def to_sql(self, column):
+        return f"substr({column}, 12, 2) >= '18'", []
+
+    def __call__(self, value):
+        return value[11:13] >= '18'
+
+
+@pytest.fixture
+def repo():
+    return ColumnarExpenseRepository()
+
+
+def random_expenses(n):
+    rnd = random.Random(2)
+    for i in range(n):
+        day = date(2023, 1 + rnd.randrange(3), 1 + rnd.randrange(28)).isoformat()
+        yield Expense(amount=rnd.randrange(1000), category=rnd.randrange(6),
+                      expense_date=f'{day} {rnd.randrange(24):02d}:15:00',
+                      added_date=f'{day} 23:59:59',
+                      comment=rnd.choice(['', 'обед', 'такси']))
+
+
+def test_date_key_roundtrip():
+    assert date_from_key(date_key('2023-03-01 18:30:05')) == '2023-03-01 18:30:05'
+    assert date_key('2023-03-01') == date_key('2023-03-01 00:00:00')
+    assert date_key('2023-03-01 18:30:05.123456') == date_key('2023-03-01 18:30:05')
+
+
+def test_crud(repo):
+    exp = Expense(amount=100, category=1, expense_date='2023-03-01 12:00:00',
+                  comment='обед')
+    pk = repo.add(exp)
+    assert pk == exp.pk == 1
+    assert repo.get(pk) == exp
+    assert repo.get(pk) is not exp
+    exp.amount = 200
+    exp.comment = 'ужин'
+    repo.update(exp)
+    assert repo.get(pk) == exp
+    repo.delete(pk)
+    assert repo.get(pk) is None
+    assert len(repo) == 0
+    with pytest.raises(KeyError):
+        repo.delete(pk)
+    with pytest.raises(KeyError):
+        repo.update(exp)
+
+
+def test_add_many_invalid_leaves_repo_unchanged(repo):
+    repo.add(Expense(amount=1, category=1))
+    with pytest.raises(ValueError):
+        repo.add_many([Expense(amount=2, category=1),
+                       Expense(amount=3, category=1, expense_date='bad')])
+    assert len(repo) == 1
+    assert repo.add_many([Expense(amount=2, category=1)]) == [2]
+
+
+def test_get_all_matches_memory_repository(repo):
+    memory = MemoryRepository()
+    for exp in random_expenses(500):
+        memory.add(exp)
+        repo.add(Expense(exp.amount, exp.category, exp.expense_date,
+                         exp.added_date, exp.comment))
+    for pk in range(1, 500, 9):
+        repo.delete(pk)
+        memory.delete(pk)
+    conditions = [
+        None,
+        {'category': 3},
+        {'category': In([1, 2]), 'amount': Range(100, 500)},
+        {'expense_date': date_range(date(2023, 2, 1), date(2023, 3, 1))},
+        {'expense_date': date_range(end=date(2023, 1, 10)), 'comment': 'обед'},
+        {'comment': In(['обед', 'такси'])},
+        {'pk': Range(100, 200)},
+        {'amount': IsNull()},
+        {'expense_date': Evening(), 'category': 2},
+        {'category': '1'},
+    ]
+    for where in conditions:
+        assert repo.get_all(where) == memory.get_all(where)
+        assert list(repo.iter_all(where)) == memory.get_all(where)
+    assert repo.get_all(order_by=['-amount', 'pk'], limit=5) \
+        == memory.get_all(order_by=['-amount', 'pk'], limit=5)
+    assert repo.get_all(limit=3) == memory.get_all(limit=3)
+    with pytest.raises(ValueError):
+        repo.get_all({'unknown': 1})
+    for repository in (repo, memory):
+        with pytest.raises(TypeError):
+            repository.get_all({'amount': Range('a')})
+
+
+def test_totals(repo):
+    expenses = list(random_expenses(300))
+    repo.add_many(expenses)
+    where = {'expense_date': date_range(date(2023, 2, 1), date(2023, 3, 1))}
+    selected = [e for e in expenses if '2023-02' <= e.expense_date < '2023-03']
+    assert isinstance(repo, AggregateRepository)
+    assert repo.total() == sum(e.amount for e in expenses)
+    assert repo.total('amount', where) == sum(e.amount for e in selected)
+    expected = {}
+    for exp in selected:
+        expected[exp.category] = expected.get(exp.category, 0) + exp.amount
+    assert repo.totals_by('category', 'amount', where) == expected
+    by_day = {}
+    for exp in expenses:
+        key = (exp.category, exp.expense_date[:10])
+        by_day[key] = by_day.get(key, 0) + exp.amount
+    assert repo.totals_by(('category', 'expense_date')) == by_day
+    with pytest.raises(ValueError):
+        repo.total('comment')
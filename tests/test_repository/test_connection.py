@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from bookkeeper.repository.connection import ConnectionManager
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return str(tmp_path / 'test.db')
+
+
+@pytest.fixture
+def manager(db_file):
+    manager = ConnectionManager(db_file)
+    yield manager
+    manager.close()
+
+
+def test_connection_is_reused(manager):
+    assert manager.connection() is manager.connection()
+
+
+def test_pragmas_applied(manager):
+    con = manager.connection()
+    assert con.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert con.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+    assert con.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+    assert con.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+
+
+def test_connection_per_thread(manager):
+    main_con = manager.connection()
+    other = []
+    thread = threading.Thread(target=lambda: other.append(manager.connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not main_con
+
+
+def test_for_file_shared(db_file):
+    manager = ConnectionManager.for_file(db_file)
+    assert ConnectionManager.for_file(db_file) is manager
+    ConnectionManager.close_all()
+    assert ConnectionManager.for_file(db_file) is not manager
+    ConnectionManager.close_all()
+
+
+def test_reopen_after_close(manager):
+    con = manager.connection()
+    manager.close()
+    assert manager.connection() is not con
+
+
+def test_memory_database_rejected():
+    for db_file in (':memory:', ''):
+        with pytest.raises(ValueError):
+            ConnectionManager(db_file)
+        with pytest.raises(ValueError):
+            ConnectionManager.for_file(db_file)
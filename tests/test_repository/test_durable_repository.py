@@ -0,0 +1,105 @@
+import os
+import time
+
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.durable_repository import DurableMemoryRepository
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'expenses')
+
+
+def reopen(repo, path, **kwargs):
+    repo.sync()
+    return DurableMemoryRepository(path, Expense, **kwargs)
+
+
+def test_restore_from_log(path):
+    repo = DurableMemoryRepository(path, Expense, fsync='always')
+    first = Expense(amount=10, category=1)
+    second = Expense(amount=20, category=2, comment='2')
+    repo.add_many([first, second, Expense(amount=30, category=3)])
+    first.amount = 15
+    repo.update(first)
+    repo.delete(3)
+    restored = reopen(repo, path)
+    assert restored.get_all() == [first, second]
+    assert restored.add(Expense(amount=40, category=4)) == 4
+
+
+def test_snapshot_truncates_log(path):
+    repo = DurableMemoryRepository(path, Category, snapshot_every=10)
+    for i in range(25):
+        repo.add(Category(str(i)))
+    repo.sync()
+    with open(repo.log_path, 'rb') as file:
+        assert len(file.read()) > 0
+    restored = DurableMemoryRepository(path, Category)
+    assert [c.name for c in restored.get_all()] == [str(i) for i in range(25)]
+    repo.close()
+    with open(repo.log_path, 'rb') as file:
+        assert file.read() == b''
+
+
+def test_deleted_last_pk_not_reused(path):
+    repo = DurableMemoryRepository(path, Category)
+    repo.add(Category('a'))
+    repo.delete(repo.add(Category('b')))
+    repo.close()
+    restored = DurableMemoryRepository(path, Category)
+    assert restored.add(Category('c')) == 3
+
+
+def test_torn_log_tail(path):
+    repo = DurableMemoryRepository(path, Category, fsync='always')
+    repo.add(Category('a'))
+    repo.add(Category('b'))
+    repo._log.close()
+    with open(repo.log_path, 'r+b') as file:
+        file.truncate(len(file.read()) - 3)
+    restored = DurableMemoryRepository(path, Category)
+    assert [c.name for c in restored.get_all()] == ['a']
+    assert restored.add(Category('c')) == 2
+    restored.close()
+    assert [c.name for c in DurableMemoryRepository(path, Category).get_all()] \
+        == ['a', 'c']
+
+
+def test_transaction_rollback_not_logged(path):
+    repo = DurableMemoryRepository(path, Category)
+    repo.add(Category('a'))
+    with pytest.raises(KeyError):
+        with repo.transaction():
+            repo.add(Category('b'))
+            repo.delete(42)
+    with repo.transaction():
+        repo.add(Category('c'))
+    repo.sync()
+    assert [c.name for c in DurableMemoryRepository(path, Category).get_all()] \
+        == ['a', 'c']
+
+
+def test_unknown_fsync_policy(path):
+    with pytest.raises(ValueError):
+        DurableMemoryRepository(path, Category, fsync='never')
+
+
+def test_batch_sync_by_timer(path, monkeypatch):
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, 'fsync', lambda fd: synced.append(fd) or fsync(fd))
+    repo = DurableMemoryRepository(path, Category, fsync_interval=0.05)
+    repo.add(Category('a'))
+    # запись уже передана системе: ее видно без sync и close
+    restored = DurableMemoryRepository(path, Category)
+    assert restored.get(1).name == 'a'
+    deadline = time.monotonic() + 5
+    while not synced and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert synced
+    repo.close()
+    restored.close()
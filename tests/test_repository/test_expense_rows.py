@@ -0,0 +1,69 @@
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.expense_rows import ExpenseRows
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import Range
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+from bookkeeper.utils import read_tree
+
+TREE = '''
+продукты
+    мясо
+        сырое мясо
+книги
+'''.splitlines()
+
+
+def fill(cat_repo, exp_repo):
+    cats = {c.name: c.pk for c in Category.create_from_tree(read_tree(TREE), cat_repo)}
+    exp_repo.add_many([Expense(10, cats['сырое мясо'], comment='a'),
+                       Expense(20, cats['книги'], comment='b'),
+                       Expense(30, cats['продукты'], comment='c')])
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def rows(request, tmp_path):
+    if request.param == 'memory':
+        cat_repo, exp_repo = MemoryRepository(), MemoryRepository()
+    else:
+        db = str(tmp_path / 'rows.db')
+        cat_repo = SqliteRepository(db, Category)
+        exp_repo = SqliteRepository(db, Expense)
+    fill(cat_repo, exp_repo)
+    yield ExpenseRows(exp_repo, cat_repo)
+    if request.param == 'sqlite':
+        cat_repo.connections.close()
+
+
+def test_get_all(rows):
+    result = rows.get_all()
+    assert [r.expense.comment for r in result] == ['a', 'b', 'c']
+    assert [r.category_name for r in result] == ['сырое мясо', 'книги', 'продукты']
+    assert [r.category_path for r in result] \
+        == ['продукты / мясо / сырое мясо', 'книги', 'продукты']
+
+
+def test_get_all_filtered(rows):
+    result = rows.get_all({'amount': Range(15)}, order_by='-amount', limit=1)
+    assert [(r.expense.amount, r.category_name) for r in result] == [(30, 'продукты')]
+
+
+def test_single_query(tmp_path):
+    db = str(tmp_path / 'rows.db')
+    cat_repo = SqliteRepository(db, Category)
+    exp_repo = SqliteRepository(db, Expense)
+    fill(cat_repo, exp_repo)
+    cat_repo.get = None  # построчные запросы категорий запрещены
+    assert len(ExpenseRows(exp_repo, cat_repo).get_all()) == 3
+    cat_repo.connections.close()
+
+
+def test_memory_lookup_prebuilt():
+    cat_repo, exp_repo = MemoryRepository(), MemoryRepository()
+    fill(cat_repo, exp_repo)
+    rows = ExpenseRows(exp_repo, cat_repo)
+    rows.get_all()
+    cat_repo.get_all = None  # словарь категорий уже построен
+    assert len(rows.get_all()) == 3
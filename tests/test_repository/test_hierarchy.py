@@ -0,0 +1,108 @@
+import sqlite3
+
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+from bookkeeper.utils import read_tree
+
+TREE = '''
+продукты
+    мясо
+        сырое мясо
+        мясные продукты
+    сладости
+книги
+'''.splitlines()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = SqliteRepository(db_file=str(tmp_path / 'tree.db'), cls=Category)
+    Category.create_from_tree(read_tree(TREE), repo)
+    yield repo
+    repo.connections.close()
+
+
+def pk(repo, name):
+    return repo.get_all({'name': name})[0].pk
+
+
+def names(cats):
+    return [c.name for c in cats]
+
+
+def test_ancestors(repo):
+    assert names(repo.ancestors(pk(repo, 'сырое мясо'))) == ['мясо', 'продукты']
+    assert repo.ancestors(pk(repo, 'книги')) == []
+
+
+def test_descendants(repo):
+    assert names(repo.descendants(pk(repo, 'продукты'))) \
+        == ['мясо', 'сладости', 'сырое мясо', 'мясные продукты']
+
+
+def test_category_methods_use_index(repo):
+    cat = repo.get(pk(repo, 'сырое мясо'))
+    assert names(cat.get_all_parents(repo)) == ['мясо', 'продукты']
+    root = repo.get(pk(repo, 'продукты'))
+    assert set(names(root.get_subcategories(repo))) \
+        == {'мясо', 'сладости', 'сырое мясо', 'мясные продукты'}
+
+
+def test_reparent(repo):
+    meat = repo.get(pk(repo, 'мясо'))
+    meat.parent = pk(repo, 'книги')
+    repo.update(meat)
+    assert names(repo.ancestors(pk(repo, 'сырое мясо'))) == ['мясо', 'книги']
+    assert names(repo.descendants(pk(repo, 'продукты'))) == ['сладости']
+    meat.parent = None
+    repo.update(meat)
+    assert names(repo.ancestors(pk(repo, 'сырое мясо'))) == ['мясо']
+
+
+def test_cycle_rejected(repo):
+    root = repo.get(pk(repo, 'продукты'))
+    root.parent = pk(repo, 'сырое мясо')
+    with pytest.raises(sqlite3.IntegrityError):
+        repo.update(root)
+
+
+def test_delete(repo):
+    repo.delete(pk(repo, 'сладости'))
+    con = repo.connections.connection()
+    assert con.execute('SELECT COUNT(*) FROM category_closure').fetchone()[0] == 10
+    assert names(repo.descendants(pk(repo, 'продукты'))) \
+        == ['мясо', 'сырое мясо', 'мясные продукты']
+
+
+def test_rebuild_existing_database(tmp_path):
+    db = str(tmp_path / 'old.db')
+    with sqlite3.connect(db) as con:
+        con.execute('CREATE TABLE category (pk INTEGER PRIMARY KEY, name TEXT, '
+                    'parent INTEGER)')
+        con.executemany('INSERT INTO category VALUES (?, ?, ?)',
+                        [(1, 'a', None), (2, 'b', 1), (3, 'c', 2)])
+    con.close()
+    repo = SqliteRepository(db_file=db, cls=Category)
+    assert names(repo.ancestors(3)) == ['b', 'a']
+    repo.connections.close()
+
+
+def test_subtree_sum(repo):
+    exp_repo = SqliteRepository(db_file=repo.db_file, cls=Expense)
+    exp_repo.add_many([Expense(10, pk(repo, 'сырое мясо')),
+                       Expense(20, pk(repo, 'мясо')),
+                       Expense(40, pk(repo, 'книги'))])
+    assert repo.subtree_sum(pk(repo, 'продукты'), exp_repo, 'amount') == 30
+    assert repo.subtree_sum(pk(repo, 'сладости'), exp_repo, 'amount') == 0
+    with pytest.raises(TypeError):
+        exp_repo.ancestors(1)
+
+
+def test_indexed_lookups(repo):
+    con = repo.connections.connection()
+    plan = con.execute('EXPLAIN QUERY PLAN SELECT ancestor FROM category_closure '
+                       'WHERE descendant = 3').fetchall()
+    assert 'idx_category_closure_descendant' in str(plan)
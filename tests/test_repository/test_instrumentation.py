@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.cached_repository import CachedRepository
+from bookkeeper.repository.connection import ConnectionManager
+from bookkeeper.repository.expense_rows import ExpenseRows
+from bookkeeper.repository.instrumentation import (
+    Histogram, Instrumentation, TracingConnection, normalize_sql, uninstrumented
+)
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import In
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+from bookkeeper.repository.unit_of_work import unit_of_work
+
+
+@pytest.fixture
+def instrumentation():
+    return Instrumentation(slow_threshold=0)
+
+
+@pytest.fixture
+def connections(tmp_path, instrumentation):
+    connections = ConnectionManager(str(tmp_path / 'stats.db'))
+    connections.instrument(instrumentation)
+    yield connections
+    connections.close()
+
+
+def test_histogram():
+    histogram = Histogram()
+    for seconds in [1e-6] * 90 + [0.003] * 9 + [20]:
+        histogram.add(seconds)
+    assert histogram.percentile(0.5) == 1e-6
+    assert 0.003 <= histogram.percentile(0.95) < 0.006
+    assert histogram.percentile(1) == histogram.max == 20
+
+
+def test_normalize_sql():
+    assert normalize_sql('SELECT *\n  FROM t WHERE pk IN (?, ?,?)') \
+        == normalize_sql('SELECT * FROM t WHERE pk IN (?, ?)') \
+        == 'SELECT * FROM t WHERE pk IN (?, ...)'
+
+
+def test_methods(instrumentation):
+    repo = instrumentation.wrap(MemoryRepository[Category](), 'category')
+    repo.add_many(Category(name) for name in 'abc')
+    repo.get(1)
+    repo.get(10)
+    assert len(list(repo.iter_all())) == 3
+    with pytest.raises(KeyError):
+        repo.delete(10)
+    stats = instrumentation.snapshot()['methods']
+    assert stats['category.add_many']['rows'] == 3
+    assert (stats['category.get']['calls'], stats['category.get']['rows']) == (2, 1)
+    assert stats['category.iter_all']['rows'] == 3
+    assert stats['category.delete']['errors'] == 1
+    instrumentation.enabled = False
+    repo.get(1)
+    assert instrumentation.methods['category.get'].calls == 2
+    assert uninstrumented(repo) is repo.repo
+
+
+def test_statements(connections, instrumentation):
+    repo = SqliteRepository(db_file=connections.db_file, cls=Category,
+                            connections=connections)
+    assert isinstance(connections.connection(), TracingConnection)
+    repo.add_many([Category('a'), Category('b')])
+    assert len(repo.get_all({'pk': In([1, 2])})) == 2
+    assert len(repo.get_all({'pk': In([1, 2, 3])})) == 2
+    stats = instrumentation.snapshot()
+    query = 'SELECT name, parent, pk FROM category WHERE'
+    select = stats['statements'][f'{query} (pk IN (?, ...))']
+    assert (select['calls'], select['rows']) == (2, 4)
+    assert stats['methods']['connection.connect']['calls'] == 1
+    plans = [q['plan'] for q in stats['slow_queries']
+             if q['sql'].startswith(query)]
+    assert len(plans) == 2 and 'USING INTEGER PRIMARY KEY' in plans[0][0]
+    json.dumps(stats)
+    assert 'slow queries:' in instrumentation.report()
+
+
+def test_wrapped_sqlite(connections, instrumentation):
+    cat_repo = instrumentation.wrap(CachedRepository(SqliteRepository(
+        db_file=connections.db_file, cls=Category, connections=connections)))
+    exp_repo = instrumentation.wrap(SqliteRepository(
+        db_file=connections.db_file, cls=Expense, connections=connections))
+    with unit_of_work(cat_repo, exp_repo):
+        pk = cat_repo.add(Category('a'))
+        exp_repo.add(Expense(10, pk))
+    assert exp_repo.total() == 10
+    rows = ExpenseRows(exp_repo, cat_repo)
+    assert rows._joined()
+    assert rows.get_all()[0].category_path == 'a'
+    assert set(instrumentation.methods) >= {'category.add', 'expense.add',
+                                            'expense.total'}
+    assert instrumentation.statements['BEGIN IMMEDIATE'].calls == 1
+    connections.instrument(None)
+    assert not isinstance(connections.connection(), TracingConnection)
@@ -1,4 +1,9 @@
+import random
+from datetime import date, datetime
+
+from bookkeeper.models.expense import Expense
 from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.query import In, IsNull, Range, date_range
 
 import pytest
 
@@ -69,3 +74,149 @@ def test_get_all_with_condition(repo, custom_class):
         objects.append(o)
     assert repo.get_all({'name': '0'}) == [objects[0]]
     assert repo.get_all({'test': 'test'}) == objects
+
+
+def test_add_many(repo, custom_class):
+    objects = [custom_class() for i in range(5)]
+    pks = repo.add_many(objects)
+    assert pks == [o.pk for o in objects]
+    assert repo.get_all() == objects
+
+
+def test_add_many_rollback(repo, custom_class):
+    objects = [custom_class() for i in range(3)]
+    objects[-1].pk = 10
+    with pytest.raises(ValueError):
+        repo.add_many(objects)
+    assert repo.get_all() == []
+    assert objects[0].pk == 0
+
+
+def test_update_many(repo, custom_class):
+    objects = [custom_class() for i in range(3)]
+    repo.add_many(objects)
+    new_objects = [custom_class() for i in range(3)]
+    for o, new in zip(objects, new_objects):
+        new.pk = o.pk
+    repo.update_many(new_objects)
+    assert repo.get_all() == new_objects
+
+
+def test_delete_many(repo, custom_class):
+    objects = [custom_class() for i in range(3)]
+    pks = repo.add_many(objects)
+    repo.delete_many(pks[:2])
+    assert repo.get_all() == objects[2:]
+    with pytest.raises(KeyError):
+        repo.delete_many([pks[2], 100])
+    assert repo.get_all() == objects[2:]
+
+
+def test_iter_all(repo, custom_class):
+    objects = []
+    for i in range(5):
+        o = custom_class()
+        o.name = str(i % 2)
+        repo.add(o)
+        objects.append(o)
+    assert list(repo.iter_all()) == objects
+    assert list(repo.iter_all({'name': '1'})) == objects[1::2]
+    assert list(repo.iter_all(order_by='-pk')) == objects[::-1]
+
+
+def test_get_between(repo):
+    objects = [Expense(i, 1, expense_date=f'2023-03-{i:02} 12:00:00')
+               for i in range(1, 6)]
+    repo.add_many(objects)
+    assert repo.get_between('expense_date', date(2023, 3, 2), date(2023, 3, 4)) \
+        == objects[1:3]
+    assert repo.get_between('expense_date', end=datetime(2023, 3, 2, 12)) == objects[:1]
+    assert repo.get_between('expense_date', '2023-03-04', order_by='-pk') \
+        == objects[:2:-1]
+
+
+@pytest.fixture
+def indexed_repo():
+    return MemoryRepository(indexes=['category'],
+                            sorted_indexes=['expense_date', 'amount'])
+
+
+def test_indexed_get_all_matches_scan(indexed_repo):
+    rnd = random.Random(1)
+    plain = MemoryRepository()
+    for i in range(300):
+        day = date(2023, 1, 1 + rnd.randrange(28)).isoformat()
+        exp = dict(amount=rnd.randrange(100), category=rnd.randrange(5),
+                   expense_date=f'{day} 12:00:00')
+        indexed_repo.add(Expense(**exp))
+        plain.add(Expense(**exp))
+    for exp in indexed_repo.get_all({'category': 4}):
+        exp.category = 0
+        indexed_repo.update(exp)
+        plain.update(Expense(exp.amount, 0, exp.expense_date, exp.added_date,
+                             exp.comment, exp.pk))
+    for pk in range(1, 300, 7):
+        indexed_repo.delete(pk)
+        plain.delete(pk)
+    conditions = [
+        {'category': 2},
+        {'category': 4},
+        {'category': In([1, 3])},
+        {'amount': Range(10, 20)},
+        {'amount': 50, 'category': 1},
+        {'expense_date': date_range(date(2023, 1, 5), date(2023, 1, 9))},
+        {'expense_date': date_range(date(2023, 1, 20)), 'category': In([0, 2])},
+        {'amount': IsNull()},
+        {'comment': ''},
+    ]
+    for where in conditions:
+        assert [e.pk for e in indexed_repo.get_all(where)] \
+            == [e.pk for e in plain.get_all(where)]
+        assert [e.pk for e in indexed_repo.iter_all(where)] \
+            == [e.pk for e in plain.get_all(where)]
+
+
+def test_index_follows_updates(indexed_repo):
+    exp = Expense(amount=10, category=1)
+    indexed_repo.add(exp)
+    exp.amount = 20
+    indexed_repo.update(exp)
+    assert indexed_repo.get_all({'amount': 10}) == []
+    assert indexed_repo.get_all({'amount': 20}) == [exp]
+    indexed_repo.delete_many([exp.pk])
+    assert indexed_repo.get_all({'amount': 20}) == []
+
+
+def test_index_rollback(indexed_repo):
+    kept = Expense(amount=10, category=1)
+    indexed_repo.add(kept)
+    with pytest.raises(KeyError):
+        with indexed_repo.transaction():
+            indexed_repo.add(Expense(amount=10, category=1))
+            indexed_repo.delete(kept.pk)
+            indexed_repo.delete(42)
+    assert indexed_repo.get_all({'category': 1}) == [kept]
+    assert indexed_repo.get_all({'amount': Range(0)}) == [kept]
+
+
+def test_nested_transaction_rollback(indexed_repo):
+    first, second = Expense(amount=10, category=1), Expense(amount=20, category=1)
+    with indexed_repo.transaction():
+        indexed_repo.add(first)
+        with pytest.raises(KeyError):
+            with indexed_repo.transaction():
+                indexed_repo.add(second)
+                indexed_repo.delete(first.pk)
+                indexed_repo.delete(42)
+        assert second.pk == 0
+        assert indexed_repo.get_all({'category': 1}) == [first]
+    with pytest.raises(KeyError):
+        with indexed_repo.transaction():
+            with indexed_repo.transaction():
+                indexed_repo.update(Expense(amount=30, category=2, pk=first.pk))
+                indexed_repo.add(second)
+            indexed_repo.delete(42)
+    assert second.pk == 0
+    assert indexed_repo.get_all() == [first]
+    assert indexed_repo.get_all({'amount': Range(0)}) == [first]
+    assert indexed_repo.get_all({'category': 2}) == []
@@ -0,0 +1,46 @@
+import sqlite3
+
+import pytest
+
+from bookkeeper.repository.migrations import (
+    convert_legacy_date, migrate, migrate_expense_dates
+)
+
+
+@pytest.fixture
+def con(tmp_path):
+    con = sqlite3.connect(str(tmp_path / 'legacy.db'))
+    con.execute('CREATE TABLE expense (pk INTEGER PRIMARY KEY, amount INTEGER, '
+                'category INTEGER, expense_date TEXT, added_date TEXT, comment TEXT)')
+    with con:
+        con.executemany('INSERT INTO expense '
+                        '(amount, category, expense_date, added_date) '
+                        'VALUES (?, ?, ?, ?)',
+                        [(i, 1, '18:30, 01/03/2023', '2023-03-02 10:00:00')
+                         for i in range(7)])
+    yield con
+    con.close()
+
+
+def test_convert_legacy_date():
+    assert convert_legacy_date('18:30, 01/03/2023') == '2023-03-01 18:30:00'
+    assert convert_legacy_date('01/03/2023, 18:30') == '2023-03-01 18:30:00'
+    assert convert_legacy_date('2023-03-01 18:30:00') == '2023-03-01 18:30:00'
+    assert convert_legacy_date(None) is None
+
+
+def test_migrate_expense_dates(con):
+    assert migrate_expense_dates(con, batch_size=3) == 7
+    assert set(con.execute('SELECT expense_date, added_date FROM expense')) \
+        == {('2023-03-01 18:30:00', '2023-03-02 10:00:00')}
+    assert migrate_expense_dates(con, batch_size=3) == 0
+
+
+def test_migrate_once(con):
+    assert migrate(con) == 1
+    assert con.execute('PRAGMA user_version').fetchone()[0] == 1
+    with con:
+        con.execute("UPDATE expense SET expense_date = '18:30, 01/03/2023'")
+    migrate(con)
+    assert con.execute('SELECT expense_date FROM expense').fetchone()[0] \
+        == '18:30, 01/03/2023'
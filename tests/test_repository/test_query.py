@@ -0,0 +1,78 @@
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+from bookkeeper.repository.query import (
+    In, Range, IsNull, compile_where, compile_order, matches, apply_order
+)
+
+COLUMNS = ['pk', 'name', 'parent']
+
+
+def test_compile_where():
+    sql, params = compile_where({'name': 'a', 'parent': In([1, 2]), 'pk': Range(3, 7)},
+                                COLUMNS)
+    assert sql == ' WHERE name = ? AND (parent IN (?, ?)) AND (pk >= ? AND pk < ?)'
+    assert params == ['a', 1, 2, 3, 7]
+
+
+def test_compile_where_null():
+    assert compile_where({'parent': None}, COLUMNS) == (' WHERE (parent IS NULL)', [])
+    assert compile_where({'parent': IsNull()}, COLUMNS) == (' WHERE (parent IS NULL)', [])
+    assert compile_where(None, COLUMNS) == ('', [])
+
+
+def test_compile_rejects_unknown_column():
+    with pytest.raises(ValueError):
+        compile_where({'name; DROP TABLE category': 1}, COLUMNS)
+    with pytest.raises(ValueError):
+        compile_order('-unknown', COLUMNS)
+
+
+def test_compile_order():
+    assert compile_order(['-parent', 'name'], COLUMNS) == ' ORDER BY parent DESC, name'
+    assert compile_order(None, COLUMNS) == ''
+
+
+def test_predicates():
+    assert In([1, 2])(2) and not In([1, 2])(3)
+    assert Range(1, 3)(1) and Range(1, 3)(2) and not Range(1, 3)(3)
+    assert Range(stop=3)(-10) and not Range(1)(None)
+    assert IsNull()(None) and not IsNull()(0)
+
+
+def test_matches():
+    cat = Category('a', 1, 5)
+    assert matches(cat, {'name': 'a', 'parent': In([1])})
+    assert not matches(cat, {'name': 'a', 'parent': None})
+
+
+def test_apply_order():
+    cats = [Category('b', 1), Category('a', None), Category('c', 1)]
+    assert [c.name for c in apply_order(cats, ['-parent', 'name'])] == ['b', 'c', 'a']
+
+
+@pytest.fixture
+def sqlite_repo(tmp_path):
+    db = str(tmp_path / 'query.db')
+    repo = SqliteRepository(db_file=db, cls=Category)
+    yield repo
+    repo.connections.close()
+
+
+@pytest.mark.parametrize('where, order_by, limit', [
+    ({'parent': 1, 'name': 'c'}, None, None),
+    ({'parent': None}, 'pk', None),
+    ({'parent': In([1, 2])}, ['-parent', 'name'], None),
+    ({'pk': Range(2, 5)}, '-pk', 2),
+    (None, 'name', 3),
+])
+def test_backends_agree(sqlite_repo, where, order_by, limit):
+    memory_repo = MemoryRepository[Category]()
+    for name, parent in [('a', None), ('b', 1), ('c', 1), ('d', 2), ('c', 2),
+                         ('e', None)]:
+        memory_repo.add(Category(name, parent))
+        sqlite_repo.add(Category(name, parent))
+    assert sqlite_repo.get_all(where, order_by, limit) \
+        == memory_repo.get_all(where, order_by, limit)
@@ -1,11 +1,11 @@
 from bookkeeper.repository.sqlite_repository import SqliteRepository
 from bookkeeper.models.expense import Expense
 from bookkeeper.models.category import Category
-from bookkeeper.models.budget import Budget
-from bookkeeper.utils import expense_adapter, category_adapter, budget_adapter
-from datetime import datetime
+from bookkeeper.repository.query import date_range
+from bookkeeper.repository.schema import row_factory
+from dataclasses import dataclass, field
+from datetime import date, datetime
 import sqlite3
-import os
 
 import pytest
 
@@ -26,13 +26,17 @@ def custom_class():
     return Custom
 
 
-cwd = os.getcwd()
-db_file = os.path.join(cwd, 'tests', 'test_repository', 'test.db')
-
-
 @pytest.fixture
-def repo():
-    return SqliteRepository(db_file=db_file, cls=Expense)  # idk maybe shuold be more abstract
+def repo(tmp_path):
+    db_file = str(tmp_path / 'test.db')
+    cat_repo = SqliteRepository(db_file=db_file, cls=Category)
+    with cat_repo.connections.connection() as con:
+        # категории, на которые ссылаются траты в тестах
+        con.executemany('INSERT INTO category (pk, name) VALUES (?, ?)',
+                        [(0, '0'), (5, '5')])
+    repo = SqliteRepository(db_file=db_file, cls=Expense)  # idk maybe shuold be more abstract
+    yield repo
+    repo.connections.close()
 
 
 def test_crud(repo, custom_class):
@@ -100,18 +104,143 @@ def test_get_all_with_condition(repo, custom_class):
     assert all([repo.get_all({'category': 5})[i].pk == objects[i].pk for i in range(len(objects))])
 
 
-def test_expense_adapter():
-    exp_row = {'pk': 0, 'amount': 0, "expense_date": datetime.now().strftime("%d/%m/%Y, %H:%M"),
-               'added_date': datetime.now().strftime("%d/%m/%Y, %H:%M"),
-               "comment": '', 'category': 0}
-    assert isinstance(expense_adapter(exp_row), Expense)
+@dataclass
+class Reading:
+    value: float
+    label: str | None = None
+    checked: bool = False
+    pk: int = 0
+
+
+@dataclass
+class Tagged:
+    name: str
+    tag: str = field(default='', init=False)
+    pk: int = 0
 
 
-def test_category_adapter():
-    cat_row = {'pk': 0, 'name': 'test', 'parent': None}
-    assert isinstance(category_adapter(cat_row), Category)
+def test_row_factory():
+    assert row_factory(Expense) == (['amount', 'category', 'expense_date',
+                                     'added_date', 'comment', 'pk'], Expense)
+    columns, make = row_factory(Tagged)
+    assert columns == ['pk', 'name', 'tag']
+    obj = make(3, 'a', 'b')
+    assert (obj.pk, obj.name, obj.tag) == (3, 'a', 'b')
 
 
-def test_budget_adapter():
-    budget_row = {'pk': 0, 'budget': 0, 'cur_sum': 0}
-    assert isinstance(budget_adapter(budget_row), Budget)
\ No newline at end of file
+def test_any_dataclass_model(tmp_path):
+    repo = SqliteRepository(db_file=str(tmp_path / 'readings.db'), cls=Reading)
+    repo.add_many([Reading(1.5), Reading(2.0, 'b', True)])
+    assert repo.get_all() == [Reading(1.5, pk=1), Reading(2.0, 'b', True, pk=2)]
+    assert list(repo.iter_all({'checked': True})) == [repo.get(2)]
+    tagged = SqliteRepository(db_file=str(tmp_path / 'readings.db'), cls=Tagged)
+    obj = Tagged('x')
+    obj.tag = 'y'
+    tagged.add(obj)
+    assert tagged.get(obj.pk).tag == 'y'
+    repo.connections.close()
+
+
+@pytest.fixture
+def batch_repo(tmp_path):
+    db = str(tmp_path / 'batch.db')
+    cat_repo = SqliteRepository(db_file=db, cls=Category)
+    cat_repo.add_many([Category('0'), Category('1')])
+    repo = SqliteRepository(db_file=db, cls=Expense)
+    yield repo
+    repo.connections.close()
+
+
+def test_add_many(batch_repo):
+    objects = [Expense(i, 1) for i in range(10)]
+    pks = batch_repo.add_many(objects, chunk_size=3)
+    assert pks == list(range(1, 11))
+    assert [o.pk for o in objects] == pks
+    assert batch_repo.get_all() == objects
+
+
+def test_add_many_rollback(batch_repo):
+    objects = [Expense(i, 1) for i in range(5)]
+    objects[4].pk = 100
+    with pytest.raises(ValueError):
+        batch_repo.add_many(objects, chunk_size=2)
+    assert batch_repo.get_all() == []
+    assert all(o.pk == 0 for o in objects[:4])
+
+
+def test_update_many(batch_repo):
+    objects = [Expense(i, 1) for i in range(5)]
+    batch_repo.add_many(objects)
+    for o in objects:
+        o.amount += 10
+    batch_repo.update_many(objects, chunk_size=2)
+    assert batch_repo.get_all() == objects
+
+
+def test_delete_many(batch_repo):
+    objects = [Expense(i, 1) for i in range(5)]
+    pks = batch_repo.add_many(objects)
+    batch_repo.delete_many(pks[:3], chunk_size=2)
+    assert batch_repo.get_all() == objects[3:]
+    with pytest.raises(KeyError):
+        batch_repo.delete_many([pks[3], 1000])
+    assert batch_repo.get_all() == objects[3:]
+
+
+def test_iter_all(batch_repo):
+    objects = [Expense(i, i % 2 + 1) for i in range(10)]
+    batch_repo.add_many(objects)
+    gen = batch_repo.iter_all(batch_size=3)
+    assert not isinstance(gen, list)
+    assert list(gen) == objects
+    assert list(batch_repo.iter_all({'category': 2}, order_by='-pk', batch_size=2)) \
+        == objects[1::2][::-1]
+
+
+def test_schema_created(batch_repo):
+    con = batch_repo.connections.connection()
+    columns = {row[1]: (row[2], row[3])
+               for row in con.execute('PRAGMA table_info(expense)')}
+    assert columns == {'pk': ('INTEGER', 0), 'amount': ('INTEGER', 1),
+                       'category': ('INTEGER', 1), 'expense_date': ('TEXT', 1),
+                       'added_date': ('TEXT', 1), 'comment': ('TEXT', 1)}
+    # повторное создание репозитория не должно ломать существующую схему
+    SqliteRepository(db_file=batch_repo.db_file, cls=Expense)
+
+
+def test_foreign_key(batch_repo):
+    with pytest.raises(sqlite3.IntegrityError):
+        batch_repo.add(Expense(100, 1000))
+
+
+def test_indexes_used(batch_repo):
+    cat_repo = SqliteRepository(db_file=batch_repo.db_file, cls=Category)
+    assert 'idx_expense_category' in ' '.join(batch_repo.query_plan({'category': 1}))
+    assert 'idx_category_name' in ' '.join(cat_repo.query_plan({'name': '1'}))
+    assert 'idx_category_parent' in ' '.join(cat_repo.query_plan({'parent': 1}))
+
+
+def test_get_between(batch_repo):
+    objects = [Expense(i, 1, expense_date=f'2023-03-{i:02} 12:00:00')
+               for i in range(1, 6)]
+    batch_repo.add_many(objects)
+    assert batch_repo.get_between('expense_date', date(2023, 3, 2), date(2023, 3, 4)) \
+        == objects[1:3]
+    assert batch_repo.get_between('expense_date', '2023-03-04', where={'category': 1},
+                                  order_by='-expense_date') == objects[:2:-1]
+    assert 'idx_expense_expense_date' in ' '.join(
+        batch_repo.query_plan({'expense_date': date_range(date(2023, 3, 2))}))
+
+
+def test_totals(batch_repo):
+    batch_repo.add_many([Expense(i, 1 + i % 2, expense_date=f'2023-03-0{i} 10:00:00')
+                         for i in range(1, 6)])
+    assert batch_repo.total() == 15
+    assert batch_repo.total('amount',
+                            {'expense_date': date_range(end=date(2023, 3, 3))}) == 3
+    assert batch_repo.totals_by('category') == {1: 6, 2: 9}
+    assert batch_repo.totals_by(('category', 'expense_date'))[(2, '2023-03-01')] == 1
+    assert batch_repo.totals_by('expense_date') \
+        == {f'2023-03-0{i}': i for i in range(1, 6)}
+    with pytest.raises(ValueError):
+        batch_repo.total('unknown')
@@ -0,0 +1,100 @@
+import pytest
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.connection import ConnectionManager
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+from bookkeeper.repository.unit_of_work import unit_of_work
+
+
+@pytest.fixture
+def connections(tmp_path):
+    connections = ConnectionManager(str(tmp_path / 'test.db'))
+    yield connections
+    connections.close()
+
+
+@pytest.fixture
+def repos(connections):
+    db_file = connections.db_file
+    cat_repo = SqliteRepository(db_file, Category, connections)
+    exp_repo = SqliteRepository(db_file, Expense, connections)
+    budget_repo = SqliteRepository(db_file, Budget, connections)
+    cat_repo.add(Category('food'))
+    budget_repo.add(Budget(budget=1000, cur_sum=0))
+    return cat_repo, exp_repo, budget_repo
+
+
+def test_single_commit(connections, repos):
+    _, exp_repo, budget_repo = repos
+    statements = []
+    connections.connection().set_trace_callback(statements.append)
+    with unit_of_work(exp_repo, budget_repo):
+        exp_repo.add(Expense(amount=10, category=1))
+        budget = budget_repo.get(1)
+        budget.cur_sum = 10
+        budget_repo.update(budget)
+    connections.connection().set_trace_callback(None)
+    assert statements.count('COMMIT') == 1
+
+
+def test_rollback_all_repositories(repos):
+    cat_repo, exp_repo, budget_repo = repos
+    expense, meat = Expense(amount=10, category=1), Category('meat', 1)
+    with pytest.raises(KeyError):
+        with unit_of_work(cat_repo, exp_repo, budget_repo):
+            exp_repo.add(expense)
+            cat_repo.add_many([meat])
+            budget_repo.delete(42)
+    assert exp_repo.get_all() == []
+    assert [c.name for c in cat_repo.get_all()] == ['food']
+    assert expense.pk == meat.pk == 0
+    assert exp_repo.add(expense) == 1
+
+
+def test_nested_failure_rolls_back_inner_only(repos):
+    cat_repo, exp_repo, _ = repos
+    kept, dropped = Expense(amount=10, category=1), Expense(amount=20, category=1)
+    with unit_of_work(cat_repo, exp_repo):
+        exp_repo.add(kept)
+        with pytest.raises(KeyError):
+            with unit_of_work(exp_repo):
+                exp_repo.add(dropped)
+                exp_repo.delete(42)
+        with pytest.raises(ValueError):
+            exp_repo.add_many([Expense(amount=20, category=1), Category('x', pk=5)])
+    assert [e.amount for e in exp_repo.get_all()] == [10]
+    assert (kept.pk, dropped.pk) == (1, 0)
+
+
+def test_different_managers(tmp_path, repos):
+    other = SqliteRepository(str(tmp_path / 'other.db'), Category,
+                             ConnectionManager(str(tmp_path / 'other.db')))
+    with pytest.raises(ValueError):
+        with unit_of_work(repos[0], other):
+            pass
+
+
+def test_memory_rollback():
+    cat_repo, exp_repo = MemoryRepository(), MemoryRepository()
+    cat = Category('food')
+    cat_repo.add(cat)
+    added = Expense(amount=10, category=cat.pk)
+    with pytest.raises(KeyError):
+        with unit_of_work(cat_repo, exp_repo):
+            exp_repo.add(added)
+            cat_repo.delete(cat.pk)
+            exp_repo.delete(42)
+    assert added.pk == 0
+    assert exp_repo.get_all() == []
+    assert cat_repo.get(cat.pk) is cat
+    assert exp_repo.add(Expense(amount=5, category=cat.pk)) == 1
+
+
+def test_memory_commit():
+    repo = MemoryRepository()
+    with unit_of_work(repo):
+        pk = repo.add(Category('food'))
+    assert repo.get(pk).name == 'food'
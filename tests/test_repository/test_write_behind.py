@@ -0,0 +1,126 @@
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.repository.connection import ConnectionManager
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SqliteRepository
+from bookkeeper.repository.write_behind import WriteBehindRepository
+
+
+@pytest.fixture
+def connections(tmp_path):
+    connections = ConnectionManager(str(tmp_path / 'test.db'))
+    yield connections
+    connections.close()
+
+
+@pytest.fixture
+def repo(connections):
+    repo = WriteBehindRepository(
+        SqliteRepository(connections.db_file, Category, connections), max_delay=10)
+    yield repo
+    repo.close()
+
+
+def test_pk_assigned_on_flush(repo):
+    cats = [Category(str(i)) for i in range(10)]
+    futures = [repo.add(cat) for cat in cats]
+    repo.flush()
+    assert [f.result(timeout=1) for f in futures] == list(range(1, 11))
+    assert [cat.pk for cat in cats] == list(range(1, 11))
+
+
+def test_batch_is_one_commit(connections, monkeypatch):
+    statements = []
+    connect = connections._connect
+
+    def traced_connect():
+        con = connect()
+        con.set_trace_callback(statements.append)
+        return con
+
+    monkeypatch.setattr(connections, '_connect', traced_connect)
+    repo = WriteBehindRepository(
+        SqliteRepository(connections.db_file, Category, connections), max_delay=10)
+    statements.clear()
+    futures = [repo.add(Category(str(i))) for i in range(100)]
+    repo.flush()
+    repo.close()
+    assert all(f.done() for f in futures)
+    assert statements.count('COMMIT') == 1
+
+
+def test_size_threshold(connections):
+    repo = WriteBehindRepository(
+        SqliteRepository(connections.db_file, Category, connections),
+        max_batch=5, max_delay=10)
+    futures = [repo.add(Category(str(i))) for i in range(5)]
+    assert futures[-1].result(timeout=5) == 5
+    repo.close()
+
+
+def test_time_threshold(connections):
+    repo = WriteBehindRepository(
+        SqliteRepository(connections.db_file, Category, connections), max_delay=0.01)
+    assert repo.add(Category('food')).result(timeout=5) == 1
+    repo.close()
+
+
+def test_failed_operation_does_not_fail_batch(repo):
+    first = repo.add(Category('food'))
+    missing = repo.delete(42)
+    second = repo.add(Category('meat'))
+    repo.flush()
+    assert first.result() == 1 and second.result() == 2
+    with pytest.raises(KeyError):
+        missing.result()
+    assert [c.name for c in repo.get_all()] == ['food', 'meat']
+
+
+def test_reads_see_queued_writes(repo):
+    cat = Category('food')
+    repo.add(cat)
+    assert repo.get(1).name == 'food'
+    cat.name = 'meat'
+    repo.update(cat)
+    assert repo.get_all({'name': 'meat'})[0].pk == 1
+
+
+def test_close_writes_queue():
+    memory = MemoryRepository()
+    repo = WriteBehindRepository(memory, max_delay=10)
+    future = repo.add(Category('food'))
+    repo.close()
+    assert future.result(timeout=0) == 1
+    assert memory.get(1).name == 'food'
+    with pytest.raises(RuntimeError):
+        repo.add(Category('meat'))
+
+
+def test_context_manager_writes_queue():
+    memory = MemoryRepository()
+    with WriteBehindRepository(memory, max_delay=10) as repo:
+        repo.add(Category('food'))
+    assert memory.get(1).name == 'food'
+
+
+def test_queue_written_at_exit(tmp_path):
+    db_file = str(tmp_path / 'exit.db')
+    # процесс завершается, не вызывая close
+    script = textwrap.dedent(f'''
+        from bookkeeper.models.category import Category
+        from bookkeeper.repository.sqlite_repository import SqliteRepository
+        from bookkeeper.repository.write_behind import WriteBehindRepository
+        repo = WriteBehindRepository(SqliteRepository({db_file!r}, Category),
+                                     max_delay=10)
+        for name in ['food', 'meat']:
+            repo.add(Category(name))
+    ''')
+    subprocess.run([sys.executable, '-c', script], check=True, timeout=30)
+    repo = SqliteRepository(db_file, Category)
+    assert [c.name for c in repo.get_all()] == ['food', 'meat']
+    repo.connections.close()